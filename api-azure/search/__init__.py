@@ -1,14 +1,32 @@
 import azure.functions as func
 import json
 import os
-from azure.storage.blob import BlobServiceClient
+from shared_code.knowledge_storage import CachedKnowledgeReader, LRUCache, create_storage
 
 # ---- 設定 ----
-BLOB_CONN = os.environ["BLOB_CONNECTION_STRING"]
-CONTAINER = os.environ["BLOB_CONTAINER_NAME"]
-
-blob_service = BlobServiceClient.from_connection_string(BLOB_CONN)
-container_client = blob_service.get_container_client(CONTAINER)
+BLOB_CONN = os.environ.get("BLOB_CONNECTION_STRING", "")
+CONTAINER = os.environ.get("BLOB_CONTAINER_NAME", "knowledge")
+
+# FastAPIアプリと同じストレージの実装（既定はAzure Blob Storage）
+storage = create_storage(
+    os.environ.get("KNOWLEDGE_STORAGE_BACKEND", "blob"),
+    directory=os.environ.get("KNOWLEDGE_DIR"),
+    sqlite_path=os.environ.get("KNOWLEDGE_SQLITE_PATH"),
+    connection_string=BLOB_CONN,
+    container=CONTAINER,
+    prefix=os.environ.get("KNOWLEDGE_BLOB_PREFIX", ""),
+    max_workers=int(os.environ.get("KNOWLEDGE_PREFETCH_WORKERS", "8")),
+    # 従来どおりサブフォルダ内のBlobも検索対象にする
+    recursive=os.environ.get("KNOWLEDGE_BLOB_RECURSIVE", "true").lower() == "true",
+)
+
+# ウォームなインスタンスではBlobの内容をキャッシュし、一覧は LIST_TTL 秒ごとに取得し直す
+# （ETagが変わったBlobのみダウンロードし直す）
+reader = CachedKnowledgeReader(
+    storage,
+    LRUCache(int(os.environ.get("KNOWLEDGE_CACHE_BYTES", "33554432")), name="functions_knowledge"),
+    list_ttl=float(os.environ.get("KNOWLEDGE_LIST_TTL", "30")),
+)
 
 
 def build_query(case: dict) -> str:
@@ -28,15 +46,17 @@ def retrieve_evidence(query: str, max_docs=3):
     results = []
     keywords = query.split()
 
-    for blob in container_client.list_blobs():
-        blob_client = container_client.get_blob_client(blob.name)
-        text = blob_client.download_blob().readall().decode("utf-8")
+    # キャッシュにないBlobはまとめて並列にダウンロードする
+    contents = reader.get_many(reader.list())
+
+    for name, cached in sorted(contents.items()):
+        text = cached["content"]
 
         score = sum(1 for k in keywords if k in text)
 
         if score > 0:
             results.append({
-                "source": blob.name,
+                "source": name,
                 "snippet": text[:300],
                 "score": score
             })
@@ -0,0 +1,734 @@
+"""
+Knowledgeファイルのストレージ（ローカルディレクトリ / SQLite / Azure Blob Storage）
+
+FastAPIアプリ（app.services.knowledge_service）とAzure Functions（api-azure/search）の両方から使うため、
+標準ライブラリ以外には依存しない（Azure Blob Storageを使う場合のみ azure-storage-blob が必要）。
+Azure Functionsからは api-azure/shared_code/knowledge_storage.py（scripts/sync_shared_code.py でコピーした実ファイル）として
+読み込むため、このファイルを変更したらスクリプトを実行してコピーもコミットする。
+
+ファイル情報は次の辞書で表す:
+    - name: ファイル名
+    - size: サイズ（バイト）
+    - updated_at: 最終更新日時（Unix timestamp）
+    - version: 内容が変わるたびに変わる値（ファイルのmtime、BlobのETagなど）
+"""
+import hashlib
+import os
+import sqlite3
+import stat as stat_module
+import tempfile
+import threading
+import time
+import shutil
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+class KnowledgeStorage:
+    """Knowledgeファイルのストレージ（各実装の共通インターフェース）"""
+
+    backend = "base"
+
+    def __init__(self, max_workers: int = 8):
+        """
+        Args:
+            max_workers: read_many・writeで並列に読み書きする数
+        """
+        self.max_workers = max(1, max_workers)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        ファイル一覧を取得
+
+        Returns:
+            List[Dict]: ファイル情報（name, size, updated_at, version）のリスト
+        """
+        raise NotImplementedError
+
+    def stat(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        ファイル情報を取得
+
+        Args:
+            name: ファイル名
+
+        Returns:
+            Optional[Dict]: ファイル情報（存在しない場合はNone）
+        """
+        raise NotImplementedError
+
+    def read(self, name: str) -> bytes:
+        """
+        ファイルの内容を読み込む
+
+        Args:
+            name: ファイル名
+
+        Returns:
+            bytes: ファイルの内容
+
+        Raises:
+            FileNotFoundError: ファイルが存在しない場合
+        """
+        raise NotImplementedError
+
+    def read_many(self, names: Iterable[str]) -> Dict[str, bytes]:
+        """
+        複数のファイルを並列に読み込む（先読み）
+
+        Args:
+            names: ファイル名
+
+        Returns:
+            Dict[str, bytes]: ファイル名 → 内容（存在しないファイルは含まない）
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+
+        def read(name: str) -> Optional[bytes]:
+            try:
+                return self.read(name)
+            except FileNotFoundError:
+                return None
+
+        if self.max_workers == 1 or len(names) == 1:
+            results = [read(name) for name in names]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(names))) as executor:
+                results = list(executor.map(read, names))
+        return {name: data for name, data in zip(names, results) if data is not None}
+
+    def write(self, files: Dict[str, bytes]):
+        """
+        複数のファイルを書き込む（既存のファイルは上書き）
+
+        Args:
+            files: ファイル名 → 内容
+        """
+        raise NotImplementedError
+
+    def delete(self, names: Iterable[str]):
+        """
+        複数のファイルを削除（存在しないファイルは無視）
+
+        Args:
+            names: ファイル名
+        """
+        raise NotImplementedError
+
+    def fingerprint(self) -> Hashable:
+        """
+        ストレージ全体の状態を表す値（変更があると変わる、変更の検出に使用）
+
+        Returns:
+            Hashable: 状態を表す値
+        """
+        return tuple(sorted((entry["name"], entry["version"]) for entry in self.list()))
+
+    def local_path(self) -> Optional[Path]:
+        """ローカルディレクトリ（ディレクトリの変更監視に使用、ローカル以外はNone）"""
+        return None
+
+
+class LocalDirectoryStorage(KnowledgeStorage):
+    """ローカルディレクトリ直下のファイル"""
+
+    backend = "local"
+
+    def __init__(self, directory: Path, max_workers: int = 1):
+        """
+        Args:
+            directory: Knowledgeディレクトリ
+            max_workers: read_manyで並列に読み込む数（ローカルは順に読む方が速いため1）
+        """
+        super().__init__(max_workers)
+        self.directory = Path(directory)
+
+    def list(self) -> List[Dict[str, Any]]:
+        entries = []
+        if not self.directory.exists():
+            return entries
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if item.name.startswith(".") or not item.is_file():
+                    continue
+                entries.append(self._entry(item.name, item.stat()))
+        return entries
+
+    def stat(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            stat = (self.directory / name).stat()
+        except OSError:
+            return None
+        if not stat_module.S_ISREG(stat.st_mode):
+            return None
+        return self._entry(name, stat)
+
+    def read(self, name: str) -> bytes:
+        return (self.directory / name).read_bytes()
+
+    def write(self, files: Dict[str, bytes]):
+        """同じファイルシステム上の一時ディレクトリに書き込んでからrenameする（書き込み途中のファイルを読ませない）"""
+        if not files:
+            return
+        staging = Path(tempfile.mkdtemp(prefix=".upload-", dir=self.directory))
+        try:
+            for name, data in files.items():
+                with open(staging / name, "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+            for name in files:
+                os.replace(staging / name, self.directory / name)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def delete(self, names: Iterable[str]):
+        for name in names:
+            (self.directory / name).unlink(missing_ok=True)
+
+    def fingerprint(self) -> Hashable:
+        """ディレクトリのmtime（ファイルの追加・削除・名前変更で更新される）"""
+        try:
+            return self.directory.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def local_path(self) -> Optional[Path]:
+        return self.directory
+
+    def _entry(self, name: str, stat: os.stat_result) -> Dict[str, Any]:
+        """ファイル情報の辞書を作成"""
+        return {"name": name, "size": stat.st_size, "updated_at": stat.st_mtime, "version": str(stat.st_mtime_ns)}
+
+
+class SQLiteStorage(KnowledgeStorage):
+    """SQLiteのテーブルに保存したファイル（1回の書き込み・削除は1トランザクション）"""
+
+    backend = "sqlite"
+
+    # IN句に指定するファイル名の最大数
+    _READ_BATCH = 500
+
+    def __init__(self, path: Path, max_workers: int = 1):
+        """
+        Args:
+            path: SQLiteファイル
+            max_workers: 未使用（read_manyは1回のクエリで読み込む）
+        """
+        super().__init__(max_workers)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS knowledge_files (
+                    name TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    version INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS knowledge_meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO knowledge_meta (key, value) VALUES ('generation', 0);
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """スレッドごとの接続を取得"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def list(self) -> List[Dict[str, Any]]:
+        rows = self._connect().execute("SELECT name, size, updated_at, version FROM knowledge_files").fetchall()
+        return [self._entry(*row) for row in rows]
+
+    def stat(self, name: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT name, size, updated_at, version FROM knowledge_files WHERE name = ?", (name,)
+        ).fetchone()
+        return self._entry(*row) if row is not None else None
+
+    def read(self, name: str) -> bytes:
+        row = self._connect().execute("SELECT data FROM knowledge_files WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"File not found: {name}")
+        return bytes(row[0])
+
+    def read_many(self, names: Iterable[str]) -> Dict[str, bytes]:
+        names = list(dict.fromkeys(names))
+        conn = self._connect()
+        contents: Dict[str, bytes] = {}
+        for start in range(0, len(names), self._READ_BATCH):
+            batch = names[start:start + self._READ_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for name, data in conn.execute(
+                f"SELECT name, data FROM knowledge_files WHERE name IN ({placeholders})", batch
+            ):
+                contents[name] = bytes(data)
+        return contents
+
+    def write(self, files: Dict[str, bytes]):
+        if not files:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            generation = self._next_generation(conn)
+            conn.executemany(
+                "INSERT OR REPLACE INTO knowledge_files (name, data, size, updated_at, version) VALUES (?, ?, ?, ?, ?)",
+                [(name, data, len(data), now, generation) for name, data in files.items()],
+            )
+
+    def delete(self, names: Iterable[str]):
+        names = list(names)
+        if not names:
+            return
+        with self._connect() as conn:
+            self._next_generation(conn)
+            conn.executemany("DELETE FROM knowledge_files WHERE name = ?", [(name,) for name in names])
+
+    def fingerprint(self) -> Hashable:
+        """書き込み・削除のたびに増える世代番号"""
+        return self._connect().execute("SELECT value FROM knowledge_meta WHERE key = 'generation'").fetchone()[0]
+
+    def import_directory(self, directory: Path, pattern: str = "*.txt") -> int:
+        """
+        ディレクトリのファイルをまとめて取り込む（ローカルディレクトリからの移行用）
+
+        Args:
+            directory: 取り込むディレクトリ
+            pattern: 対象とするファイル名のパターン
+
+        Returns:
+            int: 取り込んだファイル数
+        """
+        files = {path.name: path.read_bytes() for path in Path(directory).glob(pattern) if path.is_file()}
+        self.write(files)
+        return len(files)
+
+    def _next_generation(self, conn: sqlite3.Connection) -> int:
+        """世代番号を1つ増やす（トランザクション内で呼び出す）"""
+        conn.execute("UPDATE knowledge_meta SET value = value + 1 WHERE key = 'generation'")
+        return conn.execute("SELECT value FROM knowledge_meta WHERE key = 'generation'").fetchone()[0]
+
+    def _entry(self, name: str, size: int, updated_at: float, version: int) -> Dict[str, Any]:
+        """ファイル情報の辞書を作成"""
+        return {"name": name, "size": size, "updated_at": updated_at, "version": str(version)}
+
+
+def _is_not_found(error: Exception) -> bool:
+    """Blobが存在しないことを表す例外か（azure-coreのResourceNotFoundErrorまたはFileNotFoundError）"""
+    return isinstance(error, FileNotFoundError) or type(error).__name__ == "ResourceNotFoundError"
+
+
+class AzureBlobStorage(KnowledgeStorage):
+    """
+    Azure Blob Storageのコンテナ内のBlob
+
+    ContainerClient（azure-storage-blob）の list_blobs / download_blob / upload_blob / delete_blob /
+    get_blob_client だけを使うため、同じメソッドを持つ LocalBlobContainer に差し替えてテストできる。
+    """
+
+    backend = "blob"
+
+    def __init__(self, container_client: Any, prefix: str = "", max_workers: int = 8, recursive: bool = False):
+        """
+        Args:
+            container_client: ContainerClient（または LocalBlobContainer）
+            prefix: Knowledgeファイルを置くBlob名の接頭辞（例: "knowledge/"）
+            max_workers: read_many・writeで並列に読み書きする数
+            recursive: Trueの場合、接頭辞より下の階層のBlobも一覧に含める（ファイル名は "sub/name.txt" の形式）
+        """
+        super().__init__(max_workers)
+        self.container = container_client
+        self.prefix = prefix
+        self.recursive = recursive
+
+    @classmethod
+    def from_connection_string(
+        cls,
+        connection_string: str,
+        container: str,
+        prefix: str = "",
+        max_workers: int = 8,
+        recursive: bool = False,
+    ) -> "AzureBlobStorage":
+        """
+        接続文字列から作成（Azuriteの場合は "UseDevelopmentStorage=true"）
+
+        Args:
+            connection_string: Blob Storageの接続文字列
+            container: コンテナ名
+            prefix: Blob名の接頭辞
+            max_workers: 並列に読み書きする数
+            recursive: 接頭辞より下の階層のBlobも一覧に含めるか
+
+        Returns:
+            AzureBlobStorage: ストレージ
+        """
+        try:
+            from azure.storage.blob import ContainerClient
+        except ImportError:
+            raise RuntimeError("azure-storage-blob is required for the blob knowledge storage")
+        client = ContainerClient.from_connection_string(connection_string, container_name=container)
+        return cls(client, prefix=prefix, max_workers=max_workers, recursive=recursive)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [
+            self._entry(blob)
+            for blob in self.container.list_blobs(name_starts_with=self.prefix or None)
+            # recursiveでない場合、接頭辞より下の階層のBlobは対象外
+            if self.recursive or "/" not in blob.name[len(self.prefix):]
+        ]
+
+    def stat(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self._entry(self.container.get_blob_client(self.prefix + name).get_blob_properties())
+        except Exception as e:
+            if _is_not_found(e):
+                return None
+            raise
+
+    def read(self, name: str) -> bytes:
+        try:
+            return self.container.download_blob(self.prefix + name).readall()
+        except Exception as e:
+            if _is_not_found(e):
+                raise FileNotFoundError(f"File not found: {name}")
+            raise
+
+    def write(self, files: Dict[str, bytes]):
+        def upload(item: Tuple[str, bytes]):
+            self.container.upload_blob(self.prefix + item[0], item[1], overwrite=True)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(1, len(files)))) as executor:
+            list(executor.map(upload, files.items()))
+
+    def delete(self, names: Iterable[str]):
+        for name in names:
+            try:
+                self.container.delete_blob(self.prefix + name)
+            except Exception as e:
+                if not _is_not_found(e):
+                    raise
+
+    def _entry(self, blob: Any) -> Dict[str, Any]:
+        """BlobPropertiesからファイル情報の辞書を作成"""
+        return {
+            "name": blob.name[len(self.prefix):],
+            "size": blob.size,
+            "updated_at": blob.last_modified.timestamp(),
+            "version": str(blob.etag),
+        }
+
+
+class LocalBlobContainer:
+    """
+    ContainerClientの代わりにローカルディレクトリを使う（Azuriteを使わない開発・テスト用）
+
+    AzureBlobStorageが使うメソッドだけを実装する。latencyを指定すると、1回の呼び出しごとに
+    ネットワークの往復時間を模擬して待機する（並列読み込みの効果の確認用）。
+    """
+
+    def __init__(self, directory: Path, latency: float = 0.0):
+        """
+        Args:
+            directory: コンテナとして使うディレクトリ
+            latency: 1回の呼び出しごとの待機時間（秒）
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.latency = latency
+
+    def list_blobs(self, name_starts_with: Optional[str] = None) -> List[SimpleNamespace]:
+        self._wait()
+        blobs = []
+        for path in sorted(self.directory.rglob("*")):
+            name = path.relative_to(self.directory).as_posix()
+            if path.is_file() and not path.name.startswith(".") and name.startswith(name_starts_with or ""):
+                blobs.append(self._properties(name, path.stat()))
+        return blobs
+
+    def get_blob_client(self, name: str) -> SimpleNamespace:
+        return SimpleNamespace(get_blob_properties=lambda: self._get_properties(name))
+
+    def download_blob(self, name: str) -> SimpleNamespace:
+        self._wait()
+        data = self._path(name).read_bytes()
+        return SimpleNamespace(readall=lambda: data)
+
+    def upload_blob(self, name: str, data: bytes, overwrite: bool = False):
+        self._wait()
+        path = self._path(name)
+        if path.exists() and not overwrite:
+            raise FileExistsError(f"Blob already exists: {name}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".upload-", dir=path.parent)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def delete_blob(self, name: str):
+        self._wait()
+        self._path(name).unlink()
+
+    def _get_properties(self, name: str) -> SimpleNamespace:
+        self._wait()
+        return self._properties(name, self._path(name).stat())
+
+    def _path(self, name: str) -> Path:
+        """Blob名からパスを取得（コンテナの外を指す名前は不可）"""
+        path = (self.directory / name).resolve()
+        if self.directory.resolve() not in path.parents:
+            raise ValueError(f"Invalid blob name: {name}")
+        return path
+
+    def _properties(self, name: str, stat: os.stat_result) -> SimpleNamespace:
+        """BlobPropertiesと同じ属性を持つオブジェクト"""
+        return SimpleNamespace(
+            name=name,
+            size=stat.st_size,
+            last_modified=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+            etag=f'"0x{stat.st_mtime_ns:X}{stat.st_size:X}"',
+        )
+
+    def _wait(self):
+        """ネットワークの往復時間を模擬"""
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+
+def create_storage(
+    backend: str,
+    directory: Optional[str] = None,
+    sqlite_path: Optional[str] = None,
+    connection_string: Optional[str] = None,
+    container: Optional[str] = None,
+    prefix: str = "",
+    max_workers: int = 8,
+    latency: float = 0.0,
+    recursive: bool = False,
+) -> KnowledgeStorage:
+    """
+    設定からストレージを作成
+
+    Args:
+        backend: local / sqlite / blob / blob_local（ディレクトリを使うBlob Storageの代替）
+        directory: local・blob_localのディレクトリ
+        sqlite_path: sqliteのファイル
+        connection_string: blobの接続文字列
+        container: blobのコンテナ名
+        prefix: blob・blob_localのBlob名の接頭辞
+        max_workers: 並列に読み書きする数（blob・blob_local）
+        latency: blob_localで模擬する往復時間（秒）
+        recursive: blob・blob_localで接頭辞より下の階層のBlobも一覧に含めるか
+
+    Returns:
+        KnowledgeStorage: ストレージ
+    """
+    if backend == "local":
+        return LocalDirectoryStorage(Path(directory))
+    if backend == "sqlite":
+        return SQLiteStorage(Path(sqlite_path))
+    if backend == "blob":
+        return AzureBlobStorage.from_connection_string(
+            connection_string, container, prefix=prefix, max_workers=max_workers, recursive=recursive
+        )
+    if backend == "blob_local":
+        return AzureBlobStorage(
+            LocalBlobContainer(Path(directory), latency=latency), prefix=prefix, max_workers=max_workers, recursive=recursive
+        )
+    raise ValueError(f"Unknown knowledge storage backend: {backend}")
+
+
+class LRUCache:
+    """
+    合計サイズが上限を超えないように、最も長く参照されていない項目から破棄するキャッシュ
+
+    キーにファイルのバージョン（更新日時・ETagなど）とサイズを含めることで、ファイルが変更された場合は
+    別のキーとなり、古い内容は参照されないまま破棄される。
+    """
+
+    def __init__(self, max_bytes: int, name: str = "content"):
+        """
+        Args:
+            max_bytes: キャッシュする内容の合計サイズの上限（バイト、0の場合はキャッシュしない）
+            name: キャッシュ名
+        """
+        self.max_bytes = max_bytes
+        self.name = name
+        self._items: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        キャッシュから取得
+
+        Args:
+            key: キー
+
+        Returns:
+            Optional[Any]: キャッシュされた値（ない場合はNone）
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+        return item[0] if item is not None else None
+
+    def put(self, key: Hashable, value: Any, size: int):
+        """
+        キャッシュに追加（上限を超える場合は古い項目を破棄）
+
+        Args:
+            key: キー
+            value: 値
+            size: 値のサイズ（バイト）
+        """
+        if size > self.max_bytes:
+            # 上限より大きい項目はキャッシュしない
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._items[key] = (value, size)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self._total_bytes -= evicted_size
+
+    def discard(self, prefix: Hashable, keep: Optional[Hashable] = None):
+        """
+        キーの先頭要素が一致する項目を破棄（ファイルの更新・削除時など）
+
+        Args:
+            prefix: キー（タプル）の先頭要素
+            keep: 破棄しないキー（更新後の内容のキー）
+        """
+        with self._lock:
+            for key in [key for key in self._items if isinstance(key, tuple) and key[0] == prefix and key != keep]:
+                _, size = self._items.pop(key)
+                self._total_bytes -= size
+
+    @property
+    def total_bytes(self) -> int:
+        """キャッシュしている内容の合計サイズ（バイト）"""
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+def cache_key(entry: Dict[str, Any]) -> Tuple[str, str, int]:
+    """ファイル情報から内容のキャッシュのキーを作成"""
+    return (entry["name"], entry["version"], entry["size"])
+
+
+class CachedKnowledgeReader:
+    """
+    ストレージのファイルをデコードしてキャッシュする（キャッシュにないファイルはまとめて並列に読み込む）
+
+    値は content（UTF-8でデコードした内容）と etag（内容とバージョンから計算）の辞書。
+    """
+
+    def __init__(self, storage: KnowledgeStorage, cache: LRUCache, list_ttl: float = 0.0):
+        """
+        Args:
+            storage: ストレージ
+            cache: 内容のキャッシュ
+            list_ttl: list() の結果を再利用する時間（秒、0の場合は毎回取得）
+        """
+        self.storage = storage
+        self.cache = cache
+        self.list_ttl = list_ttl
+        self._listed: Optional[Tuple[float, List[Dict[str, Any]]]] = None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        ファイル一覧を取得（list_ttl 秒以内の再取得はキャッシュから返す）
+
+        Returns:
+            List[Dict]: ファイル情報のリスト
+        """
+        listed = self._listed
+        if listed is not None and time.monotonic() - listed[0] < self.list_ttl:
+            return listed[1]
+        entries = self.storage.list()
+        self._listed = (time.monotonic(), entries)
+        return entries
+
+    def get(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        """
+        ファイルの内容を取得
+
+        Args:
+            entry: ファイル情報
+
+        Returns:
+            Dict: content, etag
+
+        Raises:
+            FileNotFoundError: ファイルが存在しない場合
+            ValueError: UTF-8でデコードできない場合
+        """
+        cached = self.cache.get(cache_key(entry))
+        if cached is None:
+            cached = self._decode(entry, self.storage.read(entry["name"]))
+        return cached
+
+    def get_many(self, entries: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, str]]:
+        """
+        複数のファイルの内容を取得（キャッシュにないファイルは並列に読み込む）
+
+        Args:
+            entries: ファイル情報
+
+        Returns:
+            Dict[str, Dict]: ファイル名 → content, etag（存在しない・デコードできないファイルは含まない）
+        """
+        entries = list(entries)
+        results: Dict[str, Dict[str, str]] = {}
+        missing: Dict[str, Dict[str, Any]] = {}
+        for entry in entries:
+            cached = self.cache.get(cache_key(entry))
+            if cached is not None:
+                results[entry["name"]] = cached
+            else:
+                missing[entry["name"]] = entry
+
+        for name, data in self.storage.read_many(missing).items():
+            try:
+                results[name] = self._decode(missing[name], data)
+            except ValueError as e:
+                print(f"Error reading knowledge file {name}: {e}")
+        return {entry["name"]: results[entry["name"]] for entry in entries if entry["name"] in results}
+
+    def _decode(self, entry: Dict[str, Any], data: bytes) -> Dict[str, str]:
+        """デコードしてキャッシュに追加"""
+        try:
+            content = data.decode("utf-8")
+        except UnicodeDecodeError:
+            # UTF-8で読めない場合はエラー
+            raise ValueError(f"File encoding error: {entry['name']}")
+
+        # 強いETag（内容とバージョンから作成、レスポンスのupdated_atも含めて同一であることを表す）
+        digest = hashlib.sha256(data)
+        digest.update(str(entry["version"]).encode("utf-8"))
+        cached = {"content": content, "etag": f'"{digest.hexdigest()[:32]}"'}
+        self.cache.put(cache_key(entry), cached, len(data))
+        return cached
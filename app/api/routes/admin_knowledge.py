@@ -1,14 +1,17 @@
 """
 管理者用Knowledge管理APIルート
 """
-from fastapi import APIRouter, HTTPException, Request, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Request, Response, Depends, File, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional, Tuple
 from app.core.auth import require_admin
-from app.services.knowledge_service import knowledge_service
+from app.core.http_cache import etag_matches, validator_headers
+from app.services.knowledge_service import get_knowledge_service
+from app.services.knowledge_versions import diff_manifests
+from app.services.rag_service import get_rag_service
 from app.models.schemas import KnowledgeFileInfo, KnowledgeFileContent
 from pydantic import BaseModel
 import os
-from pathlib import Path
 
 router = APIRouter(prefix="/api/admin/knowledge", tags=["admin"])
 
@@ -20,17 +23,25 @@ class CreateFileRequest(BaseModel):
 
 
 @router.get("/files", response_model=List[KnowledgeFileInfo])
-async def get_knowledge_files(request: Request):
+async def get_knowledge_files(request: Request, response: Response):
     """
     管理者用：Knowledgeファイル一覧を取得
     
+    レスポンスヘッダー X-Catalog-Version にファイル一覧のバージョンを返す。
+    
+    Args:
+        request: FastAPI Requestオブジェクト
+        response: FastAPI Responseオブジェクト
+        
     Returns:
         List[KnowledgeFileInfo]: ファイル情報のリスト
     """
     require_admin(request)
     
     try:
+        knowledge_service = get_knowledge_service()
         files = knowledge_service.get_file_list()
+        response.headers["X-Catalog-Version"] = str(knowledge_service.catalog_version)
         # スキーマに合わせて変換
         return [
             KnowledgeFileInfo(
@@ -49,13 +60,15 @@ async def get_knowledge_files(request: Request):
 async def get_knowledge_file_content(
     filename: str,
     request: Request,
+    response: Response,
 ):
     """
-    管理者用：Knowledgeファイルの内容を取得
+    管理者用：Knowledgeファイルの内容を取得（If-None-MatchがETagと一致する場合は304）
     
     Args:
         filename: ファイル名
         request: FastAPI Requestオブジェクト
+        response: FastAPI Responseオブジェクト
         
     Returns:
         KnowledgeFileContent: ファイル内容
@@ -66,7 +79,11 @@ async def get_knowledge_file_content(
         if not filename.endswith(".txt"):
             filename = f"{filename}.txt"
         
-        content = knowledge_service.get_file_content(filename)
+        content = get_knowledge_service().get_file_content(filename)
+        headers = validator_headers(content["etag"], content["updated_at"])
+        if etag_matches(request.headers.get("if-none-match"), content["etag"]):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
         # スキーマに合わせて変換
         return KnowledgeFileContent(
             filename=content["filename"],
@@ -100,27 +117,18 @@ async def create_knowledge_file(
     require_admin(request)
     
     try:
-        # バリデーション
-        if not request_data.filename or not request_data.filename.strip():
-            raise HTTPException(status_code=400, detail="Filename is required")
-        
-        filename = request_data.filename.strip()
-        if not filename.endswith(".txt"):
-            filename = f"{filename}.txt"
-        
-        # ファイル名のセキュリティチェック
-        if ".." in filename or "/" in filename or "\\" in filename:
-            raise HTTPException(status_code=400, detail="Invalid filename")
+        # バリデーション（ファイル名のセキュリティチェックを含む）
+        filename = get_knowledge_service().normalize_filename(request_data.filename)
         
         # ファイルが既に存在するか確認
-        knowledge_dir = Path(knowledge_service.knowledge_dir)
-        file_path = knowledge_dir / filename
+        storage = get_knowledge_service().storage
         
-        if file_path.exists():
+        if storage.stat(filename) is not None:
             raise HTTPException(status_code=400, detail=f"File already exists: {filename}")
         
         # ファイルを作成
-        file_path.write_text(request_data.content, encoding="utf-8")
+        storage.write({filename: request_data.content.encode("utf-8")})
+        get_knowledge_service().notify_changed([filename])
         
         return {
             "status": "success",
@@ -130,10 +138,76 @@ async def create_knowledge_file(
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating file: {str(e)}")
 
 
+@router.post("/files/bulk")
+async def upload_knowledge_files(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    overwrite: bool = Query(False, description="既存のファイルを上書きする"),
+    wait: bool = Query(False, description="Indexへの反映が完了するまで待つ"),
+):
+    """
+    管理者用：Knowledgeファイルを一括アップロード（.txtファイルの複数指定、またはzipファイル）
+    
+    すべてのファイルを検証してから書き込み、Indexへの反映はまとめて1回だけ行う。
+    
+    Args:
+        request: FastAPI Requestオブジェクト
+        files: アップロードするファイル（.zipは展開して直下のファイルを追加）
+        overwrite: 既存のファイルを上書きする場合True
+        wait: Indexへの反映が完了してから応答する場合True
+        
+    Returns:
+        dict: アップロード結果
+    """
+    require_admin(request)
+    
+    try:
+        knowledge_service = get_knowledge_service()
+        contents: List[Tuple[str, bytes]] = []
+        for upload in files:
+            data = await upload.read()
+            if (upload.filename or "").lower().endswith(".zip"):
+                contents.extend(await run_in_threadpool(knowledge_service.extract_zip, data))
+            else:
+                contents.append((upload.filename or "", data))
+        
+        result = await run_in_threadpool(knowledge_service.write_files, contents, overwrite)
+        
+        # Indexへの反映（カタログの更新で反映待ちに追加されている）
+        rag_service = get_rag_service()
+        updater = rag_service.index_updater
+        if updater is None:
+            # 自動反映が無効の場合は、ここでまとめて1回反映する
+            index_result = await run_in_threadpool(rag_service.update_files, result["files"])
+        elif wait:
+            await run_in_threadpool(updater.flush)
+            index_result = updater.last_result
+        else:
+            index_result = {"status": "scheduled", "pending_updates": sorted(updater.pending)}
+        
+        return {
+            "status": "success",
+            "message": f"{len(result['files'])} files uploaded",
+            **result,
+            "index": index_result,
+        }
+        
+    except HTTPException:
+        raise
+    except FileExistsError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error uploading files: {str(e)}")
+
+
 @router.delete("/files/{filename}")
 async def delete_knowledge_file(
     filename: str,
@@ -152,26 +226,17 @@ async def delete_knowledge_file(
     require_admin(request)
     
     try:
-        # バリデーション
-        if not filename or not filename.strip():
-            raise HTTPException(status_code=400, detail="Filename is required")
-        
-        filename = filename.strip()
-        if not filename.endswith(".txt"):
-            filename = f"{filename}.txt"
-        
-        # ファイル名のセキュリティチェック
-        if ".." in filename or "/" in filename or "\\" in filename:
-            raise HTTPException(status_code=400, detail="Invalid filename")
+        # バリデーション（ファイル名のセキュリティチェックを含む）
+        filename = get_knowledge_service().normalize_filename(filename)
         
         # ファイルを削除
-        knowledge_dir = Path(knowledge_service.knowledge_dir)
-        file_path = knowledge_dir / filename
+        storage = get_knowledge_service().storage
         
-        if not file_path.exists():
+        if storage.stat(filename) is None:
             raise HTTPException(status_code=404, detail=f"File not found: {filename}")
         
-        file_path.unlink()
+        storage.delete([filename])
+        get_knowledge_service().notify_changed([filename])
         
         return {
             "status": "success",
@@ -181,6 +246,79 @@ async def delete_knowledge_file(
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting file: {str(e)}")
 
+
+
+@router.get("/versions")
+async def get_knowledge_versions(request: Request, limit: int = Query(100, ge=1, le=1000)):
+    """
+    管理者用：Knowledgeのバージョン履歴を取得（新しい順）
+    
+    Args:
+        request: FastAPI Requestオブジェクト
+        limit: 最大件数
+        
+    Returns:
+        dict: 現在のバージョンと履歴
+    """
+    require_admin(request)
+    
+    knowledge_service = get_knowledge_service()
+    versions = knowledge_service.versions
+    if versions is None:
+        raise HTTPException(status_code=404, detail="Knowledge versioning is disabled")
+    
+    try:
+        # 直前のアップロード・削除のバージョンの記録（別スレッド）を少し待つ
+        await run_in_threadpool(knowledge_service.wait_for_versions, 5.0)
+        return {
+            "current": versions.head,
+            "versions": await run_in_threadpool(versions.history, limit),
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting versions: {str(e)}")
+
+
+@router.get("/versions/{version}")
+async def get_knowledge_version(
+    version: str,
+    request: Request,
+    base: Optional[str] = Query(None, description="差分の比較元のバージョンID（省略時は差分を返さない）"),
+):
+    """
+    管理者用：Knowledgeのバージョンのマニフェスト（ファイル名 → 内容のSHA-256）を取得
+    
+    Args:
+        version: バージョンID
+        request: FastAPI Requestオブジェクト
+        base: 差分の比較元のバージョンID
+        
+    Returns:
+        dict: マニフェスト（baseを指定した場合は差分を含む）
+    """
+    require_admin(request)
+    
+    versions = get_knowledge_service().versions
+    if versions is None:
+        raise HTTPException(status_code=404, detail="Knowledge versioning is disabled")
+    
+    for value in (version, base):
+        if value is not None and not value.isalnum():
+            raise HTTPException(status_code=400, detail="Invalid version")
+    
+    files = versions.get_manifest(version)
+    if files is None:
+        raise HTTPException(status_code=404, detail=f"Version not found: {version}")
+    
+    result = {"version": version, "files": files}
+    if base is not None:
+        base_files = versions.get_manifest(base)
+        if base_files is None:
+            raise HTTPException(status_code=404, detail=f"Version not found: {base}")
+        result["base"] = base
+        result["diff"] = diff_manifests(base_files, files)
+    return result
@@ -1,12 +1,20 @@
 """
 管理者用ログ閲覧APIルート
 """
-from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, timedelta
 from app.core.auth import require_admin
-from app.core.database import SessionLocal, RAGLog
-from sqlalchemy import desc
+from app.core.database import AsyncSessionLocal, get_async_db, RAGLog, RAGLogPayload
+from app.services.log_archive_service import get_log_archive_service
+from app.services.log_stats_service import get_log_stats_service
+from app.services.log_payloads import PAYLOAD_FIELDS, decode_payload
+from app.services.log_export import CHUNK_ROWS, EXPORT_FIELDS, EXPORT_FORMATS, stream_export, to_record
+from app.services.log_search_service import get_log_search_service
+from sqlalchemy import and_, desc, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/admin/logs", tags=["admin"])
@@ -22,6 +30,8 @@ class LogInfo(BaseModel):
     referenced_files_count: int
     processing_time: Optional[float]
     model_name: Optional[str]
+    score: Optional[float] = None  # 全文検索の関連度（qを指定した場合、小さいほど関連度が高い）
+    snippet: Optional[str] = None  # 全文検索で一致した箇所の抜粋（qを指定した場合）
 
 
 class LogDetail(BaseModel):
@@ -43,75 +53,204 @@ class LogDetail(BaseModel):
     top_k: Optional[int]
 
 
+# ログ一覧で取得するカラム
+LIST_COLUMNS = (
+    RAGLog.id,
+    RAGLog.timestamp,
+    RAGLog.user_id,
+    RAGLog.case_id,
+    RAGLog.status,
+    RAGLog.referenced_files_count,
+    RAGLog.processing_time,
+    RAGLog.model_name,
+)
+
+
+async def _search_subquery(db: AsyncSession, q: str):
+    """
+    全文検索のサブクエリを作成
+
+    Args:
+        db: 非同期DBセッション
+        q: 検索語
+
+    Returns:
+        Subquery: log_id, score, snippet のサブクエリ
+    """
+    search_service = get_log_search_service()
+    if not await db.run_sync(search_service.is_available):
+        raise HTTPException(status_code=400, detail="Full-text search is not available for this database")
+    try:
+        return search_service.search_subquery(q)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _apply_filters(
+    query,
+    start_date: Optional[str],
+    end_date: Optional[str],
+    user_id: Optional[str],
+    case_id: Optional[str],
+    status: Optional[str],
+):
+    """
+    ログ一覧・エクスポート共通のフィルタを適用
+
+    Args:
+        query: SELECT文
+        start_date: 開始日時
+        end_date: 終了日時
+        user_id: ユーザーID
+        case_id: 案件ID
+        status: ステータス
+
+    Returns:
+        フィルタを適用したSELECT文
+    """
+    if start_date:
+        try:
+            start_dt = datetime.fromisoformat(start_date)
+            query = query.filter(RAGLog.timestamp >= start_dt)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid start_date format")
+
+    if end_date:
+        try:
+            end_dt = datetime.fromisoformat(end_date)
+            query = query.filter(RAGLog.timestamp <= end_dt)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid end_date format")
+
+    if user_id:
+        query = query.filter(RAGLog.user_id == user_id)
+
+    if case_id:
+        query = query.filter(RAGLog.case_id == case_id)
+
+    if status:
+        query = query.filter(RAGLog.status == status)
+
+    return query
+
+
 @router.get("", response_model=List[LogInfo])
 async def get_logs(
     request: Request,
+    response: Response,
     start_date: Optional[str] = Query(None, description="開始日時 (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="終了日時 (YYYY-MM-DD)"),
     user_id: Optional[str] = Query(None, description="ユーザーID"),
     case_id: Optional[str] = Query(None, description="案件ID"),
-    limit: int = Query(100, description="取得件数"),
+    status: Optional[str] = Query(None, description="ステータス (success/failed)"),
+    before_ts: Optional[str] = Query(None, description="この日時より古いログを取得（前ページ最後のtimestamp）"),
+    before_id: Optional[int] = Query(None, description="前ページ最後のログID（before_tsと同じ日時のログの続き）"),
+    q: Optional[str] = Query(None, description="全文検索（検索クエリ・回答・判断理由、空白区切りでAND）"),
+    offset: int = Query(0, ge=0, description="全文検索の結果の開始位置（qを指定した場合のみ）"),
+    limit: int = Query(100, ge=1, le=1000, description="取得件数"),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    管理者用：ログ一覧を取得
+    管理者用：ログ一覧を取得（新しい順、キーセットページング）
+    
+    次のページは、レスポンスヘッダー X-Next-Before-Ts / X-Next-Before-Id の値を
+    before_ts / before_id に指定して取得する（OFFSETを使わないため、
+    深いページでも最初のページと同じコストで取得できる）。
+    
+    qを指定した場合は全文検索の関連度順に返し、次のページは
+    レスポンスヘッダー X-Next-Offset の値を offset に指定して取得する。
     
     Args:
         request: FastAPI Requestオブジェクト
+        response: FastAPI Responseオブジェクト（次ページのカーソルをヘッダーに設定）
         start_date: 開始日時
         end_date: 終了日時
         user_id: ユーザーID（フィルタ）
         case_id: 案件ID（フィルタ）
+        status: ステータス（フィルタ）
+        before_ts: カーソル（日時）
+        before_id: カーソル（ログID）
+        q: 全文検索の検索語
+        offset: 全文検索の結果の開始位置
         limit: 取得件数
+        db: 非同期DBセッション
         
     Returns:
         List[LogInfo]: ログ情報のリスト
     """
     require_admin(request)
     
-    db = SessionLocal()
+    if q is not None and (before_ts or before_id is not None):
+        raise HTTPException(status_code=400, detail="before_ts/before_id cannot be used with q (use offset)")
+    
     try:
-        query = db.query(RAGLog)
+        # 一覧に必要なカラムのみ取得（回答本文や検索結果などの大きなJSONは読み込まない）
+        query = select(*LIST_COLUMNS)
+        
+        # 全文検索（FTS5の索引に一致するログのみ）
+        search = None
+        if q is not None:
+            search = await _search_subquery(db, q)
+            query = query.add_columns(search.c.score, search.c.snippet).join(search, search.c.log_id == RAGLog.id)
         
         # フィルタリング
-        if start_date:
-            try:
-                start_dt = datetime.fromisoformat(start_date)
-                query = query.filter(RAGLog.timestamp >= start_dt)
-            except ValueError:
-                raise HTTPException(status_code=400, detail="Invalid start_date format")
+        query = _apply_filters(query, start_date, end_date, user_id, case_id, status)
         
-        if end_date:
+        # カーソル（前ページの最後のログ）より古いログに絞り込む
+        if before_id is not None and not before_ts:
+            # IDのみ指定された場合は、そのログの日時をカーソルとして使う
+            cursor_log = (await db.execute(select(RAGLog.timestamp).where(RAGLog.id == before_id))).first()
+            if not cursor_log:
+                raise HTTPException(status_code=400, detail=f"Invalid before_id: {before_id}")
+            cursor_ts = cursor_log.timestamp
+        elif before_ts:
             try:
-                end_dt = datetime.fromisoformat(end_date)
-                query = query.filter(RAGLog.timestamp <= end_dt)
+                cursor_ts = datetime.fromisoformat(before_ts)
             except ValueError:
-                raise HTTPException(status_code=400, detail="Invalid end_date format")
-        
-        if user_id:
-            query = query.filter(RAGLog.user_id == user_id)
+                raise HTTPException(status_code=400, detail="Invalid before_ts format")
+        else:
+            cursor_ts = None
         
-        if case_id:
-            query = query.filter(RAGLog.case_id == case_id)
+        if cursor_ts is not None:
+            if before_id is not None:
+                query = query.filter(or_(
+                    RAGLog.timestamp < cursor_ts,
+                    and_(RAGLog.timestamp == cursor_ts, RAGLog.id < before_id),
+                ))
+            else:
+                query = query.filter(RAGLog.timestamp < cursor_ts)
         
-        # ソート（新しい順）
-        query = query.order_by(desc(RAGLog.timestamp))
-        
-        # 件数制限
-        logs = query.limit(limit).all()
+        if search is not None:
+            # 関連度順（BM25は小さいほど関連度が高い）、同じ関連度は新しい順
+            logs = (await db.execute(query.order_by(search.c.score, desc(RAGLog.id)).offset(offset).limit(limit))).all()
+            if len(logs) == limit:
+                response.headers["X-Next-Offset"] = str(offset + limit)
+        else:
+            # ソート（新しい順、同じ日時はID順）
+            query = query.order_by(desc(RAGLog.timestamp), desc(RAGLog.id))
+            
+            # 件数制限
+            logs = (await db.execute(query.limit(limit))).all()
+            
+            # 次ページのカーソル
+            if len(logs) == limit:
+                response.headers["X-Next-Before-Ts"] = logs[-1].timestamp.isoformat()
+                response.headers["X-Next-Before-Id"] = str(logs[-1].id)
         
         # レスポンス形式に変換
         result = []
         for log in logs:
-            referenced_files = log.referenced_files if isinstance(log.referenced_files, list) else []
             result.append(LogInfo(
                 id=log.id,
                 timestamp=log.timestamp.isoformat(),
                 user_id=log.user_id,
                 case_id=log.case_id,
-                status=getattr(log, 'status', 'success'),
-                referenced_files_count=len(referenced_files) if referenced_files else 0,
+                status=log.status or 'success',
+                referenced_files_count=log.referenced_files_count or 0,
                 processing_time=log.processing_time,
                 model_name=log.model_name,
+                score=log.score if search is not None else None,
+                snippet=log.snippet[:200] if search is not None and log.snippet else None,
             ))
         
         return result
@@ -120,14 +259,135 @@ async def get_logs(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting logs: {str(e)}")
-    finally:
-        db.close()
+
+
+@router.get("/stats")
+async def get_log_stats(
+    request: Request,
+    start_date: Optional[str] = Query(None, description="開始日 (YYYY-MM-DD、省略時は7日前)"),
+    end_date: Optional[str] = Query(None, description="終了日 (YYYY-MM-DD、この日を含む)"),
+    granularity: str = Query("hour", pattern="^(hour|day)$", description="時系列の単位 (hour/day)"),
+    model_name: Optional[str] = Query(None, description="モデル名"),
+    top_files: int = Query(10, ge=1, le=100, description="参照回数の多いファイルの件数"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    管理者用：ログの統計（件数・エラー率・処理時間のp95・参照回数の多いファイル）を取得
+    
+    ログ保存時に更新される時間別の集計テーブルから計算するため、
+    ログの件数が増えても応答時間は変わらない（アーカイブ済みのログも含む）。
+    
+    Args:
+        request: FastAPI Requestオブジェクト
+        start_date: 開始日
+        end_date: 終了日
+        granularity: 時系列の単位
+        model_name: モデル名（フィルタ）
+        top_files: 参照回数の多いファイルの件数
+        db: 非同期DBセッション
+        
+    Returns:
+        dict: 合計、時系列、モデル別、参照回数の多いファイル
+    """
+    require_admin(request)
+    
+    stats_service = get_log_stats_service()
+    start, end = stats_service.default_range()
+    try:
+        if start_date:
+            start = datetime.fromisoformat(start_date)
+        if end_date:
+            end = datetime.fromisoformat(end_date) + timedelta(days=1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format")
+    
+    try:
+        return await stats_service.get_stats_async(
+            db,
+            start=start,
+            end=end,
+            granularity=granularity,
+            model_name=model_name,
+            top_files=top_files,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting log stats: {str(e)}")
+
+
+@router.get("/export")
+async def export_logs(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="形式 (ndjson/csv)"),
+    gzip: bool = Query(False, description="gzip圧縮する"),
+    start_date: Optional[str] = Query(None, description="開始日時 (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="終了日時 (YYYY-MM-DD)"),
+    user_id: Optional[str] = Query(None, description="ユーザーID"),
+    case_id: Optional[str] = Query(None, description="案件ID"),
+    status: Optional[str] = Query(None, description="ステータス (success/failed)"),
+    q: Optional[str] = Query(None, description="全文検索（検索クエリ・回答・判断理由、空白区切りでAND）"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    管理者用：ログをファイルとしてエクスポート（古い順、ストリーミング）
+    
+    ログ一覧と同じフィルタで絞り込んだログを、回答本文などの圧縮された項目も
+    展開して出力する。サーバー側カーソルで少しずつ読み込みながら送信するため、
+    期間が長く件数が多い場合もメモリ使用量は一定になる。
+    
+    Args:
+        request: FastAPI Requestオブジェクト
+        format: 形式（ndjson / csv）
+        gzip: gzip圧縮する場合True
+        start_date: 開始日時
+        end_date: 終了日時
+        user_id: ユーザーID（フィルタ）
+        case_id: 案件ID（フィルタ）
+        status: ステータス（フィルタ）
+        q: 全文検索の検索語
+        db: 非同期DBセッション
+        
+    Returns:
+        StreamingResponse: エクスポートファイル
+    """
+    require_admin(request)
+    
+    # rag_log_payloadsがない古いログはrag_logsのカラムの値を使う
+    columns = [RAGLog.__table__.c[name] for name in EXPORT_FIELDS]
+    query = select(*columns, RAGLogPayload.codec.label("payload_codec"), RAGLogPayload.data.label("payload_data"))
+    query = query.outerjoin(RAGLogPayload, RAGLogPayload.log_id == RAGLog.id)
+    
+    if q is not None:
+        search = await _search_subquery(db, q)
+        query = query.join(search, search.c.log_id == RAGLog.id)
+    
+    query = _apply_filters(query, start_date, end_date, user_id, case_id, status)
+    query = query.order_by(RAGLog.timestamp, RAGLog.id).execution_options(yield_per=CHUNK_ROWS)
+    
+    async def batches():
+        # 依存関数のセッションはレスポンスの送信前に閉じられるため、送信用に別のセッションを使う
+        async with AsyncSessionLocal() as export_db:
+            result = await export_db.stream(query)
+            async for rows in result.partitions():
+                yield [to_record(row) for row in rows]
+    
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"rag_logs_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{extension}"
+    if gzip:
+        media_type = "application/gzip"
+        filename += ".gz"
+    
+    return StreamingResponse(
+        stream_export(batches(), format, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 @router.get("/{log_id}", response_model=LogDetail)
 async def get_log_detail(
     log_id: int,
     request: Request,
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     管理者用：ログ詳細を取得
@@ -135,18 +395,29 @@ async def get_log_detail(
     Args:
         log_id: ログID
         request: FastAPI Requestオブジェクト
+        db: 非同期DBセッション
         
     Returns:
         LogDetail: ログ詳細
     """
     require_admin(request)
     
-    db = SessionLocal()
     try:
-        log = db.query(RAGLog).filter(RAGLog.id == log_id).first()
+        log = await db.get(RAGLog, log_id)
         
         if not log:
-            raise HTTPException(status_code=404, detail=f"Log not found: {log_id}")
+            # 保存期間を過ぎてアーカイブ済みのログ（ファイルの読み込みはスレッドプールで行う）
+            archived = await run_in_threadpool(get_log_archive_service().get_archived_log, log_id)
+            if not archived:
+                raise HTTPException(status_code=404, detail=f"Log not found: {log_id}")
+            return LogDetail(**{key: archived.get(key) for key in LogDetail.model_fields})
+        
+        # 回答本文などの大きな項目は圧縮された別テーブルから展開する
+        # （rag_log_payloadsがない古いログはrag_logsのカラムの値を使う）
+        payload_row = await db.get(RAGLogPayload, log_id)
+        payload = decode_payload(payload_row.codec, payload_row.data) if payload_row else {
+            key: getattr(log, key) for key in PAYLOAD_FIELDS
+        }
         
         return LogDetail(
             id=log.id,
@@ -155,12 +426,12 @@ async def get_log_detail(
             case_id=log.case_id,
             status=getattr(log, 'status', 'success'),
             error_message=getattr(log, 'error_message', None),
-            input_data=log.input_data,
+            input_data=payload.get("input_data"),
             rag_queries=log.rag_queries,
             referenced_files=log.referenced_files,
-            search_results=getattr(log, 'search_results', None),
-            generated_answer=log.generated_answer,
-            reasoning=getattr(log, 'reasoning', None),
+            search_results=payload.get("search_results"),
+            generated_answer=payload.get("generated_answer"),
+            reasoning=payload.get("reasoning"),
             processing_time=log.processing_time,
             model_name=log.model_name,
             top_k=getattr(log, 'top_k', None),
@@ -170,6 +441,4 @@ async def get_log_detail(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting log detail: {str(e)}")
-    finally:
-        db.close()
 
@@ -6,7 +6,7 @@ from fastapi.responses import Response
 from pydantic import BaseModel
 from typing import Optional
 from urllib.parse import quote
-from app.services.document_service import document_service
+from app.services.document_service import get_document_service
 
 router = APIRouter(prefix="/api/documents", tags=["documents"])
 
@@ -39,7 +39,7 @@ async def generate_estimate(request: GenerateEstimateRequest):
         Response: DOCXファイル
     """
     try:
-        docx_bytes = document_service.generate_estimate_draft_docx(
+        docx_bytes = get_document_service().generate_estimate_draft_docx(
             case_info=request.case_info,
             rag_answer=request.rag_answer,
         )
@@ -85,7 +85,7 @@ async def generate_order(request: GenerateOrderRequest):
     """
     try:
         import traceback
-        docx_bytes = document_service.generate_order_draft_docx(
+        docx_bytes = get_document_service().generate_order_draft_docx(
             case_info=request.case_info,
             rag_answer=request.rag_answer,
             selected_contractor=request.selected_contractor,
@@ -1,24 +1,33 @@
 """
 Knowledgeファイル関連のAPIルート
 """
-from fastapi import APIRouter, HTTPException, Path as PathParam
+from fastapi import APIRouter, HTTPException, Request, Response, Path as PathParam
 from typing import List
-from app.services.knowledge_service import knowledge_service
+from app.core.http_cache import etag_matches, validator_headers
+from app.services.knowledge_service import get_knowledge_service
 from app.models.schemas import KnowledgeFileInfo, KnowledgeFileContent
 
 router = APIRouter(prefix="/api/knowledge", tags=["knowledge"])
 
 
 @router.get("/files", response_model=List[KnowledgeFileInfo])
-async def get_knowledge_files():
+async def get_knowledge_files(response: Response):
     """
     Knowledgeファイル一覧を取得
     
+    レスポンスヘッダー X-Catalog-Version にファイル一覧のバージョン
+    （ファイルの追加・更新・削除のたびに増える）を返す。
+    
+    Args:
+        response: FastAPI Responseオブジェクト
+        
     Returns:
         List[KnowledgeFileInfo]: ファイル情報のリスト
     """
     try:
+        knowledge_service = get_knowledge_service()
         files = knowledge_service.get_file_list()
+        response.headers["X-Catalog-Version"] = str(knowledge_service.catalog_version)
         # スキーマに合わせて変換
         return [
             KnowledgeFileInfo(
@@ -37,16 +46,23 @@ async def get_knowledge_files():
 
 @router.get("/files/{filename}", response_model=KnowledgeFileContent)
 async def get_knowledge_file_content(
+    request: Request,
+    response: Response,
     filename: str = PathParam(..., description="Knowledgeファイル名")
 ):
     """
     Knowledgeファイルの内容を取得
     
+    レスポンスにETag・Last-Modifiedを付け、If-None-MatchがETagと一致する場合は
+    本文なしの304を返す。
+    
     Args:
+        request: FastAPI Requestオブジェクト
+        response: FastAPI Responseオブジェクト
         filename: ファイル名（.txtファイル）
         
     Returns:
-        KnowledgeFileContent: ファイル内容
+        KnowledgeFileContent: ファイル内容（変更がない場合は304）
         
     Raises:
         HTTPException: ファイルが存在しない場合
@@ -56,7 +72,11 @@ async def get_knowledge_file_content(
         if not filename.endswith(".txt"):
             filename = f"{filename}.txt"
         
-        content = knowledge_service.get_file_content(filename)
+        content = get_knowledge_service().get_file_content(filename)
+        headers = validator_headers(content["etag"], content["updated_at"])
+        if etag_matches(request.headers.get("if-none-match"), content["etag"]):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
         # スキーマに合わせて変換
         return KnowledgeFileContent(
             filename=content["filename"],
@@ -2,7 +2,9 @@
 RAG Index管理APIルート
 """
 from fastapi import APIRouter, HTTPException, Request
-from app.services.rag_service import rag_service
+from fastapi.concurrency import run_in_threadpool
+from app.services.knowledge_service import get_knowledge_service
+from app.services.rag_service import get_rag_service
 from app.core.auth import require_admin
 from app.models.schemas import ErrorResponse
 
@@ -20,7 +22,7 @@ async def create_index(request: Request):
     require_admin(request)
     
     try:
-        result = rag_service.create_index()
+        result = get_rag_service().create_index()
         
         if result["success"]:
             return {
@@ -28,6 +30,8 @@ async def create_index(request: Request):
                 "message": result["message"],
                 "indexed_files": result["indexed_files"],
                 "total_chunks": result["total_chunks"],
+                "duplicate_chunks": result["duplicate_chunks"],
+                "dedup_ratio": result["dedup_ratio"],
             }
         else:
             raise HTTPException(status_code=500, detail=result["message"])
@@ -48,6 +52,8 @@ async def reindex(request: Request):
     require_admin(request)
     
     try:
+        rag_service = get_rag_service()
+        
         # 既存のIndexをクリア
         rag_service._index = None
         
@@ -60,6 +66,8 @@ async def reindex(request: Request):
                 "message": "Index recreated successfully",
                 "indexed_files": result["indexed_files"],
                 "total_chunks": result["total_chunks"],
+                "duplicate_chunks": result["duplicate_chunks"],
+                "dedup_ratio": result["dedup_ratio"],
             }
         else:
             raise HTTPException(status_code=500, detail=result["message"])
@@ -78,12 +86,68 @@ async def get_index_status():
         dict: Index状態
     """
     try:
+        rag_service = get_rag_service()
         is_ready = rag_service.is_index_ready()
+        updater = rag_service.index_updater
+        manifest = rag_service.index_manifest
         
         return {
             "index_ready": is_ready,
             "message": "Index is ready" if is_ready else "Index not found. Please create index first.",
+            # Knowledgeファイルの変更の自動反映（無効の場合はNone）
+            "pending_updates": sorted(updater.pending) if updater is not None else None,
+            "last_update": updater.last_result if updater is not None else None,
+            # Indexの作成元と現在のKnowledgeのバージョン（一致していればIndexは最新）
+            "index_version": manifest["version"] if manifest is not None else None,
+            "index_built_at": manifest["built_at"] if manifest is not None else None,
+            "knowledge_version": get_knowledge_service().current_version,
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error checking index status: {str(e)}")
 
+
+
+@router.get("/index/snapshots")
+async def get_index_snapshots(request: Request):
+    """
+    Indexのスナップショット一覧を取得（管理者用）
+    
+    Returns:
+        dict: スナップショット一覧（新しい順）
+    """
+    require_admin(request)
+    
+    snapshots = get_rag_service().snapshots
+    if snapshots is None:
+        raise HTTPException(status_code=404, detail="Knowledge versioning is disabled")
+    
+    try:
+        return {"snapshots": await run_in_threadpool(snapshots.list)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting snapshots: {str(e)}")
+
+
+@router.post("/index/rollback/{version}")
+async def rollback_index(version: str, request: Request):
+    """
+    IndexとKnowledgeファイルをスナップショットのバージョンに戻す（管理者用）
+    
+    Args:
+        version: KnowledgeのバージョンID
+        
+    Returns:
+        dict: ロールバック結果
+    """
+    require_admin(request)
+    
+    try:
+        result = await run_in_threadpool(get_rag_service().rollback, version)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rolling back index: {str(e)}")
+    
+    if not result["success"]:
+        status_code = 404 if result["message"].startswith("Index snapshot not found") else 500
+        raise HTTPException(status_code=status_code, detail=result["message"])
+    return {"status": "success", **result}
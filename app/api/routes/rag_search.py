@@ -3,8 +3,8 @@ RAG検索APIルート
 """
 import time
 from fastapi import APIRouter, HTTPException
-from app.services.rag_service import rag_service
-from app.services.log_service import log_service
+from app.services.rag_service import get_rag_service
+from app.services.log_service import get_log_service
 from app.models.schemas import (
     RAGSearchRequest, RAGSearchResponse,
     RAGAnswerRequest, RAGAnswerResponse
@@ -32,7 +32,7 @@ async def search_rag(request: RAGSearchRequest):
             raise HTTPException(status_code=400, detail="Query is required")
         
         # 検索を実行
-        result = rag_service.search(
+        result = get_rag_service().search(
             query=request.query.strip(),
             top_k=request.top_k or 5,
         )
@@ -69,7 +69,7 @@ async def generate_answer(request: RAGAnswerRequest):
             raise HTTPException(status_code=400, detail="Query is required")
         
         # 回答を生成
-        result = rag_service.generate_answer(
+        result = get_rag_service().generate_answer(
             query=request.query.strip(),
             case_info=request.case_info,
             top_k=request.top_k or 5,
@@ -97,7 +97,7 @@ async def generate_answer(request: RAGAnswerRequest):
                         "text_preview": sr.get("text", "")[:200] if sr.get("text") else None,
                     })
             
-            log_service.save_rag_log(
+            await get_log_service().save_rag_log_async(
                 case_id=case_id,
                 input_data=request.case_info,
                 rag_queries=[request.query],
@@ -106,9 +106,10 @@ async def generate_answer(request: RAGAnswerRequest):
                 generated_answer=result.get("answer", ""),
                 reasoning=result.get("reasoning", ""),
                 processing_time=processing_time,
-                model_name="gpt-4o-mini",
+                model_name=get_rag_service().model_name,
                 top_k=request.top_k or 5,
                 status="success",
+                metrics=result.get("metrics"),
             )
         except Exception as log_error:
             # ログ保存エラーは無視（本番ではログに記録）
@@ -122,7 +123,7 @@ async def generate_answer(request: RAGAnswerRequest):
         # エラーログを保存
         try:
             error_msg = str(e)
-            log_service.save_rag_log(
+            await get_log_service().save_rag_log_async(
                 case_id=request.case_info.get("case_id") if request.case_info else None,
                 input_data=request.case_info,
                 rag_queries=[request.query] if request.query else [],
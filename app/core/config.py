@@ -9,15 +9,109 @@ from typing import Optional
 class Settings(BaseSettings):
     """アプリケーション設定"""
     
-    # OpenAI API設定
-    openai_api_key: str
+    # OpenAI API設定（llm_provider/embedding_providerがopenaiの場合は必須）
+    openai_api_key: str = ""
+    llm_model: str = "gpt-4o-mini"
+    openai_api_base: Optional[str] = None  # OpenAI互換サーバーのURL（負荷試験用のモックなど）
+    
+    # 埋め込み・LLMのプロバイダ（openai: OpenAI API, local: ローカルの代替実装）
+    embedding_provider: str = "openai"
+    llm_provider: str = "openai"
+    
+    # ローカルプロバイダ設定（負荷試験・CI・ベンチマーク用）
+    local_embedding_dim: int = 256
+    local_llm_latency_distribution: str = "fixed"  # fixed, normal, lognormal
+    local_llm_latency_mean: float = 0.0  # 最初のトークンまでの遅延（秒）
+    local_llm_latency_stddev: float = 0.0
+    local_llm_tokens_per_second: float = 0.0  # 0の場合は生成時間を待機しない
+    local_llm_seed: int = 0
     
     # Knowledgeディレクトリパス
     knowledge_dir: str = "/Users/takuminittono/Desktop/ragstudy/ラグルール/knowledge"
     
+    # Knowledgeファイルの保存先（local: knowledge_dir / sqlite / blob: Azure Blob Storage / blob_local: knowledge_dirをBlobのコンテナとして扱う開発用）
+    knowledge_storage_backend: str = "local"
+    knowledge_sqlite_path: str = "./storage/knowledge.db"  # sqliteの場合のデータベースファイル
+    knowledge_blob_connection_string: str = ""  # blobの場合の接続文字列（Azuriteは UseDevelopmentStorage=true）
+    knowledge_blob_container: str = "knowledge"  # blobの場合のコンテナ名
+    knowledge_blob_prefix: str = ""  # blobの場合のblob名の接頭辞
+    knowledge_prefetch_workers: int = 8  # ファイルをまとめて読み込む際の並列数
+    
+    # Knowledgeディレクトリの変更監視（ファイル一覧のキャッシュの更新）
+    # Linuxではinotify、それ以外ではディレクトリのmtimeをポーリングする
+    # Falseの場合はファイル一覧の取得時にディレクトリのmtimeを確認する
+    knowledge_watch_enabled: bool = True
+    knowledge_watch_poll_interval: float = 2.0  # ポーリングの間隔（秒）
+    knowledge_watch_debounce: float = 0.2  # 続けて発生した変更をまとめる待ち時間（秒）
+    
+    # Knowledgeファイルの変更をIndexへ自動で反映（変更されたファイルのchunkのみ削除・追加）
+    knowledge_auto_reindex: bool = True
+    knowledge_reindex_debounce: float = 2.0  # 最後の変更からこの時間（秒）変更がなければ反映
+    knowledge_reindex_max_delay: float = 30.0  # 変更が続く場合も最初の変更からこの時間（秒）で反映
+    knowledge_reindex_max_retries: int = 3  # 反映に失敗したファイルを反映し直す回数
+    knowledge_reindex_retry_backoff: float = 5.0  # 反映し直すまでの待ち時間（秒、失敗するたびに2倍）
+    
+    # Knowledgeファイルのchunk分割の既定値（structured: 事例・見出し単位 / sentence: 文字数で分割）
+    # ファイル種別ごとの分割方法・サイズは app/services/file_type_profiles.py で指定する
+    # 変更した場合はIndexを再構築すること
+    knowledge_chunker: str = "structured"
+    knowledge_chunk_max_tokens: int = 400  # 1つのchunkのトークン数の上限（ファイル種別のプロファイルで指定がない場合）
+    
+    # Index作成時、ほぼ同じ内容のchunk（MinHashの推定Jaccard係数がしきい値以上）を1つの代表chunkに集約する
+    knowledge_dedup_enabled: bool = True
+    knowledge_dedup_threshold: float = 0.85
+    
+    # 検索時、ファイル種別ごとの件数の上限で除外される分を見込んで top_k のこの倍数の候補を取得する
+    search_candidate_multiplier: int = 3
+    # キーワード検索のみの種別（見積書のひな形など）を検索結果に含める一致率（クエリの文字bigramのうち含まれる割合）の下限
+    search_lexical_min_score: float = 0.5
+    
+    # 2段階検索（ファイルごとの要約ベクトルで上位のファイルを選び、そのファイルのchunkのみを検索）
+    search_two_stage: bool = True
+    search_top_files: int = 32  # 1段目で選ぶファイル数（少ないほど速いが、取りこぼしが増える）
+    
+    # Knowledgeファイル内容のキャッシュ（合計サイズの上限、バイト、0の場合はキャッシュしない）
+    knowledge_content_cache_bytes: int = 33554432  # 32MB
+    
+    # Knowledgeファイルの一括アップロード（zipまたは複数ファイル）
+    knowledge_upload_max_files: int = 200  # 1回のアップロードのファイル数の上限
+    knowledge_upload_max_bytes: int = 52428800  # 1回のアップロードの合計サイズの上限（zipは展開後、50MB）
+    
+    # Knowledgeファイルのバージョン管理（内容をハッシュ別に保存し、Indexの保存ごとにスナップショットを作成）
+    knowledge_versioning_enabled: bool = True
+    knowledge_store_dir: str = "./storage/knowledge"  # blob・マニフェストの保存先
+    index_snapshot_dir: str = "./storage/index_snapshots"  # Indexのスナップショットの保存先
+    index_snapshot_keep: int = 5  # 残すIndexのスナップショットの数
+    
     # データベース設定
     database_url: str = "sqlite:///./rag_kanri.db"
     
+    # 接続プール（SQLite・PostgreSQL共通）
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0  # 空き接続を待つ時間（秒）
+    db_pool_recycle: int = 1800  # 接続を再作成するまでの時間（秒、PostgreSQLのみ）
+    
+    # SQLiteのPRAGMA（接続ごとに設定）
+    sqlite_journal_mode: str = "WAL"  # WAL: 書き込み中も読み込み可能
+    sqlite_synchronous: str = "NORMAL"  # WALではNORMALでもコミット済みデータは失われない（電源断時を除く）
+    sqlite_mmap_size: int = 268435456  # 256MB
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size: int = -20000  # 負の値はKB単位（約20MB）
+    
+    # RAGログのバックグラウンド書き込み
+    # Falseの場合はリクエスト処理の中で1件ずつ同期的に書き込む
+    log_writer_enabled: bool = True
+    log_writer_queue_size: int = 1000  # 書き込み待ちの最大件数
+    log_writer_batch_size: int = 50  # 1トランザクションで書き込む最大件数
+    log_writer_flush_interval: float = 1.0  # 書き込み間隔の上限（秒）
+    log_writer_enqueue_timeout: float = 0.5  # キューが満杯の場合の待機時間（秒、超えた場合は同期的に書き込む）
+    
+    # RAGログのアーカイブ（古いログをDBから日付別の圧縮ファイルへ移動）
+    log_retention_days: int = 90  # DBに残す日数
+    log_archive_dir: str = "./storage/log_archive"
+    log_archive_batch_size: int = 1000  # 1トランザクションで移動する最大件数
+    
     # 管理者認証（PoC簡易版）
     admin_password: str = "admin123"
     
@@ -30,6 +124,10 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
     
+    # 起動時にサービス（Knowledge/RAG/書類生成/ログ）を事前に生成するか
+    # Falseの場合は各サービスの初回使用時に生成する
+    service_warmup: bool = True
+    
     class Config:
         env_file = [".env.local", ".env"]  # .env.localを優先的に読み込む
         env_file_encoding = "utf-8"
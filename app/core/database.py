@@ -1,22 +1,166 @@
 """
 データベース接続管理
 """
-from sqlalchemy import create_engine, Column, Integer, String, Text, Float, DateTime, JSON
+from sqlalchemy import create_engine, event, Column, ForeignKey, Index, LargeBinary, Integer, String, Text, Float, DateTime, JSON, Boolean
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from app.core.config import settings
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.config import settings, Settings
 from datetime import datetime
+from typing import AsyncIterator, Optional
 import json
 
-# SQLiteデータベースエンジン作成
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False}  # SQLite用
-)
+
+# 非同期エンジンで使用するドライバ（DB種別ごと）
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+
+def _apply_sqlite_pragmas(dbapi_connection, config: Settings, in_memory: bool):
+    """
+    SQLiteの接続ごとにPRAGMAを設定
+
+    Args:
+        dbapi_connection: DBAPIの接続
+        config: 設定
+        in_memory: インメモリDBの場合True（WAL・mmapは使用できない）
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        # ロック待ちでエラーにせず、指定時間まで待機する
+        cursor.execute(f"PRAGMA busy_timeout={int(config.sqlite_busy_timeout_ms)}")
+        if not in_memory:
+            # WAL: 書き込み中も読み込みをブロックしない
+            cursor.execute(f"PRAGMA journal_mode={config.sqlite_journal_mode}")
+            cursor.execute(f"PRAGMA mmap_size={int(config.sqlite_mmap_size)}")
+        # NORMAL: WALではコミットごとのfsyncを行わない（チェックポイント時のみ）
+        cursor.execute(f"PRAGMA synchronous={config.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA cache_size={int(config.sqlite_cache_size)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+def create_db_engine(database_url: Optional[str] = None, config: Optional[Settings] = None) -> Engine:
+    """
+    データベースURLに応じて接続プール・PRAGMAを設定したエンジンを作成
+
+    Args:
+        database_url: データベースURL（省略時は設定値）
+        config: 設定（省略時はグローバル設定）
+
+    Returns:
+        Engine: SQLAlchemyのエンジン
+    """
+    config = config or settings
+    database_url = database_url or config.database_url
+    url = make_url(database_url)
+
+    if url.get_backend_name() == "sqlite":
+        in_memory = url.database in (None, "", ":memory:")
+        if in_memory:
+            # インメモリDBは接続ごとに別のDBになるため、プールの設定は行わない
+            engine = create_engine(database_url, connect_args={"check_same_thread": False})
+        else:
+            engine = create_engine(
+                database_url,
+                connect_args={
+                    "check_same_thread": False,  # スレッド間で接続を共有するため
+                    "timeout": config.sqlite_busy_timeout_ms / 1000,
+                },
+                pool_size=config.db_pool_size,
+                max_overflow=config.db_max_overflow,
+                pool_timeout=config.db_pool_timeout,
+            )
+
+        @event.listens_for(engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            _apply_sqlite_pragmas(dbapi_connection, config, in_memory)
+
+        return engine
+
+    # PostgreSQLなどのサーバー型DB
+    return create_engine(
+        database_url,
+        pool_size=config.db_pool_size,
+        max_overflow=config.db_max_overflow,
+        pool_timeout=config.db_pool_timeout,
+        pool_recycle=config.db_pool_recycle,  # サーバー側で切断された接続を使い続けない
+        pool_pre_ping=True,
+    )
+
+
+def create_async_db_engine(database_url: Optional[str] = None, config: Optional[Settings] = None) -> AsyncEngine:
+    """
+    非同期ドライバ（aiosqlite / asyncpg）のエンジンを作成
+
+    データベースURLのドライバ指定は無視し、DB種別に対応する非同期ドライバに置き換える
+    （DATABASE_URLは同期エンジンと共通）。
+
+    Args:
+        database_url: データベースURL（省略時は設定値）
+        config: 設定（省略時はグローバル設定）
+
+    Returns:
+        AsyncEngine: SQLAlchemyの非同期エンジン
+
+    Raises:
+        ValueError: 非同期ドライバに対応していないDB種別の場合
+    """
+    config = config or settings
+    url = make_url(database_url or config.database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver for database backend: {backend}")
+    url = url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+    if backend == "sqlite":
+        in_memory = url.database in (None, "", ":memory:")
+        if in_memory:
+            # インメモリDBは接続ごとに別のDBになる（同期エンジンのDBとも共有されない）
+            engine = create_async_engine(url)
+        else:
+            # aiosqliteの既定はNullPool（毎回接続してPRAGMAを設定し直す）のため、プールを指定する
+            engine = create_async_engine(
+                url,
+                connect_args={"timeout": config.sqlite_busy_timeout_ms / 1000},
+                poolclass=AsyncAdaptedQueuePool,
+                pool_size=config.db_pool_size,
+                max_overflow=config.db_max_overflow,
+                pool_timeout=config.db_pool_timeout,
+            )
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            _apply_sqlite_pragmas(dbapi_connection, config, in_memory)
+
+        return engine
+
+    return create_async_engine(
+        url,
+        pool_size=config.db_pool_size,
+        max_overflow=config.db_max_overflow,
+        pool_timeout=config.db_pool_timeout,
+        pool_recycle=config.db_pool_recycle,
+        pool_pre_ping=True,
+    )
+
+
+# データベースエンジン作成
+engine = create_db_engine()
 
 # セッション作成
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 非同期エンジン・セッション作成（async def のルートからDBを使う場合）
+# expire_on_commit=False: コミット後に属性を参照しても再読み込み（暗黙のI/O）を行わない
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 # Baseクラス
 Base = declarative_base()
 
@@ -31,21 +175,109 @@ class RAGLog(Base):
     case_id = Column(String, nullable=True, index=True)
     status = Column(String, default="success", nullable=False)  # success, failed
     error_message = Column(Text, nullable=True)  # エラーメッセージ
-    input_data = Column(JSON, nullable=True)  # 案件情報など
+    input_data = Column(JSON, nullable=True)  # 案件情報など（新しいログはrag_log_payloadsに保存）
     rag_queries = Column(JSON, nullable=True)  # 検索クエリのリスト
     referenced_files = Column(JSON, nullable=True)  # 参照ファイル名のリスト
-    search_results = Column(JSON, nullable=True)  # 検索結果の詳細（チャンクID、スコアなど）
-    generated_answer = Column(Text, nullable=True)
-    reasoning = Column(Text, nullable=True)  # 判断理由
+    referenced_files_count = Column(Integer, nullable=True)  # 参照ファイル数（一覧表示用に保存時に計算）
+    search_results = Column(JSON, nullable=True)  # 検索結果の詳細（新しいログはrag_log_payloadsに保存）
+    generated_answer = Column(Text, nullable=True)  # 新しいログはrag_log_payloadsに保存
+    reasoning = Column(Text, nullable=True)  # 判断理由（新しいログはrag_log_payloadsに保存）
     processing_time = Column(Float, nullable=True)  # 処理時間（秒）
     model_name = Column(String, nullable=True)
     top_k = Column(Integer, nullable=True)  # 検索結果の数
+    
+    # ステージ別処理時間（秒）
+    embed_time = Column(Float, nullable=True)  # クエリ埋め込み
+    retrieve_time = Column(Float, nullable=True)  # ベクトル検索
+    prompt_build_time = Column(Float, nullable=True)  # 事例番号抽出・プロンプト作成
+    llm_time = Column(Float, nullable=True)  # LLMによる回答生成
+    postprocess_time = Column(Float, nullable=True)  # 判断理由の抽出（正規表現）
+    
+    # トークン数・キャッシュ
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    embedding_tokens = Column(Integer, nullable=True)
+    index_cache_hit = Column(Boolean, nullable=True)  # Indexがメモリ上にあったか
+    
+    # ログ一覧のフィルタ・並び順（timestamp DESC）に対応する複合インデックス
+    # 既存DBにはマイグレーション（002）で作成する
+    __table_args__ = (
+        Index("ix_rag_logs_timestamp", "timestamp"),
+        Index("ix_rag_logs_user_id_timestamp", "user_id", "timestamp"),
+        Index("ix_rag_logs_case_id_timestamp", "case_id", "timestamp"),
+        Index("ix_rag_logs_status_timestamp", "status", "timestamp"),
+    )
+
+
+class RAGLogPayload(Base):
+    """ログの大きな項目（回答本文・判断理由・検索結果・案件情報）を圧縮して保存するテーブル"""
+    __tablename__ = "rag_log_payloads"
+    
+    log_id = Column(Integer, ForeignKey("rag_logs.id", ondelete="CASCADE"), primary_key=True)
+    codec = Column(String, nullable=False)  # 圧縮形式（zlib）
+    data = Column(LargeBinary, nullable=False)  # 項目をまとめたJSONの圧縮データ
+    raw_size = Column(Integer, nullable=False)  # 圧縮前のサイズ（バイト）
+
+
+class RAGLogArchive(Base):
+    """アーカイブ済みログのマニフェスト（アーカイブファイル1つにつき1行）"""
+    __tablename__ = "rag_log_archives"
+    
+    id = Column(Integer, primary_key=True)
+    partition_date = Column(String, nullable=False, index=True)  # YYYY-MM-DD（ログのtimestampの日付）
+    file_path = Column(String, nullable=False)  # アーカイブディレクトリからの相対パス
+    min_log_id = Column(Integer, nullable=False)
+    max_log_id = Column(Integer, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    size_bytes = Column(Integer, nullable=False)  # 圧縮後のファイルサイズ
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_rag_log_archives_log_id_range", "min_log_id", "max_log_id"),
+    )
+
+
+class RAGLogHourlyStat(Base):
+    """ログの時間別集計（ログ保存時に加算して更新）"""
+    __tablename__ = "rag_log_hourly_stats"
+    
+    hour = Column(DateTime, primary_key=True)  # 時刻（分以下を切り捨て、UTC）
+    model_name = Column(String, primary_key=True)  # モデル名がない場合は空文字
+    status = Column(String, primary_key=True)
+    request_count = Column(Integer, nullable=False, default=0)
+    processing_time_count = Column(Integer, nullable=False, default=0)  # 処理時間が記録されたログの件数
+    processing_time_sum = Column(Float, nullable=False, default=0.0)
+    processing_time_max = Column(Float, nullable=True)
+    prompt_tokens_sum = Column(Integer, nullable=False, default=0)
+    completion_tokens_sum = Column(Integer, nullable=False, default=0)
+
+
+class RAGLogHourlyLatency(Base):
+    """処理時間のヒストグラム（時間別、p95の計算用）"""
+    __tablename__ = "rag_log_hourly_latency"
+    
+    hour = Column(DateTime, primary_key=True)
+    model_name = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    bucket = Column(Integer, primary_key=True)  # LATENCY_BUCKETSのインデックス
+    count = Column(Integer, nullable=False, default=0)
+
+
+class RAGLogHourlyFile(Base):
+    """Knowledgeファイルの参照回数（時間別）"""
+    __tablename__ = "rag_log_hourly_files"
+    
+    hour = Column(DateTime, primary_key=True)
+    file_name = Column(String, primary_key=True)
+    reference_count = Column(Integer, nullable=False, default=0)
 
 
 # データベース初期化
 def init_db():
-    """データベースとテーブルを作成"""
+    """データベースとテーブルを作成し、未適用のマイグレーションを実行"""
+    from app.core.migrations import run_migrations
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
 
 
 # データベースセッション取得
@@ -57,3 +289,9 @@ def get_db():
     finally:
         db.close()
 
+
+# 非同期データベースセッション取得
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """非同期データベースセッションを取得（FastAPIの依存関数）"""
+    async with AsyncSessionLocal() as db:
+        yield db
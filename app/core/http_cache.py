@@ -0,0 +1,50 @@
+"""
+HTTPの条件付きリクエスト（ETag / If-None-Match）
+"""
+from email.utils import formatdate
+from typing import Dict, Optional
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-MatchヘッダーがETagに一致するか（弱い比較）
+
+    Args:
+        if_none_match: If-None-Matchヘッダーの値
+        etag: 現在のETag
+
+    Returns:
+        bool: 一致する場合True（304を返す）
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-MatchはW/付きのETagも同じものとして比較する
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def validator_headers(etag: str, updated_at: float) -> Dict[str, str]:
+    """
+    レスポンスに付けるキャッシュ検証用のヘッダー
+
+    Args:
+        etag: ETag
+        updated_at: 最終更新日時（Unix timestamp）
+
+    Returns:
+        Dict[str, str]: ETag, Last-Modified, Cache-Control
+    """
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(updated_at, usegmt=True),
+        # ブラウザにはキャッシュさせるが、使う前に毎回確認させる（変更がなければ304）
+        "Cache-Control": "no-cache",
+    }
@@ -0,0 +1,158 @@
+"""
+メトリクス計測（Prometheus形式）
+"""
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+
+# ステージ別処理時間（埋め込み、検索、LLM、後処理など）
+RAG_STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds",
+    "RAG処理のステージ別処理時間（秒）",
+    ["operation", "stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+
+# 1リクエストあたりのトークン数
+RAG_TOKENS = Histogram(
+    "rag_tokens_per_request",
+    "1リクエストあたりのトークン数",
+    ["kind"],  # prompt, completion, embedding
+    buckets=(16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768),
+)
+
+# キャッシュ参照回数
+CACHE_REQUESTS = Counter(
+    "rag_cache_requests_total",
+    "キャッシュ参照回数",
+    ["cache", "result"],  # result: hit, miss
+)
+
+# ログのバックグラウンド書き込み
+LOG_WRITER_EVENTS = Counter(
+    "rag_log_writer_events_total",
+    "ログ書き込みの件数",
+    ["event"],  # enqueued, written, sync_fallback, failed
+)
+
+LOG_WRITER_QUEUE_DEPTH = Gauge(
+    "rag_log_writer_queue_depth",
+    "書き込み待ちのログ件数",
+)
+
+LOG_WRITER_BATCH_SECONDS = Histogram(
+    "rag_log_writer_batch_duration_seconds",
+    "ログ1バッチの書き込み時間（秒）",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+
+class StageTimer:
+    """ステージ別処理時間の計測"""
+
+    def __init__(self, operation: str):
+        """
+        Args:
+            operation: 計測対象の処理名（search, answerなど）
+        """
+        self.operation = operation
+        self.timings: Dict[str, float] = {}
+        self._stage_started_at: Dict[str, float] = {}
+        self._started_at = time.perf_counter()
+
+    def start(self, name: str):
+        """
+        ステージの計測を開始
+
+        Args:
+            name: ステージ名
+        """
+        self._stage_started_at[name] = time.perf_counter()
+
+    def stop(self, name: str) -> float:
+        """
+        ステージの計測を終了してヒストグラムに記録
+
+        Args:
+            name: ステージ名
+
+        Returns:
+            float: ステージの処理時間（秒）
+        """
+        elapsed = time.perf_counter() - self._stage_started_at.pop(name)
+        # 同じステージが複数回実行された場合は合算
+        self.timings[name] = self.timings.get(name, 0.0) + elapsed
+        RAG_STAGE_SECONDS.labels(self.operation, name).observe(elapsed)
+        return elapsed
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        withブロック内の処理時間を計測
+
+        Args:
+            name: ステージ名
+        """
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    def add(self, name: str, elapsed: float):
+        """
+        別の場所で計測済みの処理時間を追加（ヒストグラムには記録済みのもの）
+
+        Args:
+            name: ステージ名
+            elapsed: 処理時間（秒）
+        """
+        self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    def finish(self) -> float:
+        """
+        全体の処理時間を記録
+
+        Returns:
+            float: 全体の処理時間（秒）
+        """
+        total = time.perf_counter() - self._started_at
+        RAG_STAGE_SECONDS.labels(self.operation, "total").observe(total)
+        return total
+
+
+def record_tokens(prompt_tokens: int, completion_tokens: int, embedding_tokens: int):
+    """
+    トークン数をヒストグラムに記録
+
+    Args:
+        prompt_tokens: プロンプトのトークン数
+        completion_tokens: 生成結果のトークン数
+        embedding_tokens: 埋め込み対象のトークン数
+    """
+    RAG_TOKENS.labels("prompt").observe(prompt_tokens)
+    RAG_TOKENS.labels("completion").observe(completion_tokens)
+    RAG_TOKENS.labels("embedding").observe(embedding_tokens)
+
+
+def record_cache(cache: str, hit: bool):
+    """
+    キャッシュのヒット/ミスを記録
+
+    Args:
+        cache: キャッシュ名
+        hit: ヒットした場合True
+    """
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Prometheusのテキスト形式でメトリクスを出力
+
+    Returns:
+        Tuple[bytes, str]: メトリクス本文とContent-Type
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
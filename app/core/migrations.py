@@ -0,0 +1,237 @@
+"""
+データベースマイグレーション（簡易版）
+
+create_allでは既存テーブルへのカラム追加やインデックス作成が行われないため、
+スキーマ変更はここにバージョン順で追加する。各マイグレーションは
+新規DB（create_all直後）に対しても安全に実行できるようにしておくこと。
+"""
+import json
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+
+def _add_missing_columns(conn: Connection, table: str, columns: Dict[str, str]):
+    """
+    存在しないカラムのみ追加
+
+    Args:
+        conn: DB接続
+        table: テーブル名
+        columns: カラム名と型（DDL）の辞書
+    """
+    existing = {column["name"] for column in inspect(conn).get_columns(table)}
+    for name, ddl_type in columns.items():
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl_type}"))
+
+
+def _create_missing_indexes(conn: Connection, table: str, indexes: Dict[str, List[str]]):
+    """
+    存在しないインデックスのみ作成
+
+    Args:
+        conn: DB接続
+        table: テーブル名
+        indexes: インデックス名とカラム名のリストの辞書
+    """
+    existing = {index["name"] for index in inspect(conn).get_indexes(table)}
+    for name, columns in indexes.items():
+        if name not in existing:
+            conn.execute(text(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})"))
+
+
+def _migration_001_stage_metrics(conn: Connection):
+    """rag_logsにステージ別処理時間・トークン数・キャッシュヒットのカラムを追加"""
+    _add_missing_columns(conn, "rag_logs", {
+        "embed_time": "FLOAT",
+        "retrieve_time": "FLOAT",
+        "prompt_build_time": "FLOAT",
+        "llm_time": "FLOAT",
+        "postprocess_time": "FLOAT",
+        "prompt_tokens": "INTEGER",
+        "completion_tokens": "INTEGER",
+        "embedding_tokens": "INTEGER",
+        "index_cache_hit": "BOOLEAN",
+    })
+
+
+def _migration_002_log_list_indexes(conn: Connection):
+    """rag_logsにログ一覧のフィルタ・並び順用の複合インデックスを作成"""
+    _create_missing_indexes(conn, "rag_logs", {
+        "ix_rag_logs_timestamp": ["timestamp"],
+        "ix_rag_logs_user_id_timestamp": ["user_id", "timestamp"],
+        "ix_rag_logs_case_id_timestamp": ["case_id", "timestamp"],
+        "ix_rag_logs_status_timestamp": ["status", "timestamp"],
+    })
+
+
+def _migration_003_referenced_files_count(conn: Connection):
+    """rag_logsに参照ファイル数のカラムを追加し、既存のログから計算して設定"""
+    _add_missing_columns(conn, "rag_logs", {"referenced_files_count": "INTEGER"})
+
+    # JSON関数はDBごとに異なるため、Python側で数えて更新する
+    rows = conn.execute(text(
+        "SELECT id, referenced_files FROM rag_logs WHERE referenced_files_count IS NULL"
+    )).all()
+    updates = []
+    for log_id, referenced_files in rows:
+        if isinstance(referenced_files, str):
+            try:
+                referenced_files = json.loads(referenced_files)
+            except ValueError:
+                referenced_files = None
+        count = len(referenced_files) if isinstance(referenced_files, list) else 0
+        updates.append({"id": log_id, "count": count})
+    if updates:
+        conn.execute(text("UPDATE rag_logs SET referenced_files_count = :count WHERE id = :id"), updates)
+
+
+def _migration_004_log_rollups(conn: Connection):
+    """既存のログから時間別の集計テーブルを作成（テーブル自体はcreate_allで作成済み）"""
+    from app.services.log_stats_service import apply_rollups
+
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, timestamp, model_name, status, processing_time, referenced_files, "
+            "prompt_tokens, completion_tokens FROM rag_logs WHERE id > :last_id ORDER BY id LIMIT 1000"
+        ), {"last_id": last_id}).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        batch = []
+        for row in rows:
+            row = dict(row._mapping)
+            # text()の結果は型変換されないため、日時・JSONを変換する
+            if isinstance(row["timestamp"], str):
+                row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+            if isinstance(row["referenced_files"], str):
+                try:
+                    row["referenced_files"] = json.loads(row["referenced_files"])
+                except ValueError:
+                    row["referenced_files"] = None
+            batch.append(row)
+        apply_rollups(conn, batch)
+
+
+def _migration_005_log_payloads(conn: Connection):
+    """既存のログの大きな項目を圧縮してrag_log_payloadsへ移動（テーブル自体はcreate_allで作成済み）"""
+    from sqlalchemy import insert, select, update
+    from app.core.database import RAGLog, RAGLogPayload
+    from app.services.log_payloads import PAYLOAD_FIELDS, split_payload
+
+    table = RAGLog.__table__
+    has_payload = (
+        table.c.input_data.isnot(None)
+        | table.c.search_results.isnot(None)
+        | table.c.generated_answer.isnot(None)
+        | table.c.reasoning.isnot(None)
+    )
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(table.c.id, *[table.c[name] for name in PAYLOAD_FIELDS])
+            .where(table.c.id > last_id, has_payload)
+            .order_by(table.c.id)
+            .limit(500)
+        ).mappings().all()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        payloads = []
+        for row in rows:
+            _, payload = split_payload(dict(row))
+            if payload is not None:
+                payloads.append({"log_id": row["id"], **payload})
+        if payloads:
+            conn.execute(insert(RAGLogPayload), payloads)
+        conn.execute(
+            update(table)
+            .where(table.c.id.in_([row["id"] for row in rows]))
+            .values({name: None for name in PAYLOAD_FIELDS})
+        )
+
+
+def _migration_006_log_fts(conn: Connection):
+    """ログの全文検索用のFTS5テーブルを作成し、既存のログを索引に追加（SQLiteのみ）"""
+    from sqlalchemy import insert, select
+    from app.core.database import RAGLog, RAGLogPayload
+    from app.services.log_payloads import PAYLOAD_FIELDS, decode_payload
+    from app.services.log_search_service import create_fts_table, rag_logs_fts, build_document
+
+    if not create_fts_table(conn):
+        return
+
+    table = RAGLog.__table__
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(table.c.id, table.c.rag_queries, *[table.c[name] for name in PAYLOAD_FIELDS])
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(500)
+        ).mappings().all()
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        payloads = {
+            payload.log_id: decode_payload(payload.codec, payload.data)
+            for payload in conn.execute(
+                select(RAGLogPayload).where(RAGLogPayload.log_id.in_([row["id"] for row in rows]))
+            )
+        }
+        documents = []
+        for row in rows:
+            document = build_document({**row, **payloads.get(row["id"], {})})
+            if any(document.values()):
+                documents.append({"rowid": row["id"], **document})
+        if documents:
+            conn.execute(insert(rag_logs_fts), documents)
+
+
+# (バージョン, 説明, 適用関数) のリスト（バージョン順）
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "rag_logs stage metrics columns", _migration_001_stage_metrics),
+    (2, "rag_logs list indexes", _migration_002_log_list_indexes),
+    (3, "rag_logs referenced_files_count column", _migration_003_referenced_files_count),
+    (4, "rag_logs hourly rollups backfill", _migration_004_log_rollups),
+    (5, "move rag_logs payloads to rag_log_payloads", _migration_005_log_payloads),
+    (6, "rag_logs full-text search index", _migration_006_log_fts),
+]
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """
+    未適用のマイグレーションを実行
+
+    Args:
+        engine: SQLAlchemyエンジン
+
+    Returns:
+        List[int]: 今回適用したマイグレーションのバージョン
+    """
+    applied_now = []
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "description VARCHAR NOT NULL, "
+            "applied_at TIMESTAMP NOT NULL)"
+        ))
+        applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+        for version, description, migrate in MIGRATIONS:
+            if version in applied:
+                continue
+            migrate(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": version, "d": description, "t": datetime.utcnow()},
+            )
+            applied_now.append(version)
+
+    return applied_now
@@ -0,0 +1,115 @@
+"""
+サービスレジストリ（初回使用時の遅延生成・起動時ウォームアップ）
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+class ServiceRegistry:
+    """サービスの生成をimport時ではなく初回使用時（またはウォームアップ時）に行う"""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._timings: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """
+        サービスの生成関数を登録
+
+        Args:
+            name: サービス名
+            factory: インスタンスを生成する関数（引数なし）
+        """
+        with self._lock:
+            self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        """
+        サービスのインスタンスを取得（未生成の場合は生成）
+
+        Args:
+            name: サービス名
+
+        Returns:
+            Any: サービスのインスタンス
+
+        Raises:
+            KeyError: 登録されていないサービス名の場合
+        """
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            # 他のスレッドが先に生成している場合
+            if name in self._instances:
+                return self._instances[name]
+
+            factory = self._factories[name]
+            start = time.perf_counter()
+            instance = factory()
+            elapsed = time.perf_counter() - start
+
+            self._instances[name] = instance
+            self._timings[name] = elapsed
+            print(f"[startup] {name} initialized in {elapsed * 1000:.1f}ms")
+            return instance
+
+    def warm_up(self, names: Optional[List[str]] = None) -> Dict[str, Optional[float]]:
+        """
+        サービスを事前に生成（失敗したサービスは初回使用時に再度生成を試みる）
+
+        Args:
+            names: 生成するサービス名（省略時は登録済みの全サービス）
+
+        Returns:
+            Dict[str, Optional[float]]: サービス名ごとの生成時間（秒、失敗時はNone）
+        """
+        results: Dict[str, Optional[float]] = {}
+        for name in names or list(self._factories):
+            try:
+                self.get(name)
+                results[name] = self._timings.get(name)
+            except Exception as e:
+                print(f"[startup] {name} failed to initialize: {e}")
+                results[name] = None
+        return results
+
+    def is_initialized(self, name: str) -> bool:
+        """
+        サービスが生成済みか確認
+
+        Args:
+            name: サービス名
+
+        Returns:
+            bool: 生成済みの場合True
+        """
+        return name in self._instances
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        """サービス名ごとの生成時間（秒）"""
+        return dict(self._timings)
+
+    def reset(self, name: Optional[str] = None):
+        """
+        生成済みのインスタンスを破棄（次回取得時に再生成）
+
+        Args:
+            name: サービス名（省略時は全サービス）
+        """
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+                self._timings.clear()
+            else:
+                self._instances.pop(name, None)
+                self._timings.pop(name, None)
+
+
+# グローバルレジストリ
+registry = ServiceRegistry()
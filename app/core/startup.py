@@ -0,0 +1,98 @@
+"""
+起動処理（DB初期化・サービスのウォームアップ）と起動時間の計測
+"""
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+from app.core.database import init_db
+from app.core.registry import registry
+
+
+def initialize(warm_up: bool = True) -> Dict[str, Optional[float]]:
+    """
+    アプリケーションの起動処理
+
+    Args:
+        warm_up: Trueの場合、登録済みのサービスを事前に生成する
+
+    Returns:
+        Dict[str, Optional[float]]: 処理ごとの所要時間（秒、失敗時はNone）
+    """
+    timings: Dict[str, Optional[float]] = {}
+
+    start = time.perf_counter()
+    init_db()
+    timings["database"] = time.perf_counter() - start
+    print(f"[startup] database initialized in {timings['database'] * 1000:.1f}ms")
+
+    if warm_up:
+        timings.update(registry.warm_up())
+
+    return timings
+
+
+def _measure_imports(module: str) -> List[Tuple[str, int, int]]:
+    """
+    新しいPythonプロセスでモジュールをimportし、-X importtimeの結果を取得
+
+    Args:
+        module: importするモジュール名
+
+    Returns:
+        List[Tuple[str, int, int]]: (モジュール名, 自身の時間[us], 累積時間[us]) のリスト
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.getcwd(),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Failed to import {module}:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        # 形式: "import time:       123 |        456 |   package.module"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            entries.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return entries
+
+
+def profile_startup(top: int = 15):
+    """
+    起動コスト（import時間・初期化時間）を計測して表示
+
+    Args:
+        top: 表示するモジュール数
+    """
+    print("== Import cost (python -X importtime -c 'import app.main') ==")
+    entries = _measure_imports("app.main")
+    total_us = next((cumulative for name, _, cumulative in entries if name == "app.main"), 0)
+    print(f"app.main total: {total_us / 1000:.1f}ms")
+
+    # トップレベルのパッケージごとに自身の時間を合算
+    by_package: Dict[str, int] = {}
+    for name, self_us, _ in entries:
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    print(f"-- top {top} packages (self time) --")
+    for package, self_us in sorted(by_package.items(), key=lambda x: x[1], reverse=True)[:top]:
+        print(f"  {package:<40}{self_us / 1000:>10.1f}ms")
+
+    print("-- app modules (cumulative) --")
+    for name, _, cumulative_us in sorted(entries, key=lambda x: x[2], reverse=True):
+        if name.startswith("app."):
+            print(f"  {name:<40}{cumulative_us / 1000:>10.1f}ms")
+
+    print("== Initialization cost ==")
+    timings = initialize(warm_up=True)
+    for name, elapsed in timings.items():
+        status = "failed" if elapsed is None else f"{elapsed * 1000:.1f}ms"
+        print(f"  {name:<40}{status:>10}")
@@ -1,18 +1,36 @@
 """
 FastAPIアプリケーション
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import JSONResponse, HTMLResponse, Response
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import async_engine
+from app.core.metrics import render_metrics
+from app.core.registry import registry
+from app.core.startup import initialize
 from app.api.routes import knowledge, rag_index, rag_search, admin_auth, admin_knowledge, admin_logs, documents
 import uvicorn
 
-# データベース初期化
-init_db()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """起動時にDB初期化とサービスのウォームアップを行う（import時には何も生成しない）"""
+    initialize(warm_up=settings.service_warmup)
+    yield
+    # 書き込み待ちのRAGログを保存してから終了する
+    if registry.is_initialized("log_service"):
+        registry.get("log_service").close()
+    if registry.is_initialized("rag_service"):
+        registry.get("rag_service").close()
+    if registry.is_initialized("knowledge_service"):
+        registry.get("knowledge_service").close()
+    # 非同期エンジンの接続を閉じる
+    await async_engine.dispose()
+
 
 # FastAPIアプリケーション初期化
 app = FastAPI(
@@ -20,6 +38,7 @@ app = FastAPI(
     description="RAGを活用した貯水槽修理案件の判断支援Webアプリケーション",
     version="0.1.0",
     debug=settings.debug,
+    lifespan=lifespan,
 )
 
 # テンプレートと静的ファイルの設定
@@ -70,6 +89,14 @@ async def health_check():
     }
 
 
+# メトリクスエンドポイント（Prometheus）
+@app.get("/metrics")
+async def metrics():
+    """ステージ別処理時間・トークン数・キャッシュヒットのメトリクス"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 # ルートエンドポイント（HTMLページ）
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
@@ -101,10 +128,24 @@ async def admin_page(request: Request):
 
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "app.main:app",
-        host=settings.host,
-        port=settings.port,
-        reload=settings.debug,
+    import argparse
+    
+    parser = argparse.ArgumentParser(description=settings.app_name)
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="サーバーを起動せず、import時間と初期化時間を計測して表示する",
     )
+    args = parser.parse_args()
+    
+    if args.profile_startup:
+        from app.core.startup import profile_startup
+        profile_startup()
+    else:
+        uvicorn.run(
+            "app.main:app",
+            host=settings.host,
+            port=settings.port,
+            reload=settings.debug,
+        )
 
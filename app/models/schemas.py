@@ -36,6 +36,7 @@ class RAGSearchResult(BaseModel):
     file_name: str
     file_type: str
     chunk_index: int
+    source_files: List[str] = []  # 同じ内容のchunkを含むファイル（重複として集約したファイルを含む）
 
 
 class RAGSearchResponse(BaseModel):
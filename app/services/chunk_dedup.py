@@ -0,0 +1,123 @@
+"""
+chunkの重複（ほぼ同じ内容）の検出（MinHash + LSH）
+
+免責事項・業者の連絡先・法令の抜粋など、複数のKnowledgeファイルに繰り返し現れる文章は、
+同じ内容のchunkが検索結果の枠を埋めてしまう。Index作成時にchunkの文字n-gram（shingle）から
+MinHashの署名を計算し、LSH（署名をバンドに分けたバケット）で候補を絞り込んだうえで、
+推定Jaccard係数がしきい値以上のchunkを既存の代表chunkの重複とみなす。
+"""
+import re
+import zlib
+from typing import Dict, Hashable, List, Optional, Tuple
+import numpy as np
+
+
+# 署名の長さ（ハッシュ関数の数）とLSHのバンド数（1バンド = NUM_PERM / NUM_BANDS 行）
+NUM_PERM = 64
+NUM_BANDS = 16
+
+_MASK = np.uint64(0xFFFFFFFF)
+_WHITESPACE = re.compile(r"\s+")
+
+
+class MinHashDeduplicator:
+    """代表chunkの署名を保持し、追加するchunkがいずれかの代表chunkの重複か判定する"""
+
+    def __init__(self, threshold: float = 0.85, shingle_size: int = 5, seed: int = 1):
+        """
+        Args:
+            threshold: 重複とみなす推定Jaccard係数
+            shingle_size: shingle（文字n-gram）の文字数
+            seed: ハッシュ関数の乱数シード（同じ値なら同じ署名になる）
+        """
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # h(x) = (a * x + b) mod 2^32（aは奇数）
+        self._a = rng.integers(1, 2 ** 32, size=NUM_PERM, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+        self._rows = NUM_PERM // NUM_BANDS
+        self._signatures: Dict[Hashable, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, List[Hashable]]] = [{} for _ in range(NUM_BANDS)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        テキストのMinHash署名
+
+        Args:
+            text: chunkのテキスト（空白は無視する）
+
+        Returns:
+            np.ndarray: 署名（NUM_PERM個のuint64）
+        """
+        text = _WHITESPACE.sub("", text)
+        size = self.shingle_size
+        shingles = {text[i:i + size] for i in range(max(len(text) - size + 1, 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        return (((hashes[:, None] * self._a) + self._b) & _MASK).min(axis=0)
+
+    def find(self, signature: np.ndarray) -> Optional[Tuple[Hashable, float]]:
+        """
+        署名が近い代表chunkを探す
+
+        Args:
+            signature: 署名
+
+        Returns:
+            Optional[Tuple]: (代表chunkのキー, 推定Jaccard係数)（しきい値以上のものがない場合はNone）
+        """
+        best: Optional[Tuple[Hashable, float]] = None
+        seen = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                similarity = float(np.mean(self._signatures[candidate] == signature))
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (candidate, similarity)
+        return best
+
+    def add(self, key: Hashable, signature: np.ndarray):
+        """
+        代表chunkを追加
+
+        Args:
+            key: 代表chunkのキー（ノードID）
+            signature: 署名
+        """
+        self._signatures[key] = signature
+        for band, band_key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def remove(self, key: Hashable):
+        """
+        代表chunkを削除（存在しない場合は何もしない）
+
+        Args:
+            key: 代表chunkのキー
+        """
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, band_key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(band_key)
+            if bucket is not None and key in bucket:
+                bucket.remove(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        """代表chunkの署名（存在しない場合はNone）"""
+        return self._signatures.get(key)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        """バンドごとのバケットのキー"""
+        return [signature[i:i + self._rows].tobytes() for i in range(0, NUM_PERM, self._rows)]
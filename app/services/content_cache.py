@@ -0,0 +1,29 @@
+"""
+ファイル内容のLRUキャッシュ（合計バイト数で上限を設定、ヒット率をメトリクスに記録）
+"""
+from typing import Any, Hashable, Optional
+from app.core.metrics import CACHE_REQUESTS
+from app.services.knowledge_storage import LRUCache
+
+
+class LRUContentCache(LRUCache):
+    """
+    合計サイズが上限を超えないように、最も長く参照されていない項目から破棄するキャッシュ
+
+    キャッシュの実装はAzure Functionsと共通（knowledge_storage.LRUCache）で、
+    こちらはヒット・ミスをPrometheusのメトリクスに記録する。
+    """
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        キャッシュから取得
+
+        Args:
+            key: キー
+
+        Returns:
+            Optional[Any]: キャッシュされた値（ない場合はNone）
+        """
+        value = super().get(key)
+        CACHE_REQUESTS.labels(self.name, "hit" if value is not None else "miss").inc()
+        return value
@@ -15,6 +15,7 @@ from reportlab.pdfbase.ttfonts import TTFont
 from docx import Document
 from docx.shared import Pt, Inches, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from app.core.registry import registry
 import io
 import os
 
@@ -371,6 +372,15 @@ class DocumentService:
             raise
 
 
-# シングルトンインスタンス
-document_service = DocumentService()
+# シングルトンインスタンス（初回使用時に生成）
+registry.register("document_service", DocumentService)
 
+
+def get_document_service() -> DocumentService:
+    """
+    DocumentServiceのインスタンスを取得
+
+    Returns:
+        DocumentService: シングルトンインスタンス
+    """
+    return registry.get("document_service")
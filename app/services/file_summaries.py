@@ -0,0 +1,142 @@
+"""
+ファイル単位の要約ベクトルによる2段階検索
+
+ファイルごとにchunkの埋め込みの重心（正規化したchunkのベクトルの平均）を要約ベクトルとして保持し、
+1段目でクエリに近いファイルを選び、2段目で選んだファイルのchunkだけと類似度を計算する。
+1回の検索の計算量は「ファイル数＋選んだファイルのchunk数」となり、chunkの総数に比例しない。
+
+要約ベクトルはIndexの埋め込みから計算するため、埋め込みモデルの呼び出しは増えない。
+埋め込みをメモリ上に持つベクトルストア（SimpleVectorStore）の場合のみ使用できる。
+"""
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    """行ごとに長さ1にする（コサイン類似度を内積で計算するため）"""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+class FileSummaryIndex:
+    """ファイルごとの要約ベクトルとchunkの埋め込み（正規化済み）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # ファイル名 → {"ids": chunkのノードID, "vectors": chunkの埋め込み, "summary": 要約ベクトル}
+        self._files: Dict[str, Dict[str, Any]] = {}
+        # 検索用の状態（ファイル名の並び, 要約ベクトルの行列, _files）、更新時はまとめて置き換える
+        self._state: Tuple[List[str], Optional[np.ndarray], Dict[str, Dict[str, Any]]] = ([], None, {})
+
+    @property
+    def ready(self) -> bool:
+        """要約ベクトルを作成済みか"""
+        return self._state[1] is not None
+
+    @property
+    def file_count(self) -> int:
+        """要約ベクトルを持つファイル数"""
+        return len(self._state[0])
+
+    def rebuild(self, index: Any):
+        """
+        Indexのすべてのファイルの要約ベクトルを作成
+
+        Args:
+            index: VectorStoreIndex（Noneの場合、埋め込みを取得できない場合は無効にする）
+        """
+        embeddings = self._embeddings(index)
+        with self._lock:
+            if embeddings is None:
+                self._files = {}
+                self._state = ([], None, {})
+                return
+            self._files = self._build(index, embeddings, None)
+            self._publish()
+
+    def update(self, index: Any, filenames: Iterable[str]):
+        """
+        追加・更新・削除したファイルの要約ベクトルだけを作り直す
+
+        Args:
+            index: VectorStoreIndex
+            filenames: 追加・更新・削除したファイル名
+        """
+        embeddings = self._embeddings(index)
+        if embeddings is None:
+            self.rebuild(index)
+            return
+        filenames = set(filenames)
+        with self._lock:
+            files = {name: entry for name, entry in self._files.items() if name not in filenames}
+            files.update(self._build(index, embeddings, filenames))
+            self._files = files
+            self._publish()
+
+    def search(self, query_embedding: List[float], top_files: int, top_k: int) -> List[Tuple[str, float]]:
+        """
+        2段階検索（要約ベクトルで top_files 件のファイルを選び、そのファイルのchunkから top_k 件を選ぶ）
+
+        Args:
+            query_embedding: クエリの埋め込み
+            top_files: 1段目で選ぶファイル数
+            top_k: 返すchunkの数
+
+        Returns:
+            List[Tuple[str, float]]: (ノードID, コサイン類似度)（類似度の高い順）
+        """
+        # 更新中でも一貫した状態を参照する
+        names, summaries, files = self._state
+        if summaries is None or not names:
+            return []
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+
+        # 1段目：ファイルの選択
+        file_scores = summaries @ query
+        if len(names) > top_files:
+            selected = np.argpartition(-file_scores, top_files - 1)[:top_files]
+        else:
+            selected = np.arange(len(names))
+
+        # 2段目：選んだファイルのchunkのみと類似度を計算
+        ids: List[str] = []
+        vectors = []
+        for i in selected:
+            entry = files[names[i]]
+            ids.extend(entry["ids"])
+            vectors.append(entry["vectors"])
+        if not ids:
+            return []
+        scores = np.vstack(vectors) @ query
+        k = min(top_k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top]
+
+    def _embeddings(self, index: Any) -> Optional[Dict[str, List[float]]]:
+        """Indexのchunkの埋め込み（ノードID → 埋め込み、取得できない場合はNone）"""
+        if index is None:
+            return None
+        data = getattr(index.vector_store, "data", None)
+        return getattr(data, "embedding_dict", None)
+
+    def _build(self, index: Any, embeddings: Dict[str, List[float]], filenames: Optional[set]) -> Dict[str, Dict[str, Any]]:
+        """ファイルごとの要約ベクトルを作成（filenamesがNoneの場合はすべてのファイル）"""
+        grouped: Dict[str, List[str]] = {}
+        for node_id, node in index.docstore.docs.items():
+            name = node.metadata.get("file_name")
+            if node_id in embeddings and (filenames is None or name in filenames):
+                grouped.setdefault(name, []).append(node_id)
+
+        files = {}
+        for name, ids in grouped.items():
+            vectors = _normalize(np.asarray([embeddings[node_id] for node_id in ids], dtype=np.float32))
+            files[name] = {"ids": ids, "vectors": vectors, "summary": _normalize(vectors.mean(axis=0))}
+        return files
+
+    def _publish(self):
+        """1段目の検索用の行列を作り直す（_lockを取得した状態で呼び出す）"""
+        names = sorted(self._files)
+        summaries = np.vstack([self._files[name]["summary"] for name in names]) if names else np.zeros((0, 0), dtype=np.float32)
+        self._state = (names, summaries, self._files)
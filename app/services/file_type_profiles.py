@@ -0,0 +1,159 @@
+"""
+Knowledgeファイルの種別ごとのプロファイル（種別の判定・chunk分割・検索）
+
+価格表・法令・事例集などは構造が異なるため、種別ごとにchunkの分割方法とサイズ、
+検索結果に含める件数の上限、埋め込みを使わないキーワード検索のみにするかを定義する。
+Indexの作成（RAGService._split_documents）と検索（RAGService._retrieve）の両方がこの定義を参照する。
+
+プロファイルの項目:
+    - prefixes: 種別を判定するファイル名の接頭辞
+    - filenames: 種別を判定するファイル名（完全一致）
+    - splitter: structured（事例・見出し単位）/ sentence（文字数で分割）、Noneの場合は settings.knowledge_chunker
+    - chunk_size: chunkのトークン数の上限（Noneの場合は settings.knowledge_chunk_max_tokens）
+    - chunk_overlap: chunkのオーバーラップ（sentenceのみ）
+    - top_k: 検索結果に含める件数の上限（Noneの場合は上限なし、他の種別の結果が足りない場合は上限を超えて補う）
+    - lexical_only: Trueの場合は埋め込みを計算せず、キーワード（文字bigram）の一致で検索する
+"""
+import re
+from typing import Any, Callable, Dict, List, Sequence, TypeVar
+from app.core.config import settings
+
+
+T = TypeVar("T")
+
+# 判定できなかったファイルの種別
+UNKNOWN_FILE_TYPE = "unknown"
+
+# 省略した項目の値
+DEFAULT_PROFILE: Dict[str, Any] = {
+    "prefixes": (),
+    "filenames": (),
+    "splitter": None,
+    "chunk_size": None,
+    "chunk_overlap": 50,
+    "top_k": None,
+    "lexical_only": False,
+}
+
+# 種別 → プロファイル（上から順に判定する）
+FILE_TYPE_PROFILES: Dict[str, Dict[str, Any]] = {
+    # 価格表は1行が1項目のため小さめのchunkにする
+    "price": {"prefixes": ("price_",), "splitter": "structured", "chunk_size": 300, "top_k": 2},
+    "contractor": {"prefixes": ("contractor_",), "splitter": "structured", "top_k": 3},
+    "repair": {"prefixes": ("repair_",), "splitter": "structured", "top_k": 3},
+    # 法令・安全基準は条文が続くため、オーバーラップ付きで文単位に分割する
+    "legal_safety": {"prefixes": ("legal_", "safety_"), "splitter": "sentence", "chunk_size": 300, "chunk_overlap": 50, "top_k": 2},
+    "risk": {"prefixes": ("risk_",), "splitter": "structured", "top_k": 2},
+    # 見積書・発注書のひな形は名称で探すため、埋め込みを計算しない
+    "document": {"prefixes": ("estimate_", "order_"), "splitter": "structured", "top_k": 1, "lexical_only": True},
+    "judgement": {"prefixes": ("judgement_", "decision_"), "splitter": "structured", "top_k": 2},
+    "urgency": {"prefixes": ("urgency_", "water_supply_"), "splitter": "structured", "top_k": 2},
+    "material": {"prefixes": ("material_", "part_"), "splitter": "structured", "chunk_size": 300, "top_k": 2},
+    "construction": {"prefixes": ("construction_", "difficulty_"), "splitter": "structured", "top_k": 2},
+    "other": {"prefixes": ("warranty_", "seasonal_", "building_", "communication_"), "splitter": "sentence", "top_k": 2},
+    # 事例集は1件の事例が長いため、大きめのchunkにする
+    "case_study": {"filenames": ("past_case_study.txt",), "splitter": "structured", "chunk_size": 500, "top_k": 3},
+    "lessons": {"filenames": ("common_mistakes_lessons.txt",), "splitter": "structured", "top_k": 2},
+    UNKNOWN_FILE_TYPE: {},
+}
+
+# キーワード検索で無視する文字（空白・句読点・記号）
+_IGNORED_CHARS = re.compile(r"[\s、。，．,.!?！？・:：;；()（）「」『』【】\[\]]+")
+
+
+def classify_file(filename: str) -> str:
+    """
+    ファイル名からファイル種別を判定
+
+    Args:
+        filename: ファイル名
+
+    Returns:
+        str: ファイル種別（判定できない場合は unknown）
+    """
+    for file_type, profile in FILE_TYPE_PROFILES.items():
+        if filename in profile.get("filenames", ()) or filename.startswith(tuple(profile.get("prefixes", ()))):
+            return file_type
+    return UNKNOWN_FILE_TYPE
+
+
+def get_profile(file_type: str) -> Dict[str, Any]:
+    """
+    ファイル種別のプロファイル（省略した項目は既定値・設定値で補う）
+
+    Args:
+        file_type: ファイル種別
+
+    Returns:
+        Dict: プロファイル（splitter, chunk_size, chunk_overlap, top_k, lexical_only など）
+    """
+    profile = {**DEFAULT_PROFILE, **FILE_TYPE_PROFILES.get(file_type, {})}
+    if profile["splitter"] is None:
+        profile["splitter"] = settings.knowledge_chunker
+    if profile["chunk_size"] is None:
+        profile["chunk_size"] = settings.knowledge_chunk_max_tokens
+    return profile
+
+
+def has_lexical_profiles() -> bool:
+    """キーワード検索のみの種別があるか"""
+    return any(profile.get("lexical_only") for profile in FILE_TYPE_PROFILES.values())
+
+
+def select_by_quota(
+    items: Sequence[T],
+    top_k: int,
+    file_type_of: Callable[[T], str],
+    fill_overflow: bool = True,
+) -> List[T]:
+    """
+    スコア順の検索結果から、種別ごとの件数の上限を守って top_k 件を選ぶ
+
+    上限で除外した結果は、他の種別の結果が足りない場合のみ順に補う。
+
+    Args:
+        items: 検索結果（スコアの高い順）
+        top_k: 選ぶ件数
+        file_type_of: 検索結果からファイル種別を取得する関数
+        fill_overflow: Falseの場合、結果が足りなくても上限で除外した結果で補わない
+
+    Returns:
+        List: 選んだ検索結果（スコアの高い順）
+    """
+    selected: List[T] = []
+    overflow: List[T] = []
+    counts: Dict[str, int] = {}
+    for item in items:
+        if len(selected) >= top_k:
+            break
+        file_type = file_type_of(item)
+        quota = get_profile(file_type)["top_k"]
+        if quota is not None and counts.get(file_type, 0) >= quota:
+            overflow.append(item)
+            continue
+        counts[file_type] = counts.get(file_type, 0) + 1
+        selected.append(item)
+
+    if fill_overflow and len(selected) < top_k and overflow:
+        # 並び順を保つため、元の順序で補う
+        keep = set(map(id, selected + overflow[:top_k - len(selected)]))
+        selected = [item for item in items if id(item) in keep]
+    return selected
+
+
+def lexical_score(query: str, text: str) -> float:
+    """
+    キーワード検索のスコア（クエリの文字bigramのうち、テキストに含まれる割合）
+
+    Args:
+        query: 検索クエリ
+        text: chunkのテキスト
+
+    Returns:
+        float: 0〜1のスコア
+    """
+    query = _IGNORED_CHARS.sub("", query)
+    grams = {query[i:i + 2] for i in range(len(query) - 1)} or ({query} if query else set())
+    if not grams:
+        return 0.0
+    return sum(1 for gram in grams if gram in text) / len(grams)
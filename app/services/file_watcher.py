@@ -0,0 +1,216 @@
+"""
+ディレクトリの変更監視
+
+Linuxではinotify（標準ライブラリのctypesで呼び出す）で変更を受け取り、
+使えない環境ではディレクトリのmtimeを一定間隔で確認する。
+ディレクトリ以外（SQLite、Blob Storageなど）は、状態を表す値を返す関数を一定間隔で確認する。
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Hashable, Optional, Set
+
+
+# inotifyのイベント種別（<sys/inotify.h>）
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# 監視するイベント（書き込み途中のIN_MODIFYではなく、書き込み完了のIN_CLOSE_WRITEを使う）
+WATCH_MASK = (
+    IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+)
+
+# struct inotify_event の固定長部分（wd, mask, cookie, len）
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _open_inotify(directory: Path) -> Optional[int]:
+    """
+    inotifyでディレクトリの監視を開始
+
+    Args:
+        directory: 監視するディレクトリ
+
+    Returns:
+        Optional[int]: inotifyのファイルディスクリプタ（使えない場合はNone）
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(str(directory)), WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+class DirectoryWatcher:
+    """
+    ディレクトリ直下のファイルの追加・更新・削除を監視し、コールバックを呼び出す
+
+    短時間に続けて発生した変更（エディタの保存、複数ファイルのコピーなど）は
+    debounce 秒間新しい変更がなくなるまで待ってから1回にまとめて通知する。
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Path],
+        callback: Callable[[Optional[Set[str]]], None],
+        poll_interval: float = 2.0,
+        debounce: float = 0.2,
+        fingerprint: Optional[Callable[[], Hashable]] = None,
+    ):
+        """
+        Args:
+            directory: 監視するディレクトリ（fingerprintを指定する場合はNone）
+            callback: 変更時に呼び出す関数（変更されたファイル名の集合、特定できない場合はNone）
+            poll_interval: ポーリングの間隔（秒、inotifyが使えない場合）
+            debounce: 変更をまとめる待ち時間（秒）
+            fingerprint: 監視対象の状態を表す値を返す関数（指定した場合はinotifyを使わずにポーリングする）
+        """
+        self.directory = Path(directory) if directory is not None else None
+        self._fingerprint = fingerprint
+        self._callback = callback
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.mode: Optional[str] = None  # inotify / polling
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """監視スレッドを起動（起動済みの場合は何もしない）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        fd = _open_inotify(self.directory) if self._fingerprint is None else None
+        self.mode = "inotify" if fd is not None else "polling"
+        if fd is not None:
+            target = lambda: self._run_inotify(fd)
+        else:
+            # 起動時点の状態を基準にする（スレッドの開始までの変更も検出する）
+            initial = self._current_state()
+            target = lambda: self._run_polling(initial)
+        name = self.directory.name if self.directory is not None else "storage"
+        self._thread = threading.Thread(target=target, name=f"dir-watcher-{name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """
+        監視スレッドを停止
+
+        Args:
+            timeout: スレッドの終了を待つ時間（秒）
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _notify(self, names: Optional[Set[str]]):
+        """コールバックを呼び出す（例外で監視が止まらないようにする）"""
+        try:
+            self._callback(names)
+        except Exception as e:
+            print(f"Error handling directory change ({self.directory}): {e}")
+
+    def _read_events(self, fd: int, names: Set[str]) -> bool:
+        """
+        inotifyのイベントを読み込み、変更されたファイル名を追加
+
+        Args:
+            fd: inotifyのファイルディスクリプタ
+            names: 変更されたファイル名の集合（追加先）
+
+        Returns:
+            bool: ファイル名を特定できないイベント（キューの溢れ、ディレクトリ自体の削除・移動）があった場合True
+        """
+        try:
+            data = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+
+        unknown = False
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                unknown = True
+            elif name:
+                names.add(os.fsdecode(name))
+        return unknown
+
+    def _run_inotify(self, fd: int):
+        """inotifyによる監視のメインループ"""
+        try:
+            while not self._stop.is_set():
+                # 停止を確認するため、一定時間ごとに待機を抜ける
+                ready, _, _ = select.select([fd], [], [], 0.5)
+                if not ready:
+                    continue
+
+                names: Set[str] = set()
+                unknown = self._read_events(fd, names)
+                # 続けて発生する変更をまとめる
+                while not self._stop.is_set():
+                    ready, _, _ = select.select([fd], [], [], self.debounce)
+                    if not ready:
+                        break
+                    unknown = self._read_events(fd, names) or unknown
+
+                if unknown or names:
+                    self._notify(None if unknown else names)
+        finally:
+            os.close(fd)
+
+    def _current_state(self) -> Optional[Hashable]:
+        """監視対象の状態（fingerprint、省略時はディレクトリのmtime、取得できない場合はNone）"""
+        try:
+            if self._fingerprint is not None:
+                return self._fingerprint()
+            return self.directory.stat().st_mtime_ns
+        except Exception as e:
+            if self._fingerprint is not None:
+                print(f"Error checking knowledge storage: {e}")
+            return None
+
+    def _run_polling(self, last: Optional[Hashable]):
+        """
+        状態（ディレクトリのmtime）のポーリングによる監視のメインループ
+
+        ディレクトリのmtimeはファイルの追加・削除・名前変更で更新される
+        （既存ファイルの上書きでは更新されないため、アプリ経由の変更は別途通知する）。
+
+        Args:
+            last: 監視開始時点の状態
+        """
+        while not self._stop.wait(self.poll_interval):
+            if self._current_state() != last:
+                # 続けて発生する変更をまとめる
+                time.sleep(self.debounce)
+                last = self._current_state()
+                self._notify(None)
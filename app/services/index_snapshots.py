@@ -0,0 +1,148 @@
+"""
+RAG Indexのスナップショット
+
+Indexを保存するたびに、保存したファイル一式をKnowledgeのバージョンID別のディレクトリにコピーする。
+各スナップショットには作成元のマニフェスト（knowledge_manifest.json）が含まれ、
+以前のバージョンのIndexに埋め込みを計算し直さずに戻すことができる。
+"""
+import json
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+# Indexのディレクトリに保存する、作成元のKnowledgeのマニフェスト
+MANIFEST_FILENAME = "knowledge_manifest.json"
+
+
+def read_index_manifest(index_dir: Path) -> Optional[Dict[str, Any]]:
+    """
+    Indexの作成元のマニフェストを読み込む
+
+    Args:
+        index_dir: Indexのディレクトリ
+
+    Returns:
+        Optional[Dict]: マニフェスト（version, built_at, files、記録されていない場合はNone）
+    """
+    path = Path(index_dir) / MANIFEST_FILENAME
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        print(f"Error reading index manifest ({path}): {e}")
+        return None
+
+
+class IndexSnapshotStore:
+    """RAG Indexのスナップショットを保存する（新しいものから keep 件を残す）"""
+
+    def __init__(self, root: Path, keep: int = 5):
+        """
+        Args:
+            root: 保存先ディレクトリ
+            keep: 残すスナップショットの数
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def save(self, index_dir: Path, version: str):
+        """
+        保存済みのIndexをスナップショットとしてコピー（同じバージョンのスナップショットは置き換える）
+
+        Args:
+            index_dir: Indexのディレクトリ（作成元のマニフェストを保存済みであること）
+            version: KnowledgeのバージョンID
+        """
+        with self._lock:
+            staging = Path(tempfile.mkdtemp(prefix=".tmp-", dir=self.root))
+            try:
+                for path in Path(index_dir).iterdir():
+                    if path.is_file():
+                        shutil.copy2(path, staging / path.name)
+                target = self.root / version
+                if target.exists():
+                    shutil.rmtree(target)
+                staging.rename(target)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+            self._prune()
+
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        スナップショットの一覧（新しい順）
+
+        Returns:
+            List[Dict]: version, built_at, files（ファイル数）
+        """
+        snapshots = []
+        for path in self.root.iterdir():
+            if path.name.startswith(".") or not path.is_dir():
+                continue
+            manifest = read_index_manifest(path)
+            if manifest is None:
+                continue
+            snapshots.append({
+                "version": manifest["version"],
+                "built_at": manifest["built_at"],
+                "files": len(manifest["files"]),
+            })
+        return sorted(snapshots, key=lambda snapshot: snapshot["built_at"], reverse=True)
+
+    def get(self, version: str) -> Optional[Dict[str, Any]]:
+        """
+        スナップショットの作成元のマニフェストを取得
+
+        Args:
+            version: KnowledgeのバージョンID
+
+        Returns:
+            Optional[Dict]: マニフェスト（存在しない場合はNone）
+        """
+        if not version or "/" in version or "\\" in version or version.startswith("."):
+            return None
+        return read_index_manifest(self.root / version)
+
+    def restore(self, version: str, index_dir: Path):
+        """
+        スナップショットをIndexのディレクトリに戻す（コピーしてからディレクトリを入れ替える）
+
+        Args:
+            version: KnowledgeのバージョンID
+            index_dir: Indexのディレクトリ
+
+        Raises:
+            FileNotFoundError: スナップショットが存在しない場合
+        """
+        if self.get(version) is None:
+            raise FileNotFoundError(f"Index snapshot not found: {version}")
+        index_dir = Path(index_dir)
+        with self._lock:
+            staging = Path(tempfile.mkdtemp(prefix=".restore-", dir=index_dir.parent))
+            previous = index_dir.parent / f".{index_dir.name}-previous"
+            try:
+                for path in (self.root / version).iterdir():
+                    shutil.copy2(path, staging / path.name)
+                shutil.rmtree(previous, ignore_errors=True)
+                if index_dir.exists():
+                    index_dir.rename(previous)
+                try:
+                    staging.rename(index_dir)
+                except OSError:
+                    # 入れ替えに失敗した場合は元のIndexに戻す
+                    if previous.exists():
+                        previous.rename(index_dir)
+                    raise
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+                shutil.rmtree(previous, ignore_errors=True)
+
+    def _prune(self):
+        """古いスナップショットを削除（_lockを取得した状態で呼び出す）"""
+        for snapshot in self.list()[max(self.keep, 1):]:
+            shutil.rmtree(self.root / snapshot["version"], ignore_errors=True)
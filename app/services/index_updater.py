@@ -0,0 +1,196 @@
+"""
+Knowledgeファイルの変更のIndexへの自動反映
+
+Knowledgeカタログの変更通知（管理画面からの作成・削除、ディレクトリの監視）を受け取り、
+短時間に続けて発生した変更をまとめてから、変更されたファイルのchunkだけを
+Indexから削除・追加する（全ファイルの埋め込みを計算し直さない）。
+反映に失敗したファイル（埋め込みAPIのタイムアウトなど）は、間隔を空けて反映し直す。
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+
+class IndexUpdater:
+    """変更されたKnowledgeファイルをまとめてIndexに反映する"""
+
+    def __init__(
+        self,
+        apply: Callable[[Set[str]], Dict[str, Any]],
+        debounce: float = 2.0,
+        max_delay: float = 30.0,
+        max_retries: int = 3,
+        retry_backoff: float = 5.0,
+    ):
+        """
+        Args:
+            apply: 変更されたファイル名の集合をIndexに反映する関数
+            debounce: 最後の変更からこの時間（秒）新しい変更がなければ反映する
+            max_delay: 変更が続く場合でも、最初の変更からこの時間（秒）で反映する
+            max_retries: 反映に失敗したファイルを反映し直す回数
+            retry_backoff: 反映し直すまでの待ち時間（秒、失敗するたびに2倍にする）
+        """
+        self._apply = apply
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._pending: Set[str] = set()
+        self._first_at: Optional[float] = None
+        self._last_at: Optional[float] = None
+        # ファイル名 → 続けて反映に失敗した回数
+        self._failures: Dict[str, int] = {}
+        # 失敗した後、この時刻（time.monotonic）まで反映しない
+        self._retry_at: Optional[float] = None
+        self._running = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+
+    @property
+    def pending(self) -> Set[str]:
+        """反映待ちのファイル名"""
+        with self._condition:
+            return set(self._pending)
+
+    def on_catalog_change(self, changes: Dict[str, Any]):
+        """
+        Knowledgeカタログの変更通知を受け取る（KnowledgeCatalog.subscribeに登録する）
+
+        Args:
+            changes: 変更内容（added, modified, removed）
+        """
+        self.submit(changes["added"] + changes["modified"] + changes["removed"])
+
+    def submit(self, filenames: Iterable[str]):
+        """
+        変更されたファイルを反映待ちに追加
+
+        Args:
+            filenames: ファイル名
+        """
+        filenames = set(filenames)
+        if not filenames:
+            return
+        with self._condition:
+            if self._closed:
+                return
+            now = time.monotonic()
+            if not self._pending:
+                self._first_at = now
+            self._pending |= filenames
+            self._last_at = now
+            self._start()
+            self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        反映待ちの変更を待たずに反映し、完了するまで待機（失敗した場合は反映し直しの完了・中止まで待つ）
+
+        Args:
+            timeout: 最大待機時間（秒）
+
+        Returns:
+            bool: すべて反映された場合True
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            # 待ち時間を経過したことにして、すぐに反映させる
+            self._first_at = float("-inf") if self._pending else self._first_at
+            self._condition.notify_all()
+            while self._pending or self._running:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """
+        反映スレッドを停止（反映待ちの変更は破棄し、次回のIndex読み込み時に反映する）
+
+        Args:
+            timeout: スレッドの終了を待つ時間（秒）
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _start(self):
+        """反映スレッドを起動（_conditionを取得した状態で呼び出す）"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="index-updater", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """反映スレッドのメインループ"""
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if self._pending:
+                        now = time.monotonic()
+                        due = min(self._last_at + self.debounce, self._first_at + self.max_delay)
+                        if self._retry_at is not None:
+                            due = max(due, self._retry_at)
+                        if now >= due:
+                            break
+                        self._condition.wait(due - now)
+                    else:
+                        self._condition.wait()
+                if self._closed:
+                    return
+                filenames, self._pending = self._pending, set()
+                self._running = True
+
+            failed = False
+            try:
+                self.last_result = self._apply(filenames)
+            except Exception as e:
+                print(f"Error updating index for {sorted(filenames)}: {e}")
+                self.last_result = {"success": False, "message": str(e), "files": sorted(filenames)}
+                failed = True
+            finally:
+                with self._condition:
+                    if failed:
+                        self._schedule_retry(filenames)
+                    else:
+                        for name in filenames:
+                            self._failures.pop(name, None)
+                        self._retry_at = None
+                    self._running = False
+                    self._condition.notify_all()
+
+    def _schedule_retry(self, filenames: Set[str]):
+        """
+        反映に失敗したファイルを反映待ちに戻す（_conditionを取得した状態で呼び出す）
+
+        Args:
+            filenames: 反映に失敗したファイル名
+        """
+        retry, given_up = set(), []
+        for name in filenames:
+            failures = self._failures.get(name, 0) + 1
+            if failures > self.max_retries:
+                self._failures.pop(name, None)
+                given_up.append(name)
+            else:
+                self._failures[name] = failures
+                retry.add(name)
+        if given_up:
+            # 次回のIndex読み込み時、またはファイルが再び変更されたときに反映する
+            print(f"Gave up updating index for {sorted(given_up)} after {self.max_retries} retries")
+        if not retry or self._closed:
+            return
+
+        now = time.monotonic()
+        attempt = max(self._failures[name] for name in retry)
+        self._retry_at = now + self.retry_backoff * 2 ** (attempt - 1)
+        if not self._pending:
+            self._first_at = now
+        self._pending |= retry
+        self._last_at = now
+        self.last_result["retry_in"] = round(self._retry_at - now, 3)
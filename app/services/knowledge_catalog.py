@@ -0,0 +1,163 @@
+"""
+Knowledgeファイル一覧のキャッシュ（カタログ）
+
+ファイル一覧はリクエストごとにストレージを走査せず、メモリ上のカタログから返す。
+カタログはストレージの変更（DirectoryWatcherまたはアプリからの通知）があった場合のみ更新し、
+内容が変わるたびにバージョンを1つ増やす（他のキャッシュのキーとして使用できる）。
+"""
+import fnmatch
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+from app.services.knowledge_storage import KnowledgeStorage
+
+
+class KnowledgeCatalog:
+    """Knowledgeファイル一覧のキャッシュ"""
+
+    def __init__(self, storage: KnowledgeStorage, classify: Callable[[str], str], pattern: str = "*.txt"):
+        """
+        Args:
+            storage: Knowledgeファイルのストレージ
+            classify: ファイル名からファイル種別を判定する関数
+            pattern: 対象とするファイル名のパターン
+        """
+        self.storage = storage
+        self.pattern = pattern
+        self._classify = classify
+        # 変更の通知もロックを取得した状態で行う（通知先からカタログを参照・更新できるようRLockにする）
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._files: List[Dict[str, Any]] = []
+        self._fingerprint: Optional[Hashable] = None
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self.version = 0
+        self.refresh()
+
+    def get_files(self) -> List[Dict[str, Any]]:
+        """
+        ファイル一覧を取得（ファイル名順、ディレクトリは走査しない）
+
+        返すリストは更新時に新しいリストに置き換えるため、呼び出し元で変更しないこと。
+
+        Returns:
+            List[Dict]: ファイル情報のリスト（filename, size, updated_at, file_type, version）
+        """
+        return self._files
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        """
+        ファイル情報を取得
+
+        Args:
+            filename: ファイル名
+
+        Returns:
+            Optional[Dict]: ファイル情報（カタログにない場合はNone）
+        """
+        return self._entries.get(filename)
+
+    def subscribe(self, listener: Callable[[Dict[str, Any]], None]):
+        """
+        カタログの変更を受け取る関数を登録
+
+        同時に複数の更新（監視スレッドと管理画面からの書き込みなど）があっても、変更した順に1つずつ呼び出す。
+        呼び出し中は他の更新を待たせるため、時間のかかる処理は通知先で別スレッドに渡すこと。
+
+        Args:
+            listener: 変更時に呼び出す関数（version, added, modified, removed の辞書を受け取る）
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def check(self) -> Dict[str, Any]:
+        """
+        ストレージの状態（ローカルディレクトリの場合はmtime）が変わっている場合のみ更新（監視スレッドを使わない場合）
+
+        Returns:
+            Dict: 変更内容（refreshと同じ）
+        """
+        if self.storage.fingerprint() == self._fingerprint:
+            return {"version": self.version, "added": [], "modified": [], "removed": []}
+        return self.refresh()
+
+    def refresh(self, filenames: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        ファイルの情報を読み込み直す
+
+        Args:
+            filenames: 変更されたファイル名（省略時はストレージ全体を走査）
+
+        Returns:
+            Dict: 変更内容
+                - version: 更新後のカタログのバージョン
+                - added: 追加されたファイル名のリスト
+                - modified: 更新された（サイズ・バージョンが変わった）ファイル名のリスト
+                - removed: 削除されたファイル名のリスト
+        """
+        with self._lock:
+            self._fingerprint = self.storage.fingerprint()
+
+            if filenames is None:
+                scanned = self._scan()
+                targets = set(self._entries) | set(scanned)
+            else:
+                targets = {name for name in filenames if fnmatch.fnmatch(name, self.pattern)}
+                scanned = {}
+                for name in targets:
+                    entry = self._stat(name)
+                    if entry is not None:
+                        scanned[name] = entry
+
+            changes: Dict[str, Any] = {"added": [], "modified": [], "removed": []}
+            entries = dict(self._entries)
+            for name in sorted(targets):
+                old, new = entries.get(name), scanned.get(name)
+                if old is None and new is not None:
+                    changes["added"].append(name)
+                    entries[name] = new
+                elif old is not None and new is None:
+                    changes["removed"].append(name)
+                    del entries[name]
+                elif old is not None and (old["size"], old["version"]) != (new["size"], new["version"]):
+                    changes["modified"].append(name)
+                    entries[name] = new
+
+            changed = any(changes.values())
+            if changed:
+                self._entries = entries
+                self._files = [entries[name] for name in sorted(entries)]
+                self.version += 1
+            changes["version"] = self.version
+            if not changed:
+                return changes
+
+            # ロックを解放してから通知すると、同時に行われた更新の通知が前後する（削除の後に古い更新が届くなど）
+            for listener in list(self._listeners):
+                try:
+                    listener(changes)
+                except Exception as e:
+                    print(f"Error notifying knowledge catalog change: {e}")
+        return changes
+
+    def _scan(self) -> Dict[str, Dict[str, Any]]:
+        """ストレージ全体を走査"""
+        return {
+            item["name"]: self._entry(item)
+            for item in self.storage.list()
+            if fnmatch.fnmatch(item["name"], self.pattern)
+        }
+
+    def _stat(self, filename: str) -> Optional[Dict[str, Any]]:
+        """1ファイルの情報を取得（存在しない場合はNone）"""
+        item = self.storage.stat(filename)
+        return self._entry(item) if item is not None else None
+
+    def _entry(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """ファイル情報の辞書を作成"""
+        return {
+            "filename": item["name"],
+            "size": item["size"],
+            "updated_at": item["updated_at"],  # Unix timestamp
+            "file_type": self._classify(item["name"]),
+            "version": item["version"],
+        }
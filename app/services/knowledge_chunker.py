@@ -0,0 +1,191 @@
+"""
+Knowledgeファイルの構造に沿ったchunk分割
+
+Knowledgeファイルは「事例No.X」で始まる事例と、【】・#で始まる見出しで区切られている。
+固定長で分割すると1件の事例が複数のchunkに分かれるため、事例は1件を1つのchunkとし、
+事例以外の本文は見出しの範囲内で段落をまとめて、トークン数の上限までを1つのchunkにする。
+
+上限を超える事例・段落は、行（【】の項目・箇条書き）→ 文（。）→ 文字の順に細かくして詰め直す。
+事例の続きのchunkには事例の見出し行を付けるため、どのchunkからも事例番号を参照できる。
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# 事例の開始行（事例No.1 / 過去事例No.1 / 事例番号1 / 事例#1 / 事例 1）
+CASE_PATTERN = re.compile(r"^\s*(?:過去)?事例\s*(?:No\.?|番号)?\s*[#＃]?\s*(\d+)")
+# 見出し行（行全体が【】、Markdownの#、■◆）
+HEADING_PATTERN = re.compile(r"^\s*(?:【[^】]+】|#{1,6}\s+\S.*|[■◆].+)\s*$")
+# 箇条書きの行
+BULLET_PATTERN = re.compile(r"^\s*(?:[・\-*•●○]|\d+[.．)）]|[①-⑳])")
+# 文（。！？で終わる、または行末まで）
+SENTENCE_PATTERN = re.compile(r"[^。！？!?]*(?:[。！？!?]+|$)")
+
+
+def _default_tokenizer() -> Callable[[str], List]:
+    """llama-indexと同じトークナイザ（chunk_sizeと同じ基準で数える）"""
+    from llama_index.core.utils import get_tokenizer
+    return get_tokenizer()
+
+
+class KnowledgeChunker:
+    """事例・見出し単位でKnowledgeファイルをchunkに分割する"""
+
+    def __init__(self, max_tokens: int = 400, tokenizer: Optional[Callable[[str], List]] = None):
+        """
+        Args:
+            max_tokens: 1つのchunkのトークン数の上限
+            tokenizer: テキストをトークンのリストにする関数（省略時はllama-indexのトークナイザ）
+        """
+        self.max_tokens = max(max_tokens, 16)
+        self._tokenizer = tokenizer or _default_tokenizer()
+
+    def split(self, text: str) -> List[Dict[str, Any]]:
+        """
+        テキストをchunkに分割
+
+        Args:
+            text: Knowledgeファイルの内容
+
+        Returns:
+            List[Dict]: chunk（出現順）
+                - text: chunkのテキスト
+                - section: 直前の見出し（ない場合は含まない）
+                - case_no: 事例番号（事例のchunkのみ）
+        """
+        chunks: List[Dict[str, Any]] = []
+        paragraphs: List[str] = []
+        paragraphs_section: Optional[str] = None
+
+        def flush_paragraphs():
+            # 同じ見出しの段落は上限までまとめる
+            if paragraphs:
+                chunks.extend(self._chunk(self._pack(self._pieces(paragraphs)), paragraphs_section))
+                paragraphs.clear()
+
+        for unit in self._units(text):
+            if unit["case_no"] is None:
+                if unit["section"] != paragraphs_section:
+                    flush_paragraphs()
+                    paragraphs_section = unit["section"]
+                paragraphs.append(unit["text"])
+                continue
+
+            flush_paragraphs()
+            header = unit["text"].split("\n", 1)[0]
+            texts = [unit["text"]]
+            if self._count(unit["text"]) > self.max_tokens:
+                texts = self._pack(self._pieces([unit["text"]]), prefix=header)
+            chunks.extend(self._chunk(texts, unit["section"], unit["case_no"]))
+        flush_paragraphs()
+        return chunks
+
+    def _units(self, text: str) -> List[Dict[str, Any]]:
+        """テキストを事例・段落に分ける（見出しのみの段落は含めない）"""
+        units: List[Dict[str, Any]] = []
+        section: Optional[str] = None
+        lines: List[str] = []
+        case_no: Optional[str] = None
+        previous_blank = True
+
+        def close():
+            content = "\n".join(lines).strip()
+            if content and not (case_no is None and content == section):
+                units.append({"text": content, "section": section, "case_no": case_no})
+            lines.clear()
+
+        for line in text.splitlines():
+            blank = not line.strip()
+            case_match = CASE_PATTERN.match(line)
+            if case_match:
+                close()
+                case_no = case_match.group(1)
+                lines.append(line)
+            elif HEADING_PATTERN.match(line) and (case_no is None or previous_blank):
+                # 事例の途中の見出しは、空行の後のもののみ事例の終わりとみなす
+                close()
+                case_no = None
+                section = line.strip()
+                lines.append(line)
+            elif blank and case_no is None:
+                # 事例以外は空行で段落を区切る
+                close()
+            else:
+                lines.append(line)
+            previous_blank = blank
+        close()
+        return units
+
+    def _pieces(self, texts: List[str]) -> List[Tuple[str, str]]:
+        """上限を超えない単位（行・箇条書きの項目 → 文 → 文字）に分ける（直前の単位との区切りとの組）"""
+        pieces: List[Tuple[str, str]] = []
+        for text in texts:
+            # 段落の間は空行で区切る
+            separator = "\n\n"
+            items: List[str] = []
+            for line in text.split("\n"):
+                # 字下げされた行は直前の箇条書きの項目の続きとする
+                if items and line[:1].isspace() and not BULLET_PATTERN.match(line):
+                    items[-1] += "\n" + line
+                else:
+                    items.append(line)
+            for item in items:
+                if self._count(item) <= self.max_tokens:
+                    parts = [item]
+                else:
+                    parts = []
+                    for sentence in SENTENCE_PATTERN.findall(item):
+                        if self._count(sentence) <= self.max_tokens:
+                            parts.append(sentence)
+                        else:
+                            parts.extend(self._cut(sentence))
+                for i, part in enumerate(parts):
+                    if part:
+                        # 同じ行を分けたものは改行せずに続ける
+                        pieces.append((separator if i == 0 else "", part))
+                separator = "\n"
+        return pieces
+
+    def _pack(self, pieces: List[Tuple[str, str]], prefix: str = "") -> List[str]:
+        """分けた単位を上限まで詰めてchunkのテキストにする（2つ目以降のchunkの先頭にprefixを付ける）"""
+        chunks: List[str] = []
+        current = ""
+        for separator, piece in pieces:
+            candidate = f"{current}{separator}{piece}" if current else piece
+            if current and self._count(candidate) > self.max_tokens:
+                chunks.append(current.strip())
+                current = f"{prefix}\n{piece}" if prefix else piece
+                if self._count(current) > self.max_tokens:
+                    current = piece
+            else:
+                current = candidate
+        if current.strip():
+            chunks.append(current.strip())
+        return chunks
+
+    def _cut(self, text: str) -> List[str]:
+        """文が上限を超える場合は文字数で分ける"""
+        parts = []
+        while text:
+            size = min(len(text), self.max_tokens)
+            while size > 1 and self._count(text[:size]) > self.max_tokens:
+                size = size * 4 // 5
+            parts.append(text[:size])
+            text = text[size:]
+        return parts
+
+    def _chunk(self, texts: List[str], section: Optional[str], case_no: Optional[str] = None) -> List[Dict[str, Any]]:
+        """chunkの辞書を作成"""
+        chunks = []
+        for text in texts:
+            chunk: Dict[str, Any] = {"text": text}
+            if section is not None:
+                chunk["section"] = section
+            if case_no is not None:
+                chunk["case_no"] = case_no
+            chunks.append(chunk)
+        return chunks
+
+    def _count(self, text: str) -> int:
+        """トークン数"""
+        return len(self._tokenizer(text))
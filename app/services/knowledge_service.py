@@ -1,23 +1,95 @@
 """
 Knowledgeファイル管理サービス
 """
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Any, Iterable, List, Dict, Optional, Tuple
 from app.core.config import settings
-import os
+from app.core.registry import registry
+from app.services.content_cache import LRUContentCache
+from app.services.file_type_profiles import classify_file
+from app.services.file_watcher import DirectoryWatcher
+from app.services.knowledge_catalog import KnowledgeCatalog
+from app.services.knowledge_storage import CachedKnowledgeReader, KnowledgeStorage, cache_key, create_storage
+from app.services.knowledge_versions import KnowledgeVersionStore
+import hashlib
+import io
+import zipfile
+
+
+def create_knowledge_storage() -> KnowledgeStorage:
+    """
+    設定（settings.knowledge_storage_backend）に応じたKnowledgeファイルのストレージを作成
+    
+    Returns:
+        KnowledgeStorage: ストレージ
+    """
+    return create_storage(
+        settings.knowledge_storage_backend,
+        directory=settings.knowledge_dir,
+        sqlite_path=settings.knowledge_sqlite_path,
+        connection_string=settings.knowledge_blob_connection_string,
+        container=settings.knowledge_blob_container,
+        prefix=settings.knowledge_blob_prefix,
+        max_workers=settings.knowledge_prefetch_workers,
+    )
 
 
 class KnowledgeService:
     """Knowledgeファイル管理サービス"""
     
     def __init__(self):
-        self.knowledge_dir = Path(settings.knowledge_dir)
-        if not self.knowledge_dir.exists():
+        # Knowledgeファイルの保存先（ローカルディレクトリ / SQLite / Azure Blob Storage）
+        self.storage = create_knowledge_storage()
+        # ローカルディレクトリの場合のみ（それ以外はNone）
+        self.knowledge_dir = self.storage.local_path()
+        if self.knowledge_dir is not None and not self.knowledge_dir.exists():
             raise FileNotFoundError(f"Knowledge directory not found: {self.knowledge_dir}")
+        
+        # ファイル一覧はメモリ上のカタログから返し、ストレージの変更時のみ更新する
+        self.catalog = KnowledgeCatalog(self.storage, self._get_file_type)
+        
+        # ファイル内容のキャッシュ（キーは (ファイル名, バージョン, サイズ)、キャッシュにないファイルはまとめて並列に読み込む）
+        self.content_cache = LRUContentCache(settings.knowledge_content_cache_bytes, name="knowledge_content")
+        self.reader = CachedKnowledgeReader(self.storage, self.content_cache)
+        
+        # ファイルの内容をハッシュ別に保存し、変更のたびにバージョンを記録する
+        self.versions: Optional[KnowledgeVersionStore] = None
+        if settings.knowledge_versioning_enabled:
+            self.versions = KnowledgeVersionStore(Path(settings.knowledge_store_dir))
+            # 停止中の変更を記録（サイズ・更新日時が前回と同じファイルは読み込まない）
+            self.versions.record(self.storage, self.catalog.get_files())
+        # 変更されたファイルの読み込みを伴うため、バージョンの記録はカタログの通知（ロック中）とは別の
+        # スレッドで行う（1スレッドのため、通知された順に記録される）
+        self._version_recorder: Optional[ThreadPoolExecutor] = None
+        if self.versions is not None:
+            self._version_recorder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="knowledge-versions")
+        self.catalog.subscribe(self._on_catalog_change)
+        self.watcher: Optional[DirectoryWatcher] = None
+        if settings.knowledge_watch_enabled:
+            # ローカルディレクトリはinotify（使えない場合はmtime）、それ以外はストレージの状態をポーリングする
+            self.watcher = DirectoryWatcher(
+                self.knowledge_dir,
+                self.catalog.refresh,
+                poll_interval=settings.knowledge_watch_poll_interval,
+                debounce=settings.knowledge_watch_debounce,
+                fingerprint=self.storage.fingerprint if self.knowledge_dir is None else None,
+            )
+            self.watcher.start()
+    
+    @property
+    def catalog_version(self) -> int:
+        """ファイル一覧のバージョン（ファイルの追加・更新・削除のたびに増える）"""
+        return self.catalog.version
+    
+    @property
+    def current_version(self) -> Optional[str]:
+        """Knowledgeの内容のバージョンID（同じ内容なら同じ値、バージョン管理が無効の場合はNone）"""
+        return self.versions.head if self.versions is not None else None
     
     def get_file_list(self) -> List[Dict[str, any]]:
         """
-        Knowledgeファイル一覧を取得
+        Knowledgeファイル一覧を取得（カタログから返すため、ストレージは走査しない）
         
         Returns:
             List[Dict]: ファイル情報のリスト
@@ -26,27 +98,204 @@ class KnowledgeService:
                 - updated_at: 最終更新日時（ISO形式）
                 - file_type: ファイル種別（price_*, contractor_*, repair_*など）
         """
-        files = []
+        if self.watcher is None:
+            # 監視スレッドを使わない場合は、ストレージの状態（ディレクトリのmtime）が変わったときのみ走査する
+            self.catalog.check()
+        return self.catalog.get_files()
+    
+    def notify_changed(self, filenames: Iterable[str]) -> Dict:
+        """
+        アプリからファイルを変更したことを通知（監視スレッドを待たずにカタログを更新）
         
-        if not self.knowledge_dir.exists():
-            return files
+        Args:
+            filenames: 追加・更新・削除したファイル名
+            
+        Returns:
+            Dict: 変更内容（version, added, modified, removed）
+        """
+        return self.catalog.refresh(filenames)
+    
+    def wait_for_versions(self, timeout: Optional[float] = None) -> bool:
+        """
+        通知済みの変更がバージョンとして記録されるまで待機（記録は別スレッドで行うため）
         
-        for file_path in sorted(self.knowledge_dir.glob("*.txt")):
-            if file_path.is_file():
-                stat = file_path.stat()
-                filename = file_path.name
-                
-                # ファイル種別を判定
-                file_type = self._get_file_type(filename)
+        Args:
+            timeout: 最大待機時間（秒、Noneの場合は無制限）
+            
+        Returns:
+            bool: 記録が完了した場合True
+        """
+        if self._version_recorder is None:
+            return True
+        # 1スレッドで順に処理するため、空の処理が終われば、それより前の記録も終わっている
+        try:
+            self._version_recorder.submit(lambda: None).result(timeout)
+        except FutureTimeoutError:
+            return False
+        except RuntimeError:
+            # 停止後
+            pass
+        return True
+    
+    def normalize_filename(self, filename: str) -> str:
+        """
+        ファイル名を検証し、拡張子（.txt）を補う
+        
+        Args:
+            filename: ファイル名
+            
+        Returns:
+            str: Knowledgeディレクトリ直下のファイル名
+            
+        Raises:
+            ValueError: ファイル名が空、またはディレクトリを含む場合
+        """
+        if not filename or not filename.strip():
+            raise ValueError("Filename is required")
+        
+        filename = filename.strip()
+        if not filename.endswith(".txt"):
+            filename = f"{filename}.txt"
+        
+        # セキュリティ対策：パストラバーサル攻撃を防ぐ
+        if ".." in filename or "/" in filename or "\\" in filename:
+            raise ValueError(f"Invalid filename: {filename}")
+        return filename
+    
+    def extract_zip(self, data: bytes) -> List[Tuple[str, bytes]]:
+        """
+        zipファイルからKnowledgeファイルを取り出す（ディレクトリのエントリは無視）
+        
+        Args:
+            data: zipファイルの内容
+            
+        Returns:
+            List[Tuple[str, bytes]]: (ファイル名, 内容) のリスト
+            
+        Raises:
+            ValueError: zipファイルとして読めない場合、展開後のサイズが上限を超える場合
+        """
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(data))
+        except zipfile.BadZipFile:
+            raise ValueError("Invalid zip file")
+        
+        with archive:
+            entries = [
+                info for info in archive.infolist()
+                if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+            ]
+            # 展開前に宣言されたサイズで上限を確認する（実際の展開サイズは宣言を超えない）
+            if sum(info.file_size for info in entries) > settings.knowledge_upload_max_bytes:
+                raise ValueError(f"Upload too large (max {settings.knowledge_upload_max_bytes} bytes)")
+            try:
+                return [(info.filename, archive.read(info)) for info in entries]
+            except (zipfile.BadZipFile, NotImplementedError) as e:
+                raise ValueError(f"Invalid zip file: {e}")
+    
+    def write_files(self, files: List[Tuple[str, bytes]], overwrite: bool = False) -> Dict[str, Any]:
+        """
+        複数のKnowledgeファイルをまとめて書き込む
+        
+        すべてのファイルを検証してからストレージにまとめて書き込む（ローカルディレクトリは一時ディレクトリに
+        書き込んでからrename、SQLiteは1トランザクション）。検証に失敗した場合は1つも書き込まない。
+        カタログの更新（Indexへの反映の通知）は全ファイルの書き込み後に1回だけ行う。
+        
+        Args:
+            files: (ファイル名, 内容) のリスト
+            overwrite: Trueの場合、既存のファイルを上書きする
+            
+        Returns:
+            Dict: 書き込み結果
+                - files: 書き込んだファイル名
+                - created: 新規作成したファイル名
+                - updated: 上書きしたファイル名
+                - catalog_version: 更新後のファイル一覧のバージョン
                 
-                files.append({
-                    "filename": filename,
-                    "size": stat.st_size,
-                    "updated_at": stat.st_mtime,  # Unix timestamp
-                    "file_type": file_type,
-                })
+        Raises:
+            ValueError: ファイル名・内容が不正な場合、上限を超える場合
+            FileExistsError: 既存のファイルがあり、overwriteがFalseの場合
+        """
+        if not files:
+            raise ValueError("No files uploaded")
+        if len(files) > settings.knowledge_upload_max_files:
+            raise ValueError(f"Too many files (max {settings.knowledge_upload_max_files})")
+        if sum(len(data) for _, data in files) > settings.knowledge_upload_max_bytes:
+            raise ValueError(f"Upload too large (max {settings.knowledge_upload_max_bytes} bytes)")
         
-        return files
+        contents: Dict[str, bytes] = {}
+        for name, data in files:
+            filename = self.normalize_filename(name)
+            if filename in contents:
+                raise ValueError(f"Duplicate filename: {filename}")
+            try:
+                data.decode("utf-8")
+            except UnicodeDecodeError:
+                raise ValueError(f"File encoding error (UTF-8 required): {filename}")
+            contents[filename] = data
+        
+        stored = {entry["name"] for entry in self.storage.list()}
+        existing = sorted(name for name in contents if name in stored)
+        if existing and not overwrite:
+            raise FileExistsError(f"File already exists: {', '.join(existing)}")
+        
+        self.storage.write(contents)
+        changes = self.notify_changed(contents)
+        return {
+            "files": sorted(contents),
+            "created": sorted(set(contents) - set(existing)),
+            "updated": existing,
+            "catalog_version": changes["version"],
+        }
+    
+    def restore_version(self, hashes: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Knowledgeファイルを保存済みのバージョンの内容に戻す
+        
+        内容が異なるファイルだけをblobから書き戻し、バージョンにないファイルは削除する。
+        
+        Args:
+            hashes: ファイル名 → 内容のSHA-256（マニフェスト）
+            
+        Returns:
+            Dict: restored（書き戻したファイル名）, removed（削除したファイル名）
+            
+        Raises:
+            RuntimeError: バージョン管理が無効の場合
+            FileNotFoundError: 内容（blob）が保存されていない場合
+        """
+        if self.versions is None:
+            raise RuntimeError("Knowledge versioning is disabled")
+        
+        missing = sorted(name for name, digest in hashes.items() if not self.versions.has_blob(digest))
+        if missing:
+            raise FileNotFoundError(f"Stored content not found: {', '.join(missing)}")
+        
+        # 現在の内容をまとめて読み込んで比較する
+        names = [self.normalize_filename(filename) for filename in hashes]
+        current = {
+            name: hashlib.sha256(data).hexdigest()
+            for name, data in self.storage.read_many(names).items()
+        }
+        contents = {
+            name: self.versions.get_blob(hashes[name])
+            for name in names if current.get(name) != hashes[name]
+        }
+        # 監視の通知を待たずに、現在のファイル一覧と比較する
+        self.catalog.refresh()
+        removed = sorted(info["filename"] for info in self.catalog.get_files() if info["filename"] not in hashes)
+        
+        self.storage.write(contents)
+        self.storage.delete(removed)
+        self.notify_changed(set(contents) | set(removed))
+        return {"restored": sorted(contents), "removed": removed}
+    
+    def close(self):
+        """ストレージの監視を停止し、記録待ちのバージョンを記録"""
+        if self.watcher is not None:
+            self.watcher.stop()
+        if self._version_recorder is not None:
+            self._version_recorder.shutdown(wait=True)
     
     def get_file_content(self, filename: str) -> Dict[str, any]:
         """
@@ -61,6 +310,7 @@ class KnowledgeService:
                 - content: ファイル内容
                 - size: ファイルサイズ
                 - updated_at: 最終更新日時
+                - etag: ETag（内容・バージョンが同じ場合は同じ値）
                 
         Raises:
             FileNotFoundError: ファイルが存在しない場合
@@ -69,30 +319,81 @@ class KnowledgeService:
         if ".." in filename or "/" in filename or "\\" in filename:
             raise ValueError("Invalid filename")
         
-        file_path = self.knowledge_dir / filename
+        entry = self.storage.stat(filename)
+        if entry is None:
+            raise FileNotFoundError(f"File not found: {filename}")
         
-        if not file_path.exists():
+        # バージョン（更新日時・ETag）・サイズが変わっていなければキャッシュした内容を返す
+        try:
+            cached = self.reader.get(entry)
+        except FileNotFoundError:
             raise FileNotFoundError(f"File not found: {filename}")
         
-        if not file_path.is_file():
-            raise ValueError(f"Not a file: {filename}")
+        return {
+            "filename": filename,
+            "content": cached["content"],
+            "size": entry["size"],
+            "updated_at": entry["updated_at"],
+            "etag": cached["etag"],
+        }
+    
+    def get_file_contents(self, filenames: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        複数のファイル内容をまとめて取得（キャッシュにないファイルは並列に読み込む）
         
-        # ファイル内容を読み込み（UTF-8）
-        try:
-            content = file_path.read_text(encoding="utf-8")
-        except UnicodeDecodeError:
-            # UTF-8で読めない場合はエラー
-            raise ValueError(f"File encoding error: {filename}")
+        ファイル情報はカタログから取得する（Index作成など、一覧を取得した直後に使う）。
         
-        stat = file_path.stat()
+        Args:
+            filenames: ファイル名
+            
+        Returns:
+            Dict[str, Dict]: ファイル名 → get_file_contentと同じ辞書（存在しない・読み込めないファイルは含まない）
+        """
+        entries = {}
+        for filename in filenames:
+            info = self.catalog.get(filename)
+            if info is not None:
+                entries[filename] = {"name": filename, "size": info["size"], "updated_at": info["updated_at"], "version": info["version"]}
         
+        contents = self.reader.get_many(entries.values())
         return {
-            "filename": filename,
-            "content": content,
-            "size": stat.st_size,
-            "updated_at": stat.st_mtime,
+            filename: {
+                "filename": filename,
+                "content": cached["content"],
+                "size": entries[filename]["size"],
+                "updated_at": entries[filename]["updated_at"],
+                "etag": cached["etag"],
+            }
+            for filename, cached in contents.items()
         }
     
+    def _on_catalog_change(self, changes: Dict[str, Any]):
+        """更新・削除されたファイルの古い内容をキャッシュから破棄し、新しいバージョンの記録を予約"""
+        if self._version_recorder is not None:
+            try:
+                self._version_recorder.submit(self._record_version, changes["added"] + changes["modified"])
+            except RuntimeError:
+                # 停止後（シャットダウン中）の変更は、次回の起動時に記録する
+                pass
+        for filename in changes["removed"]:
+            self.content_cache.discard(filename)
+        for filename in changes["modified"]:
+            info = self.catalog.get(filename)
+            current = cache_key({"name": filename, **info}) if info is not None else None
+            self.content_cache.discard(filename, keep=current)
+    
+    def _record_version(self, changed: List[str]):
+        """
+        現在のファイル一覧をバージョンとして記録（バージョン記録用のスレッドで実行）
+        
+        Args:
+            changed: 追加・更新されたファイル名（必ず読み込み直す）
+        """
+        try:
+            self.versions.record(self.storage, self.catalog.get_files(), changed=changed)
+        except Exception as e:
+            print(f"Error recording knowledge version: {e}")
+    
     def _get_file_type(self, filename: str) -> str:
         """
         ファイル名からファイル種別を判定
@@ -103,36 +404,19 @@ class KnowledgeService:
         Returns:
             str: ファイル種別
         """
-        if filename.startswith("price_"):
-            return "price"
-        elif filename.startswith("contractor_"):
-            return "contractor"
-        elif filename.startswith("repair_"):
-            return "repair"
-        elif filename.startswith("legal_") or filename.startswith("safety_"):
-            return "legal_safety"
-        elif filename.startswith("risk_"):
-            return "risk"
-        elif filename.startswith("estimate_") or filename.startswith("order_"):
-            return "document"
-        elif filename.startswith("judgement_") or filename.startswith("decision_"):
-            return "judgement"
-        elif filename.startswith("urgency_") or filename.startswith("water_supply_"):
-            return "urgency"
-        elif filename.startswith("material_") or filename.startswith("part_"):
-            return "material"
-        elif filename.startswith("construction_") or filename.startswith("difficulty_"):
-            return "construction"
-        elif filename.startswith("warranty_") or filename.startswith("seasonal_") or filename.startswith("building_") or filename.startswith("communication_"):
-            return "other"
-        elif filename == "past_case_study.txt":
-            return "case_study"
-        elif filename == "common_mistakes_lessons.txt":
-            return "lessons"
-        else:
-            return "unknown"
+        # 判定ルールはファイル種別のプロファイル（app.services.file_type_profiles）に定義する
+        return classify_file(filename)
+
+
+# シングルトンインスタンス（初回使用時に生成）
+registry.register("knowledge_service", KnowledgeService)
 
 
-# シングルトンインスタンス
-knowledge_service = KnowledgeService()
+def get_knowledge_service() -> KnowledgeService:
+    """
+    KnowledgeServiceのインスタンスを取得
 
+    Returns:
+        KnowledgeService: シングルトンインスタンス
+    """
+    return registry.get("knowledge_service")
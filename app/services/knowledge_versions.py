@@ -0,0 +1,248 @@
+"""
+Knowledgeファイルのバージョン管理（内容アドレス方式）
+
+ファイルの内容はSHA-256をキーとするblobとして保存し、ある時点のファイル名とハッシュの対応を
+マニフェストとして記録する。マニフェストのバージョンIDも内容（ファイル名とハッシュの組）から
+計算するため、同じ内容のKnowledgeは常に同じバージョンIDになる。
+
+    <root>/blobs/ab/cdef...    ファイルの内容（ハッシュの先頭2文字でディレクトリを分ける）
+    <root>/manifests/<id>.json バージョンごとのマニフェスト
+    <root>/history.jsonl       バージョンの変更履歴（追記のみ）
+    <root>/head.json           現在のバージョンと、ハッシュ計算を省略するためのファイルのサイズ・更新日時
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def compute_version(hashes: Dict[str, str]) -> str:
+    """
+    ファイル名とハッシュの対応からバージョンIDを計算
+
+    Args:
+        hashes: ファイル名 → 内容のSHA-256
+
+    Returns:
+        str: バージョンID（16文字）
+    """
+    digest = hashlib.sha256()
+    for filename in sorted(hashes):
+        digest.update(f"{filename}\0{hashes[filename]}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def diff_manifests(old: Dict[str, str], new: Dict[str, str]) -> Dict[str, List[str]]:
+    """
+    2つのマニフェストの差分（ハッシュが変わったファイルのみ）
+
+    Args:
+        old: 変更前のファイル名 → ハッシュ
+        new: 変更後のファイル名 → ハッシュ
+
+    Returns:
+        Dict: added, modified, removed（ファイル名のリスト）
+    """
+    return {
+        "added": sorted(set(new) - set(old)),
+        "modified": sorted(name for name in set(old) & set(new) if old[name] != new[name]),
+        "removed": sorted(set(old) - set(new)),
+    }
+
+
+def _write_atomic(path: Path, data: bytes):
+    """一時ファイルに書き込んでからrenameする"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+class KnowledgeVersionStore:
+    """Knowledgeファイルのblobとバージョンのマニフェストを保存する"""
+
+    def __init__(self, root: Path):
+        """
+        Args:
+            root: 保存先ディレクトリ
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._head: Dict[str, Any] = {"version": None, "files": {}}
+        head_path = self.root / "head.json"
+        if head_path.exists():
+            try:
+                self._head = json.loads(head_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                print(f"Error reading knowledge head ({head_path}): {e}")
+
+    @property
+    def head(self) -> Optional[str]:
+        """現在のバージョンID（まだ記録していない場合はNone）"""
+        return self._head.get("version")
+
+    def head_hashes(self) -> Dict[str, str]:
+        """
+        現在のバージョンのファイル名 → ハッシュ
+
+        Returns:
+            Dict[str, str]: ファイル名 → 内容のSHA-256
+        """
+        return {name: entry["sha256"] for name, entry in self._head.get("files", {}).items()}
+
+    def put_blob(self, data: bytes) -> str:
+        """
+        内容をblobとして保存（同じ内容は1回だけ保存される）
+
+        Args:
+            data: ファイルの内容
+
+        Returns:
+            str: 内容のSHA-256
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            _write_atomic(path, data)
+        return digest
+
+    def get_blob(self, digest: str) -> bytes:
+        """
+        blobを読み込む
+
+        Args:
+            digest: 内容のSHA-256
+
+        Returns:
+            bytes: ファイルの内容
+
+        Raises:
+            FileNotFoundError: blobが保存されていない場合
+        """
+        return self._blob_path(digest).read_bytes()
+
+    def has_blob(self, digest: str) -> bool:
+        """blobが保存されているか"""
+        return self._blob_path(digest).exists()
+
+    def get_manifest(self, version: str) -> Optional[Dict[str, str]]:
+        """
+        マニフェストを取得
+
+        Args:
+            version: バージョンID
+
+        Returns:
+            Optional[Dict[str, str]]: ファイル名 → ハッシュ（存在しない場合はNone）
+        """
+        path = self.root / "manifests" / f"{version}.json"
+        if not path.exists():
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))["files"]
+
+    def save_manifest(self, hashes: Dict[str, str]) -> str:
+        """
+        マニフェストを保存（同じ内容のマニフェストは1回だけ保存される）
+
+        Args:
+            hashes: ファイル名 → ハッシュ
+
+        Returns:
+            str: バージョンID
+        """
+        version = compute_version(hashes)
+        path = self.root / "manifests" / f"{version}.json"
+        if not path.exists():
+            data = {"version": version, "files": dict(sorted(hashes.items()))}
+            _write_atomic(path, json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8"))
+        return version
+
+    def record(self, storage: Any, files: List[Dict[str, Any]], changed: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Knowledgeの現在の内容を新しいバージョンとして記録
+
+        サイズ・更新日時が前回の記録と同じファイルは読み込まずに前回のハッシュを使い、
+        それ以外のファイルはまとめて（並列に）読み込む。
+
+        Args:
+            storage: Knowledgeファイルのストレージ（KnowledgeStorage）
+            files: ファイル情報のリスト（KnowledgeCatalog.get_filesの要素）
+            changed: 必ず読み込み直すファイル名
+
+        Returns:
+            Optional[Dict]: 追加した履歴（内容が前回と同じ場合はNone）
+        """
+        changed = set(changed or [])
+        with self._lock:
+            previous = self._head.get("files", {})
+            entries: Dict[str, Dict[str, Any]] = {}
+            to_read: Dict[str, Dict[str, Any]] = {}
+            for info in files:
+                name = info["filename"]
+                old = previous.get(name)
+                if (
+                    name not in changed
+                    and old is not None
+                    and (old["size"], old["updated_at"]) == (info["size"], info["updated_at"])
+                ):
+                    entries[name] = old
+                else:
+                    to_read[name] = info
+
+            # 読み込み中に削除されたファイルは含まれない（次の変更通知で記録される）
+            for name, data in storage.read_many(to_read).items():
+                info = to_read[name]
+                entries[name] = {"sha256": self.put_blob(data), "size": info["size"], "updated_at": info["updated_at"]}
+
+            hashes = {name: entry["sha256"] for name, entry in entries.items()}
+            parent = self._head.get("version")
+            version = self.save_manifest(hashes)
+            record = None
+            if version != parent:
+                record = {
+                    "version": version,
+                    "parent": parent,
+                    "created_at": datetime.now().isoformat(),
+                    "files": len(hashes),
+                    **diff_manifests(self.head_hashes(), hashes),
+                }
+                with open(self.root / "history.jsonl", "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+            # サイズ・更新日時だけが変わった場合もhead.jsonは更新する（次回のハッシュ計算を省略するため）
+            if record is not None or entries != previous:
+                self._head = {"version": version, "files": entries}
+                _write_atomic(self.root / "head.json", json.dumps(self._head, ensure_ascii=False).encode("utf-8"))
+            return record
+
+    def history(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        バージョンの変更履歴（新しい順）
+
+        Args:
+            limit: 最大件数
+
+        Returns:
+            List[Dict]: 履歴（version, parent, created_at, files, added, modified, removed）
+        """
+        path = self.root / "history.jsonl"
+        if not path.exists():
+            return []
+        with open(path, encoding="utf-8") as f:
+            lines = f.readlines()
+        return [json.loads(line) for line in reversed(lines[-limit:]) if line.strip()]
+
+    def _blob_path(self, digest: str) -> Path:
+        """blobの保存先"""
+        return self.root / "blobs" / digest[:2] / digest[2:]
@@ -0,0 +1,196 @@
+"""
+ローカル実行用の埋め込み・LLM（OpenAI互換の代替、ネットワーク不要）
+
+負荷試験・CI・ベンチマークで、実際のIndex作成・検索・回答生成のコードパスを
+APIキーなし・費用なしで動かすためのもの。回答内容に意味はない。
+"""
+import hashlib
+import math
+import random
+import re
+import time
+import unicodedata
+from typing import Any, List
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.llms import CustomLLM, CompletionResponse, CompletionResponseGen, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+
+
+def hashing_embedding(text: str, dimension: int = 256, ngram_range: tuple = (1, 3)) -> List[float]:
+    """
+    文字n-gramのハッシュによるランダム射影埋め込みを計算
+
+    Args:
+        text: 埋め込み対象のテキスト
+        dimension: ベクトルの次元数
+        ngram_range: n-gramの最小・最大文字数
+
+    Returns:
+        List[float]: L2正規化済みのベクトル
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = re.sub(r"\s+", " ", text)
+    vector = [0.0] * dimension
+
+    min_n, max_n = ngram_range
+    for n in range(min_n, max_n + 1):
+        for i in range(len(text) - n + 1):
+            gram = text[i:i + n]
+            if gram.isspace():
+                continue
+            digest = hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % dimension
+            sign = 1.0 if digest[4] & 1 else -1.0
+            # 長いn-gramほど重みを大きくする
+            vector[bucket] += sign * n
+
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def sample_latency(rng: random.Random, distribution: str, mean: float, stddev: float) -> float:
+    """
+    指定した分布に従って遅延（秒）をサンプリング
+
+    Args:
+        rng: 乱数生成器
+        distribution: 分布（fixed, normal, lognormal）
+        mean: 平均（秒）
+        stddev: 標準偏差（秒）
+
+    Returns:
+        float: 遅延（秒）
+    """
+    if mean <= 0:
+        return 0.0
+    if distribution == "normal":
+        return max(0.0, rng.gauss(mean, stddev))
+    if distribution == "lognormal":
+        # 平均・標準偏差から対数正規分布のパラメータを求める
+        sigma2 = math.log(1 + stddev ** 2 / mean ** 2)
+        mu = math.log(mean) - sigma2 / 2
+        return rng.lognormvariate(mu, math.sqrt(sigma2))
+    return mean
+
+
+def build_echo_answer(prompt: str) -> str:
+    """
+    プロンプトから出典ファイル名と事例番号を拾って、回答形式のテキストを組み立てる
+
+    Args:
+        prompt: LLMへのプロンプト
+
+    Returns:
+        str: generate_answerのプロンプトが要求する5項目形式の回答
+    """
+    files = list(dict.fromkeys(re.findall(r"[\w\-]+\.txt", prompt)))[:3] or ["情報不足"]
+    case_numbers = list(dict.fromkeys(re.findall(r"事例No\.(\d+)", prompt)))[:3]
+    case_refs = "、".join(f"事例No.{num}" for num in case_numbers) or "該当なし"
+    contractors = list(dict.fromkeys(re.findall(r"対応業者[：:]\s*([^\n（(]+)", prompt)))[:3] or ["情報不足"]
+
+    lines = ["1. **推奨業者候補**"]
+    for contractor, file_name in zip(contractors, files * 3):
+        lines.append(f"   - **{contractor.strip()}**（参照ファイル: {file_name}）")
+        lines.append(f"     - 選定理由：{file_name}の{case_refs}より")
+        lines.append(f"     - 参照事例番号：{case_refs}")
+    lines += [
+        "",
+        "2. **想定価格情報**",
+        f"   - 相場価格帯：情報不足（参照ファイル: {files[0]}）",
+        "",
+        "3. **判断理由**",
+    ]
+    lines += [f"   - {file_name}の記載より" for file_name in files]
+    lines += [
+        "",
+        "4. **リスク・注意事項**",
+        "   - 情報不足",
+        "",
+        "5. **緊急度評価**",
+        "   - 情報不足",
+    ]
+    return "\n".join(lines)
+
+
+class HashingEmbedding(BaseEmbedding):
+    """
+    文字n-gramのハッシュによるランダム射影埋め込み
+
+    日本語は単語区切りがないため、正規化（NFKC）した文字列の1〜3文字n-gramを
+    符号付きハッシュで固定次元に射影する。同じテキストからは常に同じベクトルが得られる。
+    """
+
+    dimension: int = 256
+    ngram_range: tuple = (1, 3)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "hashing_embedding"
+
+    def _embed(self, text: str) -> List[float]:
+        return hashing_embedding(text, self.dimension, self.ngram_range)
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+
+class LocalEchoLLM(CustomLLM):
+    """
+    プロンプト中の出典・事例番号を使って、固定形式の回答を返すLLM
+
+    応答遅延は「最初のトークンまでの遅延（分布を指定）＋生成トークン数÷トークン/秒」で再現する。
+    """
+
+    model_name: str = "local-echo"
+    latency_distribution: str = "fixed"  # fixed, normal, lognormal
+    latency_mean: float = 0.0  # 最初のトークンまでの遅延の平均（秒）
+    latency_stddev: float = 0.0  # 遅延の標準偏差（秒）
+    tokens_per_second: float = 0.0  # 生成速度（0の場合は待機しない）
+    seed: int = 0
+
+    _rng: random.Random = PrivateAttr()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._rng = random.Random(self.seed)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "local_echo_llm"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name=self.model_name, context_window=128000, num_output=1024)
+
+    def _generate(self, prompt: str) -> str:
+        text = build_echo_answer(prompt)
+        delay = sample_latency(self._rng, self.latency_distribution, self.latency_mean, self.latency_stddev)
+        if self.tokens_per_second > 0:
+            # 日本語はおおよそ1文字1トークンとして扱う
+            delay += len(text) / self.tokens_per_second
+        if delay > 0:
+            time.sleep(delay)
+        return text
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return CompletionResponse(text=self._generate(prompt))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        text = self._generate(prompt)
+
+        def gen() -> CompletionResponseGen:
+            yield CompletionResponse(text=text, delta=text)
+
+        return gen()
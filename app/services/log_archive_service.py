@@ -0,0 +1,228 @@
+"""
+RAGログのアーカイブサービス
+
+保存期間を過ぎたログをDBから日付別の圧縮ファイル（JSON Lines + gzip）へ移動し、
+どのファイルにどのIDのログがあるかをマニフェスト（rag_log_archivesテーブル）に記録する。
+"""
+import gzip
+import json
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from sqlalchemy import delete, func, insert, select
+from app.core.config import settings
+from app.core.database import engine, SessionLocal, RAGLog, RAGLogArchive, RAGLogPayload
+from app.core.registry import registry
+from app.services.log_payloads import decode_payload
+from app.services.log_search_service import get_log_search_service
+
+
+def _json_default(value: Any) -> Any:
+    """JSONに変換できない値（日時）を文字列に変換"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class LogArchiveService:
+    """RAGログのアーカイブサービス"""
+
+    def __init__(self):
+        self.archive_dir = Path(settings.log_archive_dir)
+        self.batch_size = settings.log_archive_batch_size
+
+    def archive_logs(self, retention_days: Optional[int] = None) -> Dict:
+        """
+        保存期間を過ぎたログをアーカイブファイルへ移動
+
+        Args:
+            retention_days: DBに残す日数（省略時は設定値）
+
+        Returns:
+            Dict: 処理結果（移動した件数、作成したファイルなど）
+        """
+        retention_days = settings.log_retention_days if retention_days is None else retention_days
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        table = RAGLog.__table__
+
+        archived = 0
+        files: List[str] = []
+        try:
+            while True:
+                with engine.connect() as conn:
+                    rows = conn.execute(
+                        select(table)
+                        .where(table.c.timestamp < cutoff)
+                        .order_by(table.c.id)
+                        .limit(self.batch_size)
+                    ).mappings().all()
+                    if rows:
+                        payloads = {
+                            payload.log_id: decode_payload(payload.codec, payload.data)
+                            for payload in conn.execute(
+                                select(RAGLogPayload).where(RAGLogPayload.log_id.in_([row["id"] for row in rows]))
+                            )
+                        }
+                if not rows:
+                    break
+
+                # ログのtimestampの日付ごとに分割
+                partitions: Dict[str, List[Dict]] = {}
+                for row in rows:
+                    # アーカイブファイルには圧縮テーブルの項目を展開して含める
+                    partitions.setdefault(row["timestamp"].date().isoformat(), []).append(
+                        {**row, **payloads.get(row["id"], {})}
+                    )
+
+                for partition_date, partition_rows in sorted(partitions.items()):
+                    files.append(self._archive_partition(partition_date, partition_rows))
+                    archived += len(partition_rows)
+
+            return {
+                "success": True,
+                "archived": archived,
+                "files": files,
+                "cutoff": cutoff.isoformat(),
+            }
+        except Exception as e:
+            print(f"Error archiving logs: {e}")
+            return {
+                "success": False,
+                "message": str(e),
+                "archived": archived,
+                "files": files,
+                "cutoff": cutoff.isoformat(),
+            }
+
+    def _archive_partition(self, partition_date: str, rows: List[Dict]) -> str:
+        """
+        1日分のログをファイルに書き込み、マニフェストへの登録とDBからの削除を行う
+
+        ファイルの書き込みが完了してから、マニフェストの登録とDBからの削除を
+        1トランザクションで行う（途中で失敗してもログは失われない）。
+
+        Args:
+            partition_date: 日付（YYYY-MM-DD）
+            rows: ログのリスト（ID順）
+
+        Returns:
+            str: アーカイブファイルのパス（アーカイブディレクトリからの相対パス）
+        """
+        ids = [row["id"] for row in rows]
+        relative_path = f"date={partition_date}/rag_logs_{ids[0]}-{ids[-1]}.jsonl.gz"
+        path = self.archive_dir / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # 一時ファイルに書き込んでから置き換える（書き込み途中のファイルを残さない）
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as f:
+                for row in rows:
+                    # IDを先頭に出力（検索時に行の先頭だけで判定するため）
+                    f.write(json.dumps(row, ensure_ascii=False, default=_json_default).encode("utf-8"))
+                    f.write(b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+
+        with engine.begin() as conn:
+            conn.execute(insert(RAGLogArchive), {
+                "partition_date": partition_date,
+                "file_path": relative_path,
+                "min_log_id": ids[0],
+                "max_log_id": ids[-1],
+                "row_count": len(rows),
+                "size_bytes": path.stat().st_size,
+                "created_at": datetime.utcnow(),
+            })
+            conn.execute(delete(RAGLogPayload).where(RAGLogPayload.log_id.in_(ids)))
+            get_log_search_service().delete_logs(conn, ids)
+            conn.execute(delete(RAGLog).where(RAGLog.id.in_(ids)))
+
+        return relative_path
+
+    def get_archived_log(self, log_id: int) -> Optional[Dict]:
+        """
+        アーカイブ済みのログをIDで取得
+
+        Args:
+            log_id: ログID
+
+        Returns:
+            Optional[Dict]: ログ（カラム名と値の辞書、timestampはISO形式の文字列）、存在しない場合はNone
+        """
+        db = SessionLocal()
+        try:
+            archives = db.query(RAGLogArchive.file_path).filter(
+                RAGLogArchive.min_log_id <= log_id,
+                RAGLogArchive.max_log_id >= log_id,
+            ).all()
+        finally:
+            db.close()
+
+        prefix = f'{{"id": {log_id},'.encode("utf-8")
+        for archive in archives:
+            path = self.archive_dir / archive.file_path
+            if not path.exists():
+                print(f"Archive file not found: {path}")
+                continue
+            with gzip.open(path, "rb") as f:
+                for line in f:
+                    if line.startswith(prefix):
+                        return json.loads(line)
+        return None
+
+    def get_stats(self) -> Dict:
+        """
+        アーカイブの統計情報を取得
+
+        Returns:
+            Dict: ファイル数、ログ件数、圧縮後の合計サイズ、最古・最新の日付
+        """
+        db = SessionLocal()
+        try:
+            row = db.query(
+                func.count(RAGLogArchive.id),
+                func.coalesce(func.sum(RAGLogArchive.row_count), 0),
+                func.coalesce(func.sum(RAGLogArchive.size_bytes), 0),
+                func.min(RAGLogArchive.partition_date),
+                func.max(RAGLogArchive.partition_date),
+            ).one()
+        finally:
+            db.close()
+
+        return {
+            "files": row[0],
+            "rows": row[1],
+            "size_bytes": row[2],
+            "oldest_date": row[3],
+            "newest_date": row[4],
+        }
+
+    def compact_database(self) -> bool:
+        """
+        ログ削除後のDBファイルを縮小（SQLiteのみVACUUMを実行）
+
+        Returns:
+            bool: 実行した場合True
+        """
+        if engine.dialect.name != "sqlite":
+            return False
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+        return True
+
+
+# シングルトンインスタンス（初回使用時に生成）
+registry.register("log_archive_service", LogArchiveService)
+
+
+def get_log_archive_service() -> LogArchiveService:
+    """
+    LogArchiveServiceのインスタンスを取得
+
+    Returns:
+        LogArchiveService: シングルトンインスタンス
+    """
+    return registry.get("log_archive_service")
@@ -0,0 +1,126 @@
+"""
+RAGログのエクスポート（NDJSON / CSV、gzip圧縮に対応）
+
+サーバー側カーソルで少しずつ読み込み、読み込んだ分ずつ変換して送信するため、
+エクスポートする件数によらずメモリ使用量は一定になる。
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, List
+from app.services.log_payloads import PAYLOAD_FIELDS, decode_payload
+from app.services.log_service import METRIC_COLUMNS
+
+
+# エクスポートする項目（CSVの列順）
+EXPORT_FIELDS = (
+    "id",
+    "timestamp",
+    "user_id",
+    "case_id",
+    "status",
+    "error_message",
+    "model_name",
+    "top_k",
+    "processing_time",
+    "referenced_files_count",
+    "rag_queries",
+    "referenced_files",
+) + METRIC_COLUMNS + PAYLOAD_FIELDS
+
+# 対応形式と (Content-Type, 拡張子)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+# DBから1回に読み込む（1回の送信にまとめる）行数
+CHUNK_ROWS = 500
+
+
+def _json_default(value: Any) -> Any:
+    """JSONに変換できない値（日時）を文字列に変換"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def to_record(row: Any) -> Dict[str, Any]:
+    """
+    クエリ結果の1行をエクスポート用の辞書に変換（圧縮された項目は展開する）
+
+    Args:
+        row: EXPORT_FIELDSのカラムとpayload_codec, payload_dataを含む行
+
+    Returns:
+        Dict[str, Any]: 項目名と値の辞書
+    """
+    mapping = row._mapping
+    record = {name: mapping.get(name) for name in EXPORT_FIELDS}
+    if mapping.get("payload_data") is not None:
+        record.update(decode_payload(mapping["payload_codec"], mapping["payload_data"]))
+    if isinstance(record["timestamp"], datetime):
+        record["timestamp"] = record["timestamp"].isoformat()
+    return record
+
+
+def _format_ndjson(records: List[Dict[str, Any]]) -> str:
+    """レコードをNDJSONの文字列に変換"""
+    return "".join(json.dumps(record, ensure_ascii=False, default=_json_default) + "\n" for record in records)
+
+
+def _format_csv(records: List[Dict[str, Any]]) -> str:
+    """レコードをCSVの文字列に変換（リスト・辞書の項目はJSON文字列にする）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for record in records:
+        writer.writerow([
+            json.dumps(value, ensure_ascii=False, default=_json_default) if isinstance(value, (list, dict)) else value
+            for value in (record.get(name) for name in EXPORT_FIELDS)
+        ])
+    return buffer.getvalue()
+
+
+def _csv_header() -> str:
+    """CSVのヘッダー行（Excelで文字化けしないようにBOMを付ける）"""
+    buffer = io.StringIO()
+    buffer.write("\ufeff")
+    csv.writer(buffer).writerow(EXPORT_FIELDS)
+    return buffer.getvalue()
+
+
+async def stream_export(
+    batches: AsyncIterator[List[Dict[str, Any]]],
+    export_format: str,
+    compress: bool = False,
+) -> AsyncIterator[bytes]:
+    """
+    レコードを指定形式のバイト列として逐次出力
+
+    Args:
+        batches: エクスポートするレコード（数百件ずつのリスト）
+        export_format: 形式（ndjson / csv）
+        compress: gzip圧縮する場合True
+
+    Returns:
+        AsyncIterator[bytes]: 出力するバイト列
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits=31: gzip形式
+
+    def encode(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor is not None else data
+
+    if export_format == "csv":
+        yield encode(_csv_header())
+    format_records = _format_csv if export_format == "csv" else _format_ndjson
+
+    async for records in batches:
+        chunk = encode(format_records(records))
+        if chunk:
+            yield chunk
+
+    if compressor is not None:
+        yield compressor.flush()
@@ -0,0 +1,67 @@
+"""
+RAGログの大きな項目（回答本文・判断理由・検索結果・案件情報）の圧縮
+
+これらの項目はrag_logsではなくrag_log_payloadsテーブルに圧縮して保存し、
+ログ詳細を表示するときだけ展開する。
+"""
+import json
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+
+# rag_log_payloadsに保存する項目
+PAYLOAD_FIELDS = ("input_data", "search_results", "generated_answer", "reasoning")
+
+# 圧縮形式（rag_log_payloads.codecに保存）
+CODEC_ZLIB = "zlib"
+
+
+def encode_payload(payload: Dict[str, Any], level: int = 6) -> Dict[str, Any]:
+    """
+    項目をJSONにして圧縮
+
+    Args:
+        payload: 項目名と値の辞書
+        level: 圧縮レベル（1〜9）
+
+    Returns:
+        Dict[str, Any]: rag_log_payloadsの1行分（codec, data, raw_size）
+    """
+    raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return {"codec": CODEC_ZLIB, "data": zlib.compress(raw, level), "raw_size": len(raw)}
+
+
+def decode_payload(codec: str, data: bytes) -> Dict[str, Any]:
+    """
+    圧縮された項目を展開
+
+    Args:
+        codec: 圧縮形式
+        data: 圧縮データ
+
+    Returns:
+        Dict[str, Any]: 項目名と値の辞書
+
+    Raises:
+        ValueError: 未対応の圧縮形式の場合
+    """
+    if codec == CODEC_ZLIB:
+        return json.loads(zlib.decompress(data).decode("utf-8"))
+    raise ValueError(f"Unsupported payload codec: {codec}")
+
+
+def split_payload(row: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    ログの1行をrag_logsに保存する項目と圧縮する項目に分割
+
+    Args:
+        row: RAGLogのカラム名と値の辞書
+
+    Returns:
+        Tuple: (rag_logsに保存する辞書, rag_log_payloadsの1行分（log_idなし、項目がすべて空の場合はNone）)
+    """
+    main_row = {key: value for key, value in row.items() if key not in PAYLOAD_FIELDS}
+    payload = {key: row.get(key) for key in PAYLOAD_FIELDS}
+    if all(value is None for value in payload.values()):
+        return main_row, None
+    return main_row, encode_payload(payload)
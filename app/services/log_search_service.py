@@ -0,0 +1,181 @@
+"""
+RAGログの全文検索（SQLite FTS5、trigramトークナイザ）
+
+日本語は単語の区切りがないため、3文字単位で索引を作るtrigramトークナイザを使う。
+FTS5テーブルのrowidはrag_logs.idと同じ値にし、ログ保存時に同じトランザクションで追加する。
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import Column, Float, Integer, MetaData, Table, Text, bindparam, delete, insert, inspect, literal_column, or_, select, text
+from sqlalchemy.sql import Subquery
+from app.core.registry import registry
+
+
+# FTS5テーブル名
+FTS_TABLE = "rag_logs_fts"
+
+# trigramトークナイザで索引を使えるのは3文字以上の語
+MIN_MATCH_LENGTH = 3
+
+# FTS5テーブルの定義（create_allの対象にしないため、Baseとは別のMetaDataを使う）
+_fts_metadata = MetaData()
+rag_logs_fts = Table(
+    FTS_TABLE,
+    _fts_metadata,
+    Column("rowid", Integer, primary_key=True),
+    Column("queries", Text),
+    Column("answer", Text),
+    Column("reasoning", Text),
+)
+
+
+def create_fts_table(conn: Any) -> bool:
+    """
+    FTS5テーブルを作成（SQLite以外、またはtrigramトークナイザが使えない場合は作成しない）
+
+    Args:
+        conn: DB接続
+
+    Returns:
+        bool: 作成した（または作成済みの）場合True
+    """
+    if conn.dialect.name != "sqlite":
+        return False
+    try:
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            "USING fts5(queries, answer, reasoning, tokenize='trigram')"
+        ))
+        return True
+    except Exception as e:
+        # FTS5なし、またはSQLite 3.34未満（trigram未対応）
+        print(f"Full-text search for logs is disabled: {e}")
+        return False
+
+
+def build_document(row: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """
+    ログの1行から索引に登録する文字列を作成
+
+    Args:
+        row: RAGLogのカラム名と値の辞書
+
+    Returns:
+        Dict[str, Optional[str]]: FTS5テーブルのカラム名と値
+    """
+    queries = row.get("rag_queries")
+    return {
+        "queries": "\n".join(queries) if isinstance(queries, list) else queries,
+        "answer": row.get("generated_answer"),
+        "reasoning": row.get("reasoning"),
+    }
+
+
+class LogSearchService:
+    """RAGログの全文検索サービス"""
+
+    def __init__(self):
+        self._available: Optional[bool] = None
+
+    def is_available(self, executor: Any) -> bool:
+        """
+        全文検索が使えるか（FTS5テーブルが存在するか）
+
+        Args:
+            executor: SessionまたはConnection
+
+        Returns:
+            bool: 使える場合True
+        """
+        if self._available is None:
+            bind = executor.get_bind() if hasattr(executor, "get_bind") else executor
+            self._available = inspect(bind).has_table(FTS_TABLE)
+        return self._available
+
+    def index_logs(self, executor: Any, logs: Iterable[Tuple[int, Dict[str, Any]]]):
+        """
+        ログを索引に追加（ログの保存と同じトランザクションで呼び出す）
+
+        Args:
+            executor: SessionまたはConnection
+            logs: (ログID, RAGLogのカラム名と値の辞書) のリスト
+        """
+        if not self.is_available(executor):
+            return
+        documents = [{"rowid": log_id, **build_document(row)} for log_id, row in logs]
+        documents = [doc for doc in documents if doc["queries"] or doc["answer"] or doc["reasoning"]]
+        if documents:
+            executor.execute(insert(rag_logs_fts), documents)
+
+    def delete_logs(self, executor: Any, log_ids: List[int]):
+        """
+        ログを索引から削除（アーカイブ時）
+
+        Args:
+            executor: SessionまたはConnection
+            log_ids: ログIDのリスト
+        """
+        if log_ids and self.is_available(executor):
+            executor.execute(delete(rag_logs_fts).where(rag_logs_fts.c.rowid.in_(log_ids)))
+
+    def search_subquery(self, query: str) -> Subquery:
+        """
+        検索語に一致するログのID・スコア・抜粋を返すサブクエリを作成
+
+        空白区切りの各語をすべて含むログに一致する（AND検索）。
+        3文字以上の語は索引（MATCH）で検索してBM25でスコアを付け、
+        2文字以下の語はLIKEで絞り込む。
+
+        Args:
+            query: 検索語
+
+        Returns:
+            Subquery: log_id, score（小さいほど関連度が高い）, snippet のサブクエリ
+
+        Raises:
+            ValueError: 検索語が空の場合
+        """
+        terms = [term for term in query.split() if term]
+        if not terms:
+            raise ValueError("Search query is empty")
+
+        long_terms = [term for term in terms if len(term) >= MIN_MATCH_LENGTH]
+        short_terms = [term for term in terms if len(term) < MIN_MATCH_LENGTH]
+
+        if long_terms:
+            # 各語をフレーズとして引用符で囲む（FTS5の演算子として解釈させない）
+            match = " AND ".join('"' + term.replace('"', '""') + '"' for term in long_terms)
+            score = literal_column(f"bm25({FTS_TABLE})", Float)
+        else:
+            match = None
+            score = literal_column("0.0", Float)
+
+        snippet = literal_column(f"snippet({FTS_TABLE}, -1, '【', '】', '…', 24)", Text)
+        stmt = select(
+            rag_logs_fts.c.rowid.label("log_id"),
+            score.label("score"),
+            snippet.label("snippet"),
+        )
+        if match is not None:
+            stmt = stmt.where(text(f"{FTS_TABLE} MATCH :match").bindparams(bindparam("match", match)))
+        for term in short_terms:
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            pattern = f"%{escaped}%"
+            stmt = stmt.where(or_(*[
+                column.like(pattern, escape="\\")
+                for column in (rag_logs_fts.c.queries, rag_logs_fts.c.answer, rag_logs_fts.c.reasoning)
+            ]))
+        return stmt.subquery("log_search")
+
+
+# シングルトンインスタンス（初回使用時に生成）
+registry.register("log_search_service", LogSearchService)
+
+
+def get_log_search_service() -> LogSearchService:
+    """
+    LogSearchServiceのインスタンスを取得
+
+    Returns:
+        LogSearchService: シングルトンインスタンス
+    """
+    return registry.get("log_search_service")
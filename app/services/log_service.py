@@ -1,16 +1,50 @@
 """
 ログ保存サービス
 """
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from app.core.database import SessionLocal, RAGLog
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, SessionLocal, RAGLog, RAGLogPayload
+from app.core.registry import registry
+from app.services.log_writer import BatchLogWriter
+from app.services.log_stats_service import apply_rollups
+from app.services.log_payloads import split_payload
+from app.services.log_search_service import get_log_search_service
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Any
 import time
 
 
+# RAGServiceが返すmetricsのうち、RAGLogのカラムとして保存するキー
+METRIC_COLUMNS = (
+    "embed_time",
+    "retrieve_time",
+    "prompt_build_time",
+    "llm_time",
+    "postprocess_time",
+    "prompt_tokens",
+    "completion_tokens",
+    "embedding_tokens",
+    "index_cache_hit",
+)
+
+
 class LogService:
     """ログ保存サービス"""
     
+    def __init__(self):
+        # ログはリクエスト処理から切り離してバックグラウンドでまとめて書き込む
+        self.writer: Optional[BatchLogWriter] = None
+        if settings.log_writer_enabled:
+            self.writer = BatchLogWriter(
+                self._insert_rows,
+                queue_size=settings.log_writer_queue_size,
+                batch_size=settings.log_writer_batch_size,
+                flush_interval=settings.log_writer_flush_interval,
+                enqueue_timeout=settings.log_writer_enqueue_timeout,
+            )
+    
     def save_rag_log(
         self,
         user_id: Optional[str] = None,
@@ -26,9 +60,10 @@ class LogService:
         top_k: Optional[int] = None,
         status: str = "success",
         error_message: Optional[str] = None,
-    ) -> int:
+        metrics: Optional[Dict[str, Any]] = None,
+    ) -> Optional[int]:
         """
-        RAG検索ログを保存
+        RAG検索ログを保存（バックグラウンド書き込みが有効な場合はキューに追加するのみ）
         
         Args:
             user_id: ユーザーID
@@ -44,40 +79,194 @@ class LogService:
             top_k: 検索結果の数
             status: ステータス（success/failed）
             error_message: エラーメッセージ
+            metrics: ステージ別処理時間・トークン数など（METRIC_COLUMNSのキー）
             
         Returns:
-            int: 保存されたログのID
+            Optional[int]: 保存されたログのID（バックグラウンド書き込みの場合はNone）
         """
+        row = self._build_row(
+            user_id=user_id,
+            case_id=case_id,
+            input_data=input_data,
+            rag_queries=rag_queries,
+            referenced_files=referenced_files,
+            search_results=search_results,
+            generated_answer=generated_answer,
+            reasoning=reasoning,
+            processing_time=processing_time,
+            model_name=model_name,
+            top_k=top_k,
+            status=status,
+            error_message=error_message,
+            metrics=metrics,
+        )
+        
+        if self.writer is not None:
+            self.writer.submit(row)
+            return None
+        
         db = SessionLocal()
         try:
-            log = RAGLog(
-                timestamp=datetime.utcnow(),
-                user_id=user_id,
-                case_id=case_id,
-                status=status,
-                error_message=error_message,
-                input_data=input_data,
-                rag_queries=rag_queries,
-                referenced_files=referenced_files,
-                search_results=search_results,
-                generated_answer=generated_answer,
-                reasoning=reasoning,
-                processing_time=processing_time,
-                model_name=model_name,
-                top_k=top_k,
-            )
-            db.add(log)
+            log_ids = self._write_rows(db, [row])
             db.commit()
-            db.refresh(log)
-            return log.id
+            return log_ids[0]
         except Exception as e:
             db.rollback()
             print(f"Error saving log: {e}")
             raise
         finally:
             db.close()
+    
+    async def save_rag_log_async(self, **kwargs) -> Optional[int]:
+        """
+        RAG検索ログを保存（async def のルートから呼び出す、イベントループをブロックしない）
+        
+        Args:
+            **kwargs: save_rag_logと同じ引数
+            
+        Returns:
+            Optional[int]: 保存されたログのID（バックグラウンド書き込みの場合はNone）
+        """
+        row = self._build_row(**kwargs)
+        
+        if self.writer is not None:
+            # キューが満杯の場合は待機・同期書き込みになるため、スレッドプールで実行する
+            if not self.writer.submit_nowait(row):
+                await run_in_threadpool(self.writer.submit, row)
+            return None
+        
+        async with AsyncSessionLocal() as db:
+            try:
+                # 書き込み処理は同期版と共通（run_syncで非同期セッション上で実行）
+                log_ids = await db.run_sync(self._write_rows, [row])
+                await db.commit()
+                return log_ids[0]
+            except Exception as e:
+                await db.rollback()
+                print(f"Error saving log: {e}")
+                raise
+    
+    @staticmethod
+    def _build_row(
+        user_id: Optional[str] = None,
+        case_id: Optional[str] = None,
+        input_data: Optional[Dict] = None,
+        rag_queries: Optional[List[str]] = None,
+        referenced_files: Optional[List[str]] = None,
+        search_results: Optional[List[Dict]] = None,
+        generated_answer: Optional[str] = None,
+        reasoning: Optional[str] = None,
+        processing_time: Optional[float] = None,
+        model_name: Optional[str] = None,
+        top_k: Optional[int] = None,
+        status: str = "success",
+        error_message: Optional[str] = None,
+        metrics: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        ログの1行分のデータを作成（引数はsave_rag_logと同じ）
+        
+        Returns:
+            Dict[str, Any]: RAGLogのカラム名と値の辞書
+        """
+        return dict(
+            timestamp=datetime.utcnow(),
+            user_id=user_id,
+            case_id=case_id,
+            status=status,
+            error_message=error_message,
+            input_data=input_data,
+            rag_queries=rag_queries,
+            referenced_files=referenced_files,
+            referenced_files_count=len(referenced_files) if referenced_files else 0,
+            search_results=search_results,
+            generated_answer=generated_answer,
+            reasoning=reasoning,
+            processing_time=processing_time,
+            model_name=model_name,
+            top_k=top_k,
+            # バッチ書き込みでは全行のキーを揃える必要があるため、未計測の項目もNoneで埋める
+            **{key: (metrics or {}).get(key) for key in METRIC_COLUMNS},
+        )
+    
+    def _insert_rows(self, rows: List[Dict[str, Any]]):
+        """
+        複数のログを1トランザクションで書き込み
+
+        Args:
+            rows: RAGLogのカラム名と値の辞書のリスト
+        """
+        db = SessionLocal()
+        try:
+            self._write_rows(db, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    @staticmethod
+    def _write_rows(db: Session, rows: List[Dict[str, Any]]) -> List[int]:
+        """
+        ログ・圧縮した項目・全文検索の索引・時間別の集計を書き込み（コミットは呼び出し元で行う）
+
+        Args:
+            db: DBセッション
+            rows: RAGLogのカラム名と値の辞書のリスト
+
+        Returns:
+            List[int]: 保存されたログのID（rowsと同じ順）
+        """
+        # 回答本文などの大きな項目は圧縮して別テーブルに保存する
+        split_rows = [split_payload(row) for row in rows]
+        
+        log_ids = db.execute(
+            insert(RAGLog).returning(RAGLog.id, sort_by_parameter_order=True),
+            [main_row for main_row, _ in split_rows],
+        ).scalars().all()
+        payloads = [
+            {"log_id": log_id, **payload}
+            for log_id, (_, payload) in zip(log_ids, split_rows)
+            if payload is not None
+        ]
+        if payloads:
+            db.execute(insert(RAGLogPayload), payloads)
+        # 全文検索の索引（圧縮前の回答本文などから作成）
+        get_log_search_service().index_logs(db, zip(log_ids, rows))
+        # 時間別の集計もログと同じトランザクションで更新する
+        apply_rollups(db, rows)
+        return list(log_ids)
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        書き込み待ちのログがすべて保存されるまで待機
+
+        Args:
+            timeout: 最大待機時間（秒）
+
+        Returns:
+            bool: すべて保存された場合True
+        """
+        if self.writer is None:
+            return True
+        return self.writer.flush(timeout)
+    
+    def close(self):
+        """書き込み待ちのログを保存してバックグラウンド書き込みを停止"""
+        if self.writer is not None:
+            self.writer.close()
+
+
+# シングルトンインスタンス（初回使用時に生成）
+registry.register("log_service", LogService)
 
 
-# シングルトンインスタンス
-log_service = LogService()
+def get_log_service() -> LogService:
+    """
+    LogServiceのインスタンスを取得
 
+    Returns:
+        LogService: シングルトンインスタンス
+    """
+    return registry.get("log_service")
@@ -0,0 +1,368 @@
+"""
+ログの集計サービス
+
+ログ保存時に時間別の集計テーブル（件数・処理時間のヒストグラム・ファイル参照回数）を
+加算して更新し、管理画面の統計はログ本体ではなく集計テーブルから返す。
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal, RAGLogHourlyStat, RAGLogHourlyLatency, RAGLogHourlyFile
+from app.core.registry import registry
+
+
+# 処理時間のヒストグラムの上限値（秒、最後のバケットは上限なし）
+LATENCY_BUCKETS = (0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 20.0, 30.0, 45.0, 60.0, 90.0, 120.0, float("inf"))
+
+
+def _truncate_hour(timestamp: datetime) -> datetime:
+    """時刻の分以下を切り捨て"""
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def _latency_bucket(processing_time: float) -> int:
+    """処理時間が入るバケットのインデックス"""
+    for index, upper in enumerate(LATENCY_BUCKETS):
+        if processing_time <= upper:
+            return index
+    return len(LATENCY_BUCKETS) - 1
+
+
+def _dialect_name(executor: Any) -> str:
+    """SessionまたはConnectionのDB種別"""
+    dialect = getattr(executor, "dialect", None)
+    if dialect is None:
+        dialect = executor.get_bind().dialect
+    return dialect.name
+
+
+def _upsert_add(executor: Any, model, keys: List[str], rows: List[Dict[str, Any]], maximums: Tuple[str, ...] = ()):
+    """
+    主キーが同じ行があれば値を加算、なければ挿入
+
+    Args:
+        executor: SessionまたはConnection
+        model: 集計テーブルのモデル
+        keys: 主キーのカラム名
+        rows: 挿入する行のリスト
+        maximums: 加算ではなく最大値を残すカラム名
+    """
+    if not rows:
+        return
+
+    dialect = _dialect_name(executor)
+    if dialect == "sqlite":
+        stmt = sqlite.insert(model)
+        greatest = func.max  # SQLiteの複数引数のmaxはスカラー関数
+    elif dialect == "postgresql":
+        stmt = postgresql.insert(model)
+        greatest = func.greatest
+    else:
+        raise NotImplementedError(f"Log rollups are not supported for {dialect}")
+
+    table = model.__table__
+    updates = {}
+    for name in rows[0]:
+        if name in keys:
+            continue
+        if name in maximums:
+            # NULL同士の比較にならないようにcoalesceする
+            updates[name] = greatest(
+                func.coalesce(table.c[name], stmt.excluded[name]),
+                func.coalesce(stmt.excluded[name], table.c[name]),
+            )
+        else:
+            updates[name] = table.c[name] + stmt.excluded[name]
+
+    executor.execute(stmt.on_conflict_do_update(index_elements=keys, set_=updates), rows)
+
+
+def apply_rollups(executor: Any, rows: Iterable[Dict[str, Any]]):
+    """
+    ログを時間別の集計テーブルに加算（ログの保存と同じトランザクションで呼び出す）
+
+    Args:
+        executor: SessionまたはConnection
+        rows: 保存するログ（RAGLogのカラム名と値の辞書）のリスト
+    """
+    stats: Dict[Tuple, Dict[str, Any]] = {}
+    latency: Dict[Tuple, int] = {}
+    files: Dict[Tuple, int] = {}
+
+    # バッチ内で先に集計してから、キーごとに1回だけ更新する
+    for row in rows:
+        hour = _truncate_hour(row.get("timestamp") or datetime.utcnow())
+        key = (hour, row.get("model_name") or "", row.get("status") or "success")
+        stat = stats.setdefault(key, {
+            "request_count": 0,
+            "processing_time_count": 0,
+            "processing_time_sum": 0.0,
+            "processing_time_max": None,
+            "prompt_tokens_sum": 0,
+            "completion_tokens_sum": 0,
+        })
+        stat["request_count"] += 1
+        stat["prompt_tokens_sum"] += row.get("prompt_tokens") or 0
+        stat["completion_tokens_sum"] += row.get("completion_tokens") or 0
+
+        processing_time = row.get("processing_time")
+        if processing_time is not None:
+            stat["processing_time_count"] += 1
+            stat["processing_time_sum"] += processing_time
+            stat["processing_time_max"] = max(stat["processing_time_max"] or 0.0, processing_time)
+            bucket_key = key + (_latency_bucket(processing_time),)
+            latency[bucket_key] = latency.get(bucket_key, 0) + 1
+
+        for file_name in set(row.get("referenced_files") or []):
+            file_key = (hour, file_name)
+            files[file_key] = files.get(file_key, 0) + 1
+
+    _upsert_add(
+        executor, RAGLogHourlyStat, ["hour", "model_name", "status"],
+        [{"hour": k[0], "model_name": k[1], "status": k[2], **v} for k, v in stats.items()],
+        maximums=("processing_time_max",),
+    )
+    _upsert_add(
+        executor, RAGLogHourlyLatency, ["hour", "model_name", "status", "bucket"],
+        [{"hour": k[0], "model_name": k[1], "status": k[2], "bucket": k[3], "count": v} for k, v in latency.items()],
+    )
+    _upsert_add(
+        executor, RAGLogHourlyFile, ["hour", "file_name"],
+        [{"hour": k[0], "file_name": k[1], "reference_count": v} for k, v in files.items()],
+    )
+
+
+def estimate_percentile(bucket_counts: Dict[int, int], q: float, maximum: Optional[float] = None) -> Optional[float]:
+    """
+    ヒストグラムからパーセンタイルを推定（バケット内は線形補間）
+
+    Args:
+        bucket_counts: バケットのインデックスごとの件数
+        q: パーセンタイル（0〜100）
+        maximum: 処理時間の最大値（上限なしのバケットの補間に使用）
+
+    Returns:
+        Optional[float]: 推定値（秒）、データがない場合はNone
+    """
+    total = sum(bucket_counts.values())
+    if total == 0:
+        return None
+
+    target = total * q / 100
+    cumulative = 0
+    for index, upper in enumerate(LATENCY_BUCKETS):
+        count = bucket_counts.get(index, 0)
+        if count == 0:
+            continue
+        if cumulative + count >= target:
+            lower = LATENCY_BUCKETS[index - 1] if index > 0 else 0.0
+            if upper == float("inf"):
+                upper = max(maximum or lower, lower)
+            if maximum is not None:
+                upper = min(upper, max(maximum, lower))
+            return lower + (upper - lower) * (target - cumulative) / count
+        cumulative += count
+    return maximum
+
+
+class LogStatsService:
+    """ログの集計サービス"""
+
+    def get_stats(
+        self,
+        start: datetime,
+        end: datetime,
+        granularity: str = "hour",
+        model_name: Optional[str] = None,
+        top_files: int = 10,
+    ) -> Dict:
+        """
+        集計テーブルから期間内の統計を取得（ログの件数に依存しない）
+
+        Args:
+            start: 開始日時（UTC、この時刻を含む）
+            end: 終了日時（UTC、この時刻を含まない）
+            granularity: 時系列の単位（hour / day）
+            model_name: モデル名（フィルタ）
+            top_files: 参照回数の多いファイルの件数
+
+        Returns:
+            Dict: 合計、時系列、モデル別、参照回数の多いファイル
+        """
+        db = SessionLocal()
+        try:
+            rows = self._load_rows(db, start, end, model_name, top_files)
+        finally:
+            db.close()
+        return self._summarize(rows, start, end, granularity)
+
+    async def get_stats_async(
+        self,
+        db: AsyncSession,
+        start: datetime,
+        end: datetime,
+        granularity: str = "hour",
+        model_name: Optional[str] = None,
+        top_files: int = 10,
+    ) -> Dict:
+        """
+        集計テーブルから期間内の統計を取得（非同期セッション版、引数はget_statsと同じ）
+
+        Args:
+            db: 非同期DBセッション
+
+        Returns:
+            Dict: 合計、時系列、モデル別、参照回数の多いファイル
+        """
+        rows = await db.run_sync(self._load_rows, start, end, model_name, top_files)
+        return self._summarize(rows, start, end, granularity)
+
+    @staticmethod
+    def _load_rows(
+        db: Session,
+        start: datetime,
+        end: datetime,
+        model_name: Optional[str],
+        top_files: int,
+    ) -> Tuple[List, List, List]:
+        """
+        集計テーブルから期間内の行を取得
+
+        Returns:
+            Tuple: (時間別の集計, 処理時間のヒストグラム, ファイル参照回数の上位)
+        """
+        stat_query = db.query(RAGLogHourlyStat).filter(
+            RAGLogHourlyStat.hour >= _truncate_hour(start),
+            RAGLogHourlyStat.hour < end,
+        )
+        latency_query = db.query(RAGLogHourlyLatency).filter(
+            RAGLogHourlyLatency.hour >= _truncate_hour(start),
+            RAGLogHourlyLatency.hour < end,
+        )
+        if model_name is not None:
+            stat_query = stat_query.filter(RAGLogHourlyStat.model_name == model_name)
+            latency_query = latency_query.filter(RAGLogHourlyLatency.model_name == model_name)
+
+        stat_rows = stat_query.all()
+        latency_rows = latency_query.all()
+
+        # ファイル参照回数はモデル別に持たないため、期間のみで絞り込む
+        file_rows = db.query(
+            RAGLogHourlyFile.file_name,
+            func.sum(RAGLogHourlyFile.reference_count).label("count"),
+        ).filter(
+            RAGLogHourlyFile.hour >= _truncate_hour(start),
+            RAGLogHourlyFile.hour < end,
+        ).group_by(RAGLogHourlyFile.file_name).order_by(
+            func.sum(RAGLogHourlyFile.reference_count).desc()
+        ).limit(top_files).all()
+
+        return stat_rows, latency_rows, file_rows
+
+    def _summarize(self, rows: Tuple[List, List, List], start: datetime, end: datetime, granularity: str) -> Dict:
+        """集計テーブルの行をレスポンス形式に集計"""
+        stat_rows, latency_rows, file_rows = rows
+
+        def bucket_of(hour: datetime) -> datetime:
+            return hour.replace(hour=0) if granularity == "day" else hour
+
+        totals = self._new_group()
+        timeline: Dict[datetime, Dict] = {}
+        by_model: Dict[str, Dict] = {}
+        for row in stat_rows:
+            for group in (totals, timeline.setdefault(bucket_of(row.hour), self._new_group()),
+                          by_model.setdefault(row.model_name, self._new_group())):
+                self._add_stat(group, row)
+        for row in latency_rows:
+            for group in (totals, timeline.setdefault(bucket_of(row.hour), self._new_group()),
+                          by_model.setdefault(row.model_name, self._new_group())):
+                group["buckets"][row.bucket] = group["buckets"].get(row.bucket, 0) + row.count
+
+        return {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "granularity": granularity,
+            "totals": self._finish_group(totals),
+            "timeline": [
+                {"bucket": bucket.isoformat(), **self._finish_group(group)}
+                for bucket, group in sorted(timeline.items())
+            ],
+            "by_model": [
+                {"model_name": name or None, **self._finish_group(group)}
+                for name, group in sorted(by_model.items())
+            ],
+            "top_files": [{"file_name": row.file_name, "count": int(row.count)} for row in file_rows],
+        }
+
+    @staticmethod
+    def _new_group() -> Dict[str, Any]:
+        """集計用の空のグループ"""
+        return {
+            "requests": 0,
+            "errors": 0,
+            "processing_time_count": 0,
+            "processing_time_sum": 0.0,
+            "processing_time_max": None,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "buckets": {},
+        }
+
+    @staticmethod
+    def _add_stat(group: Dict[str, Any], row: RAGLogHourlyStat):
+        """集計テーブルの1行をグループに加算"""
+        group["requests"] += row.request_count
+        if row.status != "success":
+            group["errors"] += row.request_count
+        group["processing_time_count"] += row.processing_time_count
+        group["processing_time_sum"] += row.processing_time_sum
+        if row.processing_time_max is not None:
+            group["processing_time_max"] = max(group["processing_time_max"] or 0.0, row.processing_time_max)
+        group["prompt_tokens"] += row.prompt_tokens_sum
+        group["completion_tokens"] += row.completion_tokens_sum
+
+    @staticmethod
+    def _finish_group(group: Dict[str, Any]) -> Dict[str, Any]:
+        """グループをレスポンス形式に変換"""
+        count = group["processing_time_count"]
+        return {
+            "requests": group["requests"],
+            "errors": group["errors"],
+            "error_rate": group["errors"] / group["requests"] if group["requests"] else 0.0,
+            "avg_processing_time": group["processing_time_sum"] / count if count else None,
+            "p95_processing_time": estimate_percentile(group["buckets"], 95, group["processing_time_max"]),
+            "max_processing_time": group["processing_time_max"],
+            "prompt_tokens": group["prompt_tokens"],
+            "completion_tokens": group["completion_tokens"],
+        }
+
+    @staticmethod
+    def default_range(days: int = 7) -> Tuple[datetime, datetime]:
+        """
+        デフォルトの集計期間（直近days日、現在の時刻を含む）
+
+        Args:
+            days: 日数
+
+        Returns:
+            Tuple[datetime, datetime]: (開始日時, 終了日時)
+        """
+        end = _truncate_hour(datetime.utcnow()) + timedelta(hours=1)
+        return end - timedelta(days=days), end
+
+
+# シングルトンインスタンス（初回使用時に生成）
+registry.register("log_stats_service", LogStatsService)
+
+
+def get_log_stats_service() -> LogStatsService:
+    """
+    LogStatsServiceのインスタンスを取得
+
+    Returns:
+        LogStatsService: シングルトンインスタンス
+    """
+    return registry.get("log_stats_service")
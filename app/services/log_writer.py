@@ -0,0 +1,231 @@
+"""
+ログのバックグラウンド書き込み（有界キュー + バッチ単位のトランザクション）
+"""
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from app.core.metrics import LOG_WRITER_EVENTS, LOG_WRITER_QUEUE_DEPTH, LOG_WRITER_BATCH_SECONDS
+
+
+# キューに入れて書き込みスレッドを停止させるための目印
+_STOP = object()
+# キューに入れて、flush_intervalを待たずにそれまでのログを書き込ませるための目印
+_FLUSH = object()
+
+
+class BatchLogWriter:
+    """
+    リクエスト処理から切り離してログをまとめて書き込む
+
+    ログはキューに積まれ、書き込みスレッドが batch_size 件たまるか
+    flush_interval 秒経過するごとに1トランザクションで書き込む。
+    キューが満杯の場合は enqueue_timeout 秒まで待機し（バックプレッシャー）、
+    それでも空かない場合は呼び出し元のスレッドで同期的に書き込む。
+    """
+
+    def __init__(
+        self,
+        write_batch: Callable[[List[Dict[str, Any]]], None],
+        queue_size: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        enqueue_timeout: float = 0.5,
+    ):
+        """
+        Args:
+            write_batch: 複数行を1トランザクションで書き込む関数
+            queue_size: キューの最大件数
+            batch_size: 1トランザクションで書き込む最大件数
+            flush_interval: 書き込み間隔の上限（秒）
+            enqueue_timeout: キューが満杯の場合に待機する時間（秒）
+        """
+        self._write_batch = write_batch
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self):
+        """書き込みスレッドを起動（起動済みの場合は何もしない）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._closed = False
+            self._thread = threading.Thread(target=self._run, name="rag-log-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, row: Dict[str, Any]):
+        """
+        ログを書き込みキューに追加
+
+        Args:
+            row: 書き込む1行分のデータ（カラム名: 値）
+        """
+        if self._closed:
+            # 停止後（シャットダウン中など）は同期的に書き込む
+            self._write_sync([row])
+            return
+
+        self.start()
+        try:
+            self._queue.put(row, timeout=self.enqueue_timeout)
+            LOG_WRITER_EVENTS.labels("enqueued").inc()
+            LOG_WRITER_QUEUE_DEPTH.set(self._queue.qsize())
+        except queue.Full:
+            # バックプレッシャー: 書き込みが追いつかない場合は呼び出し元で書き込む
+            LOG_WRITER_EVENTS.labels("sync_fallback").inc()
+            self._write_sync([row])
+
+    def submit_nowait(self, row: Dict[str, Any]) -> bool:
+        """
+        ログを待機せずに書き込みキューに追加（イベントループから呼び出す場合）
+
+        Args:
+            row: 書き込む1行分のデータ（カラム名: 値）
+
+        Returns:
+            bool: 追加できた場合True（停止後・キューが満杯の場合はFalse、呼び出し元でsubmitする）
+        """
+        if self._closed:
+            return False
+
+        self.start()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            return False
+        LOG_WRITER_EVENTS.labels("enqueued").inc()
+        LOG_WRITER_QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        キューに積まれたログがすべて書き込まれるまで待機
+
+        Args:
+            timeout: 最大待機時間（秒、Noneの場合は無制限）
+
+        Returns:
+            bool: すべて書き込まれた場合True
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.unfinished_tasks == 0
+
+        if self._queue.unfinished_tasks > 0:
+            # 書き込みスレッドがflush_intervalまでログを集めている場合は、すぐに書き込ませる
+            try:
+                self._queue.put_nowait(_FLUSH)
+            except queue.Full:
+                # 満杯の場合はbatch_size件ごとに書き込まれる
+                pass
+
+        # task_doneで全件の書き込みが終わった時点で通知される条件変数で待つ
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                if self._thread is None or not self._thread.is_alive():
+                    # 書き込みスレッドが停止した場合は、残りが書き込まれることはない
+                    return False
+                # スレッドの停止に気付けるよう、1秒ごとに起きて確認する
+                self._queue.all_tasks_done.wait(1.0 if remaining is None else min(remaining, 1.0))
+        return True
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """
+        残りのログを書き込んでから書き込みスレッドを停止
+
+        Args:
+            timeout: 書き込みスレッドの終了を待つ時間（秒）
+        """
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+            self._thread = None
+
+        if thread is None or not thread.is_alive():
+            return
+
+        # 停止の目印は満杯でも必ず積む（書き込みスレッドが消費するまで待つ）
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        if thread.is_alive():
+            print(f"Log writer did not stop within {timeout}s ({self._queue.qsize()} logs pending)")
+
+    def _run(self):
+        """書き込みスレッドのメインループ"""
+        while True:
+            batch: List[Dict[str, Any]] = []
+            stop = False
+            flushes = 0
+
+            # 最初の1件を待ち、その後はflush_intervalの間にbatch_size件まで集める
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif item is _FLUSH:
+                    flushes += 1
+                else:
+                    batch.append(item)
+                if stop or flushes or len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write_sync(batch)
+            for _ in range(len(batch) + flushes + (1 if stop else 0)):
+                self._queue.task_done()
+            LOG_WRITER_QUEUE_DEPTH.set(self._queue.qsize())
+
+            if stop:
+                # 停止の目印より後に積まれたログも書き込んでから終了する
+                remaining_rows = []
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP and item is not _FLUSH:
+                        remaining_rows.append(item)
+                    self._queue.task_done()
+                if remaining_rows:
+                    self._write_sync(remaining_rows)
+                return
+
+    def _write_sync(self, rows: List[Dict[str, Any]]):
+        """
+        複数行をまとめて書き込み（失敗した場合は1行ずつ書き込み直す）
+
+        Args:
+            rows: 書き込む行のリスト
+        """
+        start = time.perf_counter()
+        try:
+            self._write_batch(rows)
+            LOG_WRITER_EVENTS.labels("written").inc(len(rows))
+        except Exception as e:
+            print(f"Error writing log batch ({len(rows)} rows): {e}")
+            # 1行の不正データでバッチ全体が失われないようにする
+            for row in rows:
+                try:
+                    self._write_batch([row])
+                    LOG_WRITER_EVENTS.labels("written").inc()
+                except Exception as row_error:
+                    LOG_WRITER_EVENTS.labels("failed").inc()
+                    print(f"Error saving log: {row_error}")
+        finally:
+            LOG_WRITER_BATCH_SECONDS.observe(time.perf_counter() - start)
@@ -0,0 +1,99 @@
+"""
+埋め込みモデル・LLMの生成（プロバイダ切り替え）
+"""
+from typing import Optional
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.llms import LLM
+from app.core.config import Settings, settings as default_settings
+
+
+EMBEDDING_PROVIDERS = ("openai", "local")
+LLM_PROVIDERS = ("openai", "local")
+
+
+def _require_openai_key(config: Settings):
+    """OpenAIプロバイダ使用時にAPIキーが設定されているか確認"""
+    if not config.openai_api_key:
+        raise ValueError("OPENAI_API_KEY is required when using the openai provider")
+
+
+def create_embed_model(
+    callback_manager: Optional[CallbackManager] = None,
+    config: Optional[Settings] = None,
+) -> BaseEmbedding:
+    """
+    設定に応じた埋め込みモデルを生成
+
+    Args:
+        callback_manager: コールバックマネージャ（トークン計測用）
+        config: 設定（省略時はグローバル設定）
+
+    Returns:
+        BaseEmbedding: 埋め込みモデル
+
+    Raises:
+        ValueError: 不明なプロバイダ、またはAPIキー未設定の場合
+    """
+    config = config or default_settings
+    provider = config.embedding_provider.lower()
+
+    if provider == "openai":
+        from llama_index.embeddings.openai import OpenAIEmbedding
+        _require_openai_key(config)
+        return OpenAIEmbedding(
+            api_key=config.openai_api_key,
+            api_base=config.openai_api_base,
+            callback_manager=callback_manager,
+        )
+
+    if provider == "local":
+        from app.services.local_models import HashingEmbedding
+        return HashingEmbedding(dimension=config.local_embedding_dim, callback_manager=callback_manager)
+
+    raise ValueError(f"Unknown embedding provider: {config.embedding_provider} (choose from {', '.join(EMBEDDING_PROVIDERS)})")
+
+
+def create_llm(
+    callback_manager: Optional[CallbackManager] = None,
+    config: Optional[Settings] = None,
+) -> LLM:
+    """
+    設定に応じたLLMを生成
+
+    Args:
+        callback_manager: コールバックマネージャ（トークン計測用）
+        config: 設定（省略時はグローバル設定）
+
+    Returns:
+        LLM: LLM
+
+    Raises:
+        ValueError: 不明なプロバイダ、またはAPIキー未設定の場合
+    """
+    config = config or default_settings
+    provider = config.llm_provider.lower()
+
+    if provider == "openai":
+        from llama_index.llms.openai import OpenAI
+        _require_openai_key(config)
+        return OpenAI(
+            api_key=config.openai_api_key,
+            api_base=config.openai_api_base,
+            model=config.llm_model,
+            callback_manager=callback_manager,
+        )
+
+    if provider == "local":
+        from app.services.local_models import LocalEchoLLM
+        return LocalEchoLLM(
+            latency_distribution=config.local_llm_latency_distribution,
+            latency_mean=config.local_llm_latency_mean,
+            latency_stddev=config.local_llm_latency_stddev,
+            tokens_per_second=config.local_llm_tokens_per_second,
+            seed=config.local_llm_seed,
+            callback_manager=callback_manager,
+        )
+
+    raise ValueError(f"Unknown LLM provider: {config.llm_provider} (choose from {', '.join(LLM_PROVIDERS)})")
+
@@ -2,16 +2,98 @@
 RAG検索サービス（Index作成・管理）
 """
 from pathlib import Path
-from typing import List, Optional
-from llama_index.core import Document, VectorStoreIndex, StorageContext, load_index_from_storage
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from llama_index.core import Document, VectorStoreIndex, StorageContext, load_index_from_storage, QueryBundle
+from llama_index.core.callbacks import CallbackManager, TokenCountingHandler
+from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+from llama_index.core.indices.utils import embed_nodes
 from llama_index.core.node_parser import SimpleNodeParser
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.llms.openai import OpenAI
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.response_synthesizers import get_response_synthesizer
+from llama_index.core.schema import NodeWithScore
 from app.core.config import settings
-from app.services.knowledge_service import knowledge_service
+from app.core.metrics import StageTimer, record_tokens, record_cache
+from app.core.registry import registry
+from app.services.chunk_dedup import MinHashDeduplicator
+from app.services.file_summaries import FileSummaryIndex
+from app.services.file_type_profiles import get_profile, has_lexical_profiles, lexical_score, select_by_quota
+from app.services.index_snapshots import IndexSnapshotStore, MANIFEST_FILENAME, read_index_manifest
+from app.services.index_updater import IndexUpdater
+from app.services.knowledge_chunker import KnowledgeChunker
+from app.services.knowledge_service import get_knowledge_service
+from app.services.knowledge_versions import compute_version
+from app.services.model_providers import create_embed_model, create_llm
+from contextvars import ContextVar, Token
+from datetime import datetime
+import hashlib
 import os
 import json
 import re
+import threading
+
+
+class RequestTokenCounter(BaseCallbackHandler):
+    """
+    リクエストごとのトークン数計測
+
+    埋め込みモデル・LLMは全リクエストで共有するため、イベントをcontextvarで保持した
+    そのリクエストのTokenCountingHandlerにのみ渡す（startの前・stopの後の呼び出しは数えない）。
+    """
+    
+    def __init__(self):
+        super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+        self._current: ContextVar[Optional[TokenCountingHandler]] = ContextVar("request_token_counter", default=None)
+    
+    def start(self) -> Tuple[TokenCountingHandler, Token]:
+        """
+        現在のリクエスト（contextvarのコンテキスト）のトークン数の計測を開始
+        
+        Returns:
+            Tuple: (このリクエストのトークン数, stopに渡すトークン)
+        """
+        counter = TokenCountingHandler()
+        return counter, self._current.set(counter)
+    
+    def stop(self, token: Token):
+        """
+        トークン数の計測を終了
+        
+        Args:
+            token: startが返したトークン
+        """
+        self._current.reset(token)
+    
+    def on_event_start(self, event_type, payload=None, event_id="", parent_id="", **kwargs) -> str:
+        counter = self._current.get()
+        if counter is not None:
+            counter.on_event_start(event_type, payload, event_id, parent_id, **kwargs)
+        return event_id
+    
+    def on_event_end(self, event_type, payload=None, event_id="", **kwargs):
+        counter = self._current.get()
+        if counter is not None:
+            counter.on_event_end(event_type, payload, event_id, **kwargs)
+    
+    def start_trace(self, trace_id=None):
+        return
+    
+    def end_trace(self, trace_id=None, trace_map=None):
+        return
+
+
+def _is_lexical(node) -> bool:
+    """キーワード検索のみの種別のchunk（埋め込みを計算しない）か"""
+    return node.metadata.get("retrieval") == "lexical"
+
+
+def _file_type_of(node_with_score: NodeWithScore) -> str:
+    """検索結果のファイル種別"""
+    return node_with_score.node.metadata.get("file_type", "unknown")
+
+
+def _is_embedded(node) -> bool:
+    """埋め込みを計算してベクトルストアに保存するchunk（キーワード検索のみ・重複のchunk以外）か"""
+    return not _is_lexical(node) and "duplicate_of" not in node.metadata
 
 
 class RAGService:
@@ -22,12 +104,60 @@ class RAGService:
         self.index_dir = Path("./storage/index")
         self.index_dir.mkdir(parents=True, exist_ok=True)
         
-        # OpenAI設定
-        self.embed_model = OpenAIEmbedding(api_key=settings.openai_api_key)
-        self.llm = OpenAI(api_key=settings.openai_api_key, model="gpt-4o-mini")
+        # リクエストごとのトークン数計測（検索・回答生成の埋め込み・LLM呼び出しを数える）
+        self.token_counter = RequestTokenCounter()
+        # QueryEngineにも同じものを渡す（渡さないと埋め込みモデル・LLMのものが上書きされる）
+        self.callback_manager = CallbackManager([self.token_counter])
+        
+        # 埋め込みモデル・LLM（settings.embedding_provider/llm_providerで切り替え）
+        self.embed_model = create_embed_model(self.callback_manager)
+        self.llm = create_llm(self.callback_manager)
+        # Indexの作成・更新（バックグラウンドの自動更新を含む）用の埋め込みモデル
+        # リクエストのトークン数に含めないよう、別のコールバックマネージャを使う
+        self.index_callback_manager = CallbackManager([])
+        self.index_embed_model = create_embed_model(self.index_callback_manager)
+        self.model_name = self.llm.metadata.model_name
+        
+        # ファイルごとの要約ベクトル（chunkの埋め込みの重心）による2段階検索
+        self.file_summaries = FileSummaryIndex()
+        # キーワード検索のみの種別のchunk（docstore.docsは参照のたびに全chunkを復元するため、Indexの更新時に取り出しておく）
+        self._lexical_nodes: List[Any] = []
+        # 代表chunkのノードID → 重複として集約したchunkのファイル名
+        self._duplicate_sources: Dict[str, List[str]] = {}
+        # 代表chunkのMinHash署名（Indexの読み込み後は、最初の更新時に作成する）
+        self._dedup: Optional[MinHashDeduplicator] = None
+        
+        # Knowledgeファイルのchunk分割（事例・見出し単位、トークン数の上限ごと）
+        self._chunkers: Dict[int, KnowledgeChunker] = {}
         
         # Index（遅延読み込み）
         self._index: Optional[VectorStoreIndex] = None
+        # Indexの作成元のKnowledgeのマニフェスト（version, built_at, files）
+        self.index_manifest: Optional[Dict[str, Any]] = None
+        
+        # Indexを保存するたびにKnowledgeのバージョン別のスナップショットを作成する
+        self.snapshots: Optional[IndexSnapshotStore] = None
+        if settings.knowledge_versioning_enabled:
+            self.snapshots = IndexSnapshotStore(Path(settings.index_snapshot_dir), keep=settings.index_snapshot_keep)
+        
+        # Indexの作成・更新は1つずつ行い、chunkの削除・追加の間は検索を待たせる
+        self._update_lock = threading.RLock()
+        self._index_lock = threading.RLock()
+        
+        # Knowledgeファイルの変更を自動でIndexに反映する
+        self.index_updater: Optional[IndexUpdater] = None
+        if settings.knowledge_auto_reindex:
+            self.index_updater = IndexUpdater(
+                self.update_files,
+                debounce=settings.knowledge_reindex_debounce,
+                max_delay=settings.knowledge_reindex_max_delay,
+                max_retries=settings.knowledge_reindex_max_retries,
+                retry_backoff=settings.knowledge_reindex_retry_backoff,
+            )
+            try:
+                get_knowledge_service().catalog.subscribe(self.index_updater.on_catalog_change)
+            except FileNotFoundError as e:
+                print(f"Knowledge changes will not be indexed automatically: {e}")
     
     def create_index(self) -> dict:
         """
@@ -42,6 +172,7 @@ class RAGService:
         """
         try:
             # Knowledgeファイル一覧を取得
+            knowledge_service = get_knowledge_service()
             files = knowledge_service.get_file_list()
             
             if not files:
@@ -53,26 +184,7 @@ class RAGService:
                 }
             
             # Documentを作成
-            documents = []
-            for file_info in files:
-                try:
-                    file_content = knowledge_service.get_file_content(file_info["filename"])
-                    content = file_content["content"]
-                    
-                    # Document作成（メタデータ付与）
-                    doc = Document(
-                        text=content,
-                        metadata={
-                            "file_name": file_info["filename"],
-                            "file_type": file_info["file_type"],
-                            "file_size": file_info["size"],
-                            "updated_at": file_info["updated_at"],
-                        }
-                    )
-                    documents.append(doc)
-                except Exception as e:
-                    print(f"Error processing file {file_info['filename']}: {e}")
-                    continue
+            documents = self._load_documents(files)
             
             if not documents:
                 return {
@@ -82,40 +194,37 @@ class RAGService:
                     "total_chunks": 0,
                 }
             
-            # chunk分割（200-500文字、意味的なまとまりを優先）
-            node_parser = SimpleNodeParser.from_defaults(
-                chunk_size=400,  # 400文字を目安
-                chunk_overlap=50,  # 50文字のオーバーラップ
-            )
-            
             # Documentをchunkに分割
-            nodes = []
-            for doc in documents:
-                doc_nodes = node_parser.get_nodes_from_documents([doc])
-                # chunk_indexをメタデータに追加
-                for idx, node in enumerate(doc_nodes):
-                    node.metadata["chunk_index"] = idx
-                    node.metadata["file_name"] = doc.metadata["file_name"]
-                    node.metadata["file_type"] = doc.metadata["file_type"]
-                nodes.extend(doc_nodes)
-            
-            # Index作成
-            index = VectorStoreIndex(
-                nodes=nodes,
-                embed_model=self.embed_model,
-            )
+            nodes = self._split_documents(documents)
             
-            # Indexを保存
-            self._save_index(index)
-            
-            # Indexをメモリに保持
-            self._index = index
+            with self._update_lock:
+                # ほぼ同じ内容のchunkは最初のものを代表とし、残りは代表chunkを参照する
+                dedup = MinHashDeduplicator(threshold=settings.knowledge_dedup_threshold)
+                duplicates = self._deduplicate(nodes, dedup)
+                
+                # Index作成（キーワード検索のみの種別・重複のchunkは埋め込みを計算せず、docstoreにのみ保存する）
+                index = VectorStoreIndex(
+                    nodes=[node for node in nodes if _is_embedded(node)],
+                    embed_model=self.index_embed_model,
+                    callback_manager=self.index_callback_manager,
+                )
+                index.docstore.add_documents([node for node in nodes if not _is_embedded(node)])
+                
+                # Indexを保存
+                self._save_index(index)
+                
+                # ファイルごとの要約ベクトル（2段階検索の1段目）を作成してからIndexをメモリに保持
+                self._refresh_search_state(index)
+                self._dedup = dedup
+                self._index = index
             
             return {
                 "success": True,
                 "message": "Index created successfully",
                 "indexed_files": len(documents),
                 "total_chunks": len(nodes),
+                "duplicate_chunks": duplicates,
+                "dedup_ratio": round(duplicates / len(nodes), 4) if nodes else 0.0,
             }
             
         except Exception as e:
@@ -126,10 +235,295 @@ class RAGService:
                 "total_chunks": 0,
             }
     
-    def load_index(self) -> bool:
+    def _load_documents(self, files: List[Dict]) -> List[Document]:
+        """
+        KnowledgeファイルからDocumentを作成
+        
+        Args:
+            files: ファイル情報のリスト（KnowledgeService.get_file_listの要素）
+            
+        Returns:
+            List[Document]: Document（読み込めなかったファイルは除く）
+        """
+        knowledge_service = get_knowledge_service()
+        # キャッシュにないファイルはストレージからまとめて（並列に）読み込む
+        contents = knowledge_service.get_file_contents(file_info["filename"] for file_info in files)
+        documents = []
+        for file_info in files:
+            try:
+                file_content = contents.get(file_info["filename"])
+                if file_content is None:
+                    raise FileNotFoundError(f"File not found: {file_info['filename']}")
+                content = file_content["content"]
+                
+                # 作成元の内容のハッシュ（Indexのマニフェストに記録し、内容が同じファイルの再計算を省く）
+                data = content.encode("utf-8")
+                if knowledge_service.versions is not None:
+                    content_hash = knowledge_service.versions.put_blob(data)
+                else:
+                    content_hash = hashlib.sha256(data).hexdigest()
+                
+                # Document作成（メタデータ付与）
+                # IDをファイル名にする（ファイル単位でchunkを削除・追加するため）
+                doc = Document(
+                    id_=file_info["filename"],
+                    text=content,
+                    metadata={
+                        "file_name": file_info["filename"],
+                        "file_type": file_info["file_type"],
+                        "file_size": file_content["size"],
+                        "updated_at": file_content["updated_at"],
+                        "content_sha256": content_hash,
+                    },
+                    # ハッシュは埋め込み・LLMに渡すテキストに含めない
+                    excluded_embed_metadata_keys=["content_sha256"],
+                    excluded_llm_metadata_keys=["content_sha256"],
+                )
+                documents.append(doc)
+            except Exception as e:
+                print(f"Error processing file {file_info['filename']}: {e}")
+                continue
+        return documents
+    
+    def _split_documents(self, documents: List[Document]) -> list:
+        """
+        Documentをchunkに分割（分割方法・サイズはファイル種別のプロファイルに従う）
+        
+        Args:
+            documents: Documentのリスト
+            
+        Returns:
+            list: chunk（ノード）のリスト
+        """
+        nodes = []
+        for doc in documents:
+            profile = get_profile(doc.metadata["file_type"])
+            if profile["splitter"] == "structured":
+                doc_nodes = self._split_structured(doc, profile["chunk_size"])
+            else:
+                doc_nodes = self._split_by_sentence(doc, profile["chunk_size"], profile["chunk_overlap"])
+            
+            if profile["lexical_only"]:
+                # 埋め込みを計算せず、キーワード検索の対象にする
+                for node in doc_nodes:
+                    node.metadata["retrieval"] = "lexical"
+                    node.excluded_embed_metadata_keys = [*node.excluded_embed_metadata_keys, "retrieval"]
+                    node.excluded_llm_metadata_keys = [*node.excluded_llm_metadata_keys, "retrieval"]
+            nodes.extend(doc_nodes)
+        return nodes
+    
+    def _split_structured(self, doc: Document, chunk_size: int) -> list:
+        """
+        Documentを事例・見出し単位でchunkに分割（1件の事例を1つのchunkにする）
+        
+        Args:
+            doc: Document
+            chunk_size: chunkのトークン数の上限
+            
+        Returns:
+            list: chunk（ノード）のリスト
+        """
+        chunker = self._chunkers.get(chunk_size)
+        if chunker is None:
+            chunker = self._chunkers[chunk_size] = KnowledgeChunker(max_tokens=chunk_size)
+        
+        chunks = chunker.split(doc.text)
+        doc_nodes = build_nodes_from_splits([chunk["text"] for chunk in chunks], doc)
+        for idx, (node, chunk) in enumerate(zip(doc_nodes, chunks)):
+            node.metadata = dict(doc.metadata)
+            node.metadata["chunk_index"] = idx
+            if "section" in chunk:
+                node.metadata["section"] = chunk["section"]
+            if "case_no" in chunk:
+                node.metadata["case_no"] = chunk["case_no"]
+            # 事例番号はchunkの先頭行に含まれるため、埋め込み・LLMに渡すテキストには重ねて含めない
+            node.excluded_embed_metadata_keys = [*doc.excluded_embed_metadata_keys, "case_no"]
+            node.excluded_llm_metadata_keys = [*doc.excluded_llm_metadata_keys, "case_no"]
+        return doc_nodes
+    
+    def _split_by_sentence(self, doc: Document, chunk_size: int, chunk_overlap: int) -> list:
+        """
+        Documentを文字数でchunkに分割
+        
+        Args:
+            doc: Document
+            chunk_size: chunkのトークン数の目安
+            chunk_overlap: オーバーラップのトークン数
+            
+        Returns:
+            list: chunk（ノード）のリスト
+        """
+        node_parser = SimpleNodeParser.from_defaults(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+        )
+        
+        doc_nodes = node_parser.get_nodes_from_documents([doc])
+        # chunk_indexをメタデータに追加
+        for idx, node in enumerate(doc_nodes):
+            node.metadata["chunk_index"] = idx
+            node.metadata["file_name"] = doc.metadata["file_name"]
+            node.metadata["file_type"] = doc.metadata["file_type"]
+        return doc_nodes
+    
+    def update_files(self, filenames: Iterable[str]) -> dict:
+        """
+        変更されたKnowledgeファイルのchunkだけをIndexから削除・追加
+        
+        埋め込みは変更されたファイルの分だけ計算する。
+        
+        Args:
+            filenames: 追加・更新・削除されたファイル名
+            
+        Returns:
+            dict: 更新結果
+                - success: 成功フラグ
+                - message: メッセージ
+                - updated_files: Indexに追加（更新）したファイル名
+                - removed_files: Indexから削除したファイル名
+                - unchanged_files: 内容が変わっていないため更新しなかったファイル名
+                - deleted_chunks: 削除したchunk数
+                - inserted_chunks: 追加したchunk数
+                - duplicate_chunks: 追加したchunkのうち、既存のchunkの重複として埋め込みを計算しなかった数
+        """
+        filenames = set(filenames)
+        with self._update_lock:
+            if self._index is None and not self.load_index(reconcile=False):
+                # Indexがまだない場合は、作成時にすべてのファイルが含まれる
+                return {
+                    "success": False,
+                    "message": "Index not found",
+                    "updated_files": [],
+                    "removed_files": [],
+                    "unchanged_files": [],
+                    "deleted_chunks": 0,
+                    "inserted_chunks": 0,
+                    "duplicate_chunks": 0,
+                }
+            index = self._index
+            
+            catalog = get_knowledge_service().catalog
+            files = [catalog.get(name) for name in sorted(filenames)]
+            documents = self._load_documents([info for info in files if info is not None])
+            
+            # 内容が変わっていないファイル（更新日時のみの変更、ロールバック後など）は再計算しない
+            indexed = self._indexed_hashes(index)
+            unchanged = {
+                doc.metadata["file_name"] for doc in documents
+                if indexed.get(doc.metadata["file_name"]) == doc.metadata["content_sha256"]
+            }
+            loaded = {doc.metadata["file_name"] for doc in documents}
+            documents = [doc for doc in documents if doc.metadata["file_name"] not in unchanged]
+            # Indexにもディレクトリにもないファイル（作成後すぐに削除されたファイルなど）は対象外
+            filenames = {name for name in filenames - unchanged if name in indexed or name in loaded}
+            if not filenames:
+                return {
+                    "success": True,
+                    "message": "Index is up to date",
+                    "updated_files": [],
+                    "removed_files": [],
+                    "unchanged_files": sorted(unchanged),
+                    "deleted_chunks": 0,
+                    "inserted_chunks": 0,
+                    "duplicate_chunks": 0,
+                }
+            nodes = self._split_documents(documents)
+            
+            docs = index.docstore.docs
+            old_nodes = [node for node in docs.values() if node.metadata.get("file_name") in filenames]
+            old_node_ids = [node.node_id for node in old_nodes]
+            try:
+                # 削除する代表chunkを他のファイルの重複が参照している場合は、重複の1つを代表に昇格する
+                dedup = self._get_deduplicator(docs)
+                promoted, repointed = self._release_canonical_nodes(index, docs, old_nodes, dedup)
+                duplicates = self._deduplicate(nodes, dedup)
+                
+                # 埋め込みは検索を止めないようにロックの外で計算する（キーワード検索のみ・重複のchunkは計算しない）
+                vector_nodes = [node for node in nodes if _is_embedded(node)]
+                embeddings = embed_nodes(vector_nodes, self.index_embed_model)
+                for node in vector_nodes:
+                    node.embedding = embeddings[node.node_id]
+            except Exception:
+                # 重複の判定の状態がIndexと食い違わないよう、次回に作り直す
+                self._dedup = None
+                raise
+            
+            with self._index_lock:
+                old_vector_ids = [node.node_id for node in old_nodes if _is_embedded(node)]
+                if old_vector_ids:
+                    index.delete_nodes(old_vector_ids, delete_from_docstore=True)
+                for node in old_nodes:
+                    if not _is_embedded(node):
+                        index.docstore.delete_document(node.node_id)
+                if promoted or vector_nodes:
+                    index.insert_nodes(promoted + vector_nodes)
+                index.docstore.add_documents([node for node in nodes if not _is_embedded(node)] + repointed)
+                self._refresh_search_state(index, filenames | {node.metadata["file_name"] for node in promoted})
+            
+            self._save_index(index)
+        
+        updated = sorted(doc.metadata["file_name"] for doc in documents)
+        return {
+            "success": True,
+            "message": "Index updated successfully",
+            "updated_files": updated,
+            "removed_files": sorted(filenames - set(updated)),
+            "unchanged_files": sorted(unchanged),
+            "deleted_chunks": len(old_node_ids),
+            "inserted_chunks": len(nodes),
+            "duplicate_chunks": duplicates,
+        }
+    
+    def _indexed_hashes(self, index: VectorStoreIndex) -> Dict[str, Optional[str]]:
+        """
+        Indexに含まれるファイル名 → 作成元の内容のハッシュ
+        
+        Args:
+            index: VectorStoreIndex
+            
+        Returns:
+            Dict[str, Optional[str]]: ファイル名 → ハッシュ（ハッシュを記録する前に作成したIndexはNone）
+        """
+        return {
+            node.metadata.get("file_name"): node.metadata.get("content_sha256")
+            for node in index.docstore.docs.values()
+        }
+    
+    def _stale_files(self, index: VectorStoreIndex) -> Set[str]:
+        """
+        Indexの内容が現在のKnowledgeファイルと異なるファイル名（停止中に変更されたファイルなど）
+        
+        Args:
+            index: VectorStoreIndex
+            
+        Returns:
+            Set[str]: 追加・更新・削除が必要なファイル名
+        """
+        knowledge_service = get_knowledge_service()
+        hashes = self._indexed_hashes(index)
+        if knowledge_service.versions is not None and None not in hashes.values():
+            # 内容のハッシュで比較する（更新日時のみ変わったファイルは対象にしない）
+            knowledge_service.wait_for_versions()
+            current = knowledge_service.versions.head_hashes()
+            return {name for name in set(hashes) | set(current) if hashes.get(name) != current.get(name)}
+        
+        indexed: Dict[str, Tuple] = {}
+        for node in index.docstore.docs.values():
+            metadata = node.metadata
+            indexed[metadata.get("file_name")] = (metadata.get("file_size"), metadata.get("updated_at"))
+        current = {
+            info["filename"]: (info["size"], info["updated_at"])
+            for info in knowledge_service.get_file_list()
+        }
+        return {name for name in set(indexed) | set(current) if indexed.get(name) != current.get(name)}
+    
+    def load_index(self, reconcile: bool = True) -> bool:
         """
         保存されたIndexを読み込む
         
+        Args:
+            reconcile: Trueの場合、保存後に変更されたKnowledgeファイルを自動更新の対象に追加する
+        
         Returns:
             bool: 読み込み成功フラグ
         """
@@ -145,8 +539,15 @@ class RAGService:
             storage_context = StorageContext.from_defaults(persist_dir=str(self.index_dir))
             self._index = load_index_from_storage(
                 storage_context,
-                embed_model=self.embed_model,
+                embed_model=self.index_embed_model,
+                callback_manager=self.index_callback_manager,
             )
+            self.index_manifest = read_index_manifest(self.index_dir)
+            self._refresh_search_state(self._index)
+            self._dedup = None
+            
+            if reconcile and self.index_updater is not None:
+                self.index_updater.submit(self._stale_files(self._index))
             return True
         except Exception as e:
             print(f"Error loading index: {e}")
@@ -154,12 +555,77 @@ class RAGService:
     
     def _save_index(self, index: VectorStoreIndex):
         """
-        Indexを保存
+        Indexを保存し、作成元のKnowledgeのマニフェストを記録してスナップショットを作成
         
         Args:
             index: VectorStoreIndex
         """
         index.storage_context.persist(persist_dir=str(self.index_dir))
+        
+        hashes = self._indexed_hashes(index)
+        if None in hashes.values():
+            # ハッシュを記録する前に作成したchunkが残っている場合は記録しない
+            self.index_manifest = None
+            (self.index_dir / MANIFEST_FILENAME).unlink(missing_ok=True)
+            return
+        
+        manifest = {
+            "version": compute_version(hashes),
+            "built_at": datetime.now().isoformat(),
+            "files": dict(sorted(hashes.items())),
+        }
+        (self.index_dir / MANIFEST_FILENAME).write_text(
+            json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        self.index_manifest = manifest
+        if self.snapshots is not None:
+            try:
+                self.snapshots.save(self.index_dir, manifest["version"])
+            except Exception as e:
+                print(f"Error saving index snapshot: {e}")
+    
+    def rollback(self, version: str) -> dict:
+        """
+        Indexとknowledgeファイルを、スナップショットを作成したときのバージョンに戻す
+        
+        Indexはスナップショットをそのまま読み込むため、埋め込みは計算し直さない。
+        
+        Args:
+            version: KnowledgeのバージョンID（Index状態確認・スナップショット一覧の version）
+            
+        Returns:
+            dict: ロールバック結果
+                - success: 成功フラグ
+                - message: メッセージ
+                - version: 戻したバージョンID
+                - restored_files: 内容を書き戻したKnowledgeファイル名
+                - removed_files: 削除したKnowledgeファイル名
+        """
+        manifest = self.snapshots.get(version) if self.snapshots is not None else None
+        if manifest is None:
+            return {
+                "success": False,
+                "message": f"Index snapshot not found: {version}",
+                "version": version,
+                "restored_files": [],
+                "removed_files": [],
+            }
+        
+        with self._update_lock:
+            # 先にKnowledgeファイルを戻す（変更の通知による自動更新は、内容がIndexと同じため何もしない）
+            restored = get_knowledge_service().restore_version(manifest["files"])
+            with self._index_lock:
+                self.snapshots.restore(version, self.index_dir)
+                self._index = None
+                loaded = self.load_index(reconcile=False)
+        
+        return {
+            "success": loaded,
+            "message": "Index rolled back successfully" if loaded else "Error loading restored index",
+            "version": version,
+            "restored_files": restored["restored"],
+            "removed_files": restored["removed"],
+        }
     
     def get_index(self) -> Optional[VectorStoreIndex]:
         """
@@ -188,6 +654,206 @@ class RAGService:
             return True
         return self.load_index()
     
+    def _retrieve(self, index: VectorStoreIndex, query_bundle: QueryBundle, top_k: int) -> List[NodeWithScore]:
+        """
+        ファイル種別のプロファイルに従って検索（種別ごとの件数の上限、キーワード検索のみの種別）
+        
+        キーワード検索の一致率とベクトル検索のコサイン類似度は尺度が異なるため、1つの順位にはまとめない。
+        キーワード検索の結果は一致率が search_lexical_min_score 以上のものを種別の上限まで選び、
+        ベクトル検索の結果の後ろに、その件数分の枠を空けて加える。
+        
+        Args:
+            index: VectorStoreIndex
+            query_bundle: 検索クエリ（埋め込みを計算済みの場合は含める）
+            top_k: 返す検索結果の数
+            
+        Returns:
+            List[NodeWithScore]: 検索結果（ベクトル検索・キーワード検索それぞれスコアの高い順）
+        """
+        # 種別ごとの上限で除外される分を見込んで多めに取得する
+        candidate_k = top_k * max(settings.search_candidate_multiplier, 1)
+        if settings.search_two_stage and self.file_summaries.ready:
+            candidates = self._two_stage_retrieve(index, query_bundle, candidate_k)
+        else:
+            candidates = index.as_retriever(similarity_top_k=candidate_k, embed_model=self.embed_model).retrieve(query_bundle)
+        results = select_by_quota(candidates, top_k, _file_type_of)
+        if not has_lexical_profiles():
+            return results
+        
+        lexical = [
+            node_with_score
+            for node_with_score in self._lexical_retrieve(index, query_bundle.query_str, top_k)
+            if node_with_score.score >= settings.search_lexical_min_score
+        ]
+        # ベクトル検索の結果が1件以上ある場合は、少なくとも1件は残す
+        lexical = select_by_quota(lexical, top_k - min(len(results), 1), _file_type_of, fill_overflow=False)
+        return results[:top_k - len(lexical)] + lexical
+    
+    def _refresh_search_state(self, index: VectorStoreIndex, filenames: Optional[Iterable[str]] = None):
+        """
+        Indexの作成・読み込み・更新後に、検索用の要約ベクトル・キーワード検索の対象・重複の参照元を作り直す
+        
+        Args:
+            index: VectorStoreIndex
+            filenames: 更新したファイル名（省略時はすべて）
+        """
+        if filenames is None:
+            self.file_summaries.rebuild(index)
+        else:
+            self.file_summaries.update(index, filenames)
+        lexical_nodes = []
+        duplicate_sources: Dict[str, Set[str]] = {}
+        for node in index.docstore.docs.values():
+            if _is_lexical(node):
+                lexical_nodes.append(node)
+            canonical = node.metadata.get("duplicate_of")
+            if canonical is not None:
+                duplicate_sources.setdefault(canonical, set()).add(node.metadata.get("file_name"))
+        self._lexical_nodes = lexical_nodes
+        self._duplicate_sources = {node_id: sorted(names) for node_id, names in duplicate_sources.items()}
+    
+    def _get_deduplicator(self, docs: Dict[str, Any]) -> MinHashDeduplicator:
+        """
+        代表chunkのMinHash署名（Indexの読み込み後、最初に呼び出したときにdocstoreから作成する）
+        
+        Args:
+            docs: Indexのdocstoreのchunk（ノードID → ノード）
+            
+        Returns:
+            MinHashDeduplicator: 重複の判定
+        """
+        if self._dedup is None:
+            dedup = MinHashDeduplicator(threshold=settings.knowledge_dedup_threshold)
+            for node_id, node in docs.items():
+                if _is_embedded(node):
+                    dedup.add(node_id, dedup.signature(node.get_content()))
+            self._dedup = dedup
+        return self._dedup
+    
+    def _deduplicate(self, nodes: list, dedup: MinHashDeduplicator) -> int:
+        """
+        ほぼ同じ内容の代表chunkがあるchunkを重複として印を付ける（代表chunkのノードIDを duplicate_of に記録）
+        
+        重複のchunkは埋め込みを計算せずdocstoreにのみ保存し、検索結果では代表chunkの source_files に含める。
+        
+        Args:
+            nodes: 追加するchunk（ノード）のリスト（重複でないchunkは代表chunkとして dedup に追加する）
+            dedup: 重複の判定
+            
+        Returns:
+            int: 重複として印を付けたchunk数
+        """
+        if not settings.knowledge_dedup_enabled:
+            return 0
+        
+        duplicates = 0
+        for node in nodes:
+            if _is_lexical(node):
+                continue
+            signature = dedup.signature(node.get_content())
+            match = dedup.find(signature)
+            if match is None:
+                dedup.add(node.node_id, signature)
+                continue
+            node.metadata["duplicate_of"] = match[0]
+            node.excluded_embed_metadata_keys = [*node.excluded_embed_metadata_keys, "duplicate_of"]
+            node.excluded_llm_metadata_keys = [*node.excluded_llm_metadata_keys, "duplicate_of"]
+            duplicates += 1
+        return duplicates
+    
+    def _release_canonical_nodes(
+        self,
+        index: VectorStoreIndex,
+        docs: Dict[str, Any],
+        old_nodes: list,
+        dedup: MinHashDeduplicator,
+    ) -> Tuple[list, list]:
+        """
+        削除するchunkを代表から外し、他のファイルの重複が参照している場合は重複の1つを代表に昇格する
+        
+        昇格したchunkには元の代表chunkの埋め込みを使うため、埋め込みは計算し直さない。
+        
+        Args:
+            index: VectorStoreIndex
+            docs: Indexのdocstoreのchunk（ノードID → ノード）
+            old_nodes: 削除するchunk
+            dedup: 重複の判定
+            
+        Returns:
+            Tuple[list, list]: (代表に昇格したchunk, 参照先を昇格したchunkに変更した重複のchunk)
+        """
+        old_ids = {node.node_id for node in old_nodes}
+        aliases: Dict[str, list] = {}
+        for node in docs.values():
+            canonical = node.metadata.get("duplicate_of")
+            if canonical in old_ids and node.node_id not in old_ids:
+                aliases.setdefault(canonical, []).append(node)
+        
+        promoted, repointed = [], []
+        for node in old_nodes:
+            signature = dedup.get(node.node_id)
+            dedup.remove(node.node_id)
+            if node.node_id not in aliases:
+                continue
+            head, *rest = aliases[node.node_id]
+            del head.metadata["duplicate_of"]
+            try:
+                head.embedding = index.vector_store.get(node.node_id)
+            except Exception:
+                # 埋め込みを取得できないベクトルストアの場合は、追加時に計算する
+                head.embedding = None
+            promoted.append(head)
+            if signature is not None:
+                dedup.add(head.node_id, signature)
+            for alias in rest:
+                alias.metadata["duplicate_of"] = head.node_id
+                repointed.append(alias)
+        return promoted, repointed
+    
+    def _two_stage_retrieve(self, index: VectorStoreIndex, query_bundle: QueryBundle, top_k: int) -> List[NodeWithScore]:
+        """
+        ファイルの要約ベクトルでファイルを選び、選んだファイルのchunkのみを検索
+        
+        Args:
+            index: VectorStoreIndex
+            query_bundle: 検索クエリ（埋め込みがない場合は計算する）
+            top_k: 返す検索結果の数
+            
+        Returns:
+            List[NodeWithScore]: 検索結果（スコアの高い順）
+        """
+        query_embedding = query_bundle.embedding
+        if query_embedding is None:
+            query_embedding = self.embed_model.get_query_embedding(query_bundle.query_str)
+        
+        results = []
+        for node_id, score in self.file_summaries.search(query_embedding, settings.search_top_files, top_k):
+            # 要約ベクトルの更新前に削除されたchunkは除く
+            node = index.docstore.get_node(node_id, raise_error=False)
+            if node is not None:
+                results.append(NodeWithScore(node=node, score=score))
+        return results
+    
+    def _lexical_retrieve(self, index: VectorStoreIndex, query: str, top_k: int) -> List[NodeWithScore]:
+        """
+        キーワード検索のみの種別のchunkを、クエリの文字bigramの一致率で検索
+        
+        Args:
+            index: VectorStoreIndex
+            query: 検索クエリ
+            top_k: 返す検索結果の最大数
+            
+        Returns:
+            List[NodeWithScore]: 検索結果（スコアの高い順、一致しないchunkは含まない）
+        """
+        results = []
+        for node in self._lexical_nodes:
+            score = lexical_score(query, node.get_content())
+            if score > 0:
+                results.append(NodeWithScore(node=node, score=score))
+        results.sort(key=lambda node_with_score: node_with_score.score, reverse=True)
+        return results[:top_k]
+    
     def search(self, query: str, top_k: int = 5) -> dict:
         """
         RAG検索を実行（LLM統合なし、検索結果のみ返す）
@@ -206,10 +872,29 @@ class RAGService:
                     - file_name: 参照ファイル名
                     - file_type: ファイル種別
                     - chunk_index: chunk番号
+                    - source_files: 同じ内容を含むファイル名（file_nameと、重複として集約したchunkのファイル）
                 - referenced_files: 参照されたファイル名の一覧（重複なし）
+                - timings: ステージ別処理時間（embed, retrieve）
+                - index_cache_hit: Indexがメモリ上にあった場合True
         """
+        return self._search(query, top_k)[0]
+    
+    def _search(self, query: str, top_k: int) -> Tuple[dict, List[NodeWithScore]]:
+        """
+        RAG検索を実行し、検索結果と検索したノードを返す（回答生成でノードを再検索せずに使うため）
+        
+        Args:
+            query: 検索クエリ
+            top_k: 返す検索結果の数
+            
+        Returns:
+            Tuple[dict, List[NodeWithScore]]: (searchの戻り値, 検索したノード)
+        """
+        timer = StageTimer("search")
         try:
             # Indexを取得
+            index_cache_hit = self._index is not None
+            record_cache("index", index_cache_hit)
             index = self.get_index()
             if index is None:
                 return {
@@ -218,11 +903,15 @@ class RAGService:
                     "message": "Index not found. Please create index first.",
                     "results": [],
                     "referenced_files": [],
-                }
+                }, []
+            
+            # クエリの埋め込みを計算（検索と分けて計測するため）
+            with timer.stage("embed"):
+                query_embedding = self.embed_model.get_query_embedding(query)
             
             # 検索クエリを実行（Retrieverを使用して検索結果のみ取得）
-            retriever = index.as_retriever(similarity_top_k=top_k)
-            nodes = retriever.retrieve(query)
+            with timer.stage("retrieve"), self._index_lock:
+                nodes = self._retrieve(index, QueryBundle(query_str=query, embedding=query_embedding), top_k)
             
             # 検索結果を整形
             results = []
@@ -245,6 +934,9 @@ class RAGService:
                 # ノードID（chunk_id）を取得
                 chunk_id = node.node_id if hasattr(node, "node_id") else node.id_ if hasattr(node, "id_") else None
                 
+                # 同じ内容のchunkを重複として集約したファイルも出典に含める
+                source_files = [file_name, *(name for name in self._duplicate_sources.get(chunk_id, []) if name != file_name)]
+                
                 results.append({
                     "chunk_id": chunk_id,
                     "text": text,
@@ -252,17 +944,21 @@ class RAGService:
                     "file_name": file_name,
                     "file_type": file_type,
                     "chunk_index": chunk_index,
+                    "source_files": source_files,
                 })
                 
-                referenced_files.add(file_name)
+                referenced_files.update(source_files)
             
+            timer.finish()
             return {
                 "success": True,
                 "query": query,
                 "results": results,
                 "referenced_files": list(referenced_files),
                 "total_results": len(results),
-            }
+                "timings": timer.timings,
+                "index_cache_hit": index_cache_hit,
+            }, nodes
             
         except Exception as e:
             return {
@@ -271,7 +967,7 @@ class RAGService:
                 "message": f"Search error: {str(e)}",
                 "results": [],
                 "referenced_files": [],
-            }
+            }, []
     
     def generate_answer(self, query: str, case_info: Optional[dict] = None, top_k: int = 5) -> dict:
         """
@@ -290,15 +986,19 @@ class RAGService:
                 - reasoning: 判断理由（参照ファイル名を含む）
                 - referenced_files: 参照されたファイル名の一覧
                 - search_results: 検索結果（デバッグ用）
+                - metrics: ステージ別処理時間・トークン数・キャッシュヒット（ログ保存用）
         """
         import time
         max_retries = 3
         retry_delay = 1
         
         for attempt in range(max_retries):
+            timer = StageTimer("answer")
+            # このリクエストの埋め込み・LLM呼び出しのみを数える（他のリクエスト・Indexの更新は含まない）
+            tokens, tokens_scope = self.token_counter.start()
             try:
                 # まず検索を実行
-                search_result = self.search(query, top_k=top_k)
+                search_result, search_nodes = self._search(query, top_k)
                 
                 if not search_result["success"] or not search_result["results"]:
                     return {
@@ -310,6 +1010,11 @@ class RAGService:
                         "message": search_result.get("message", "No search results found"),
                     }
                 
+                for stage_name, elapsed in search_result.get("timings", {}).items():
+                    timer.add(stage_name, elapsed)
+                
+                timer.start("prompt_build")
+                
                 # プロンプトテンプレートを作成
                 # 事例番号を抽出する関数
                 def extract_case_numbers(text: str) -> List[str]:
@@ -426,15 +1131,19 @@ class RAGService:
 - 不確実な情報は推測ではなく「情報不足」と明記すること（ただし、「参照事例番号」については上記のルールに従うこと）
 - 最終判断はユーザーが行うことを前提に、支援情報を提供すること
 """
+                timer.stop("prompt_build")
                 
-                # LLMで回答を生成
-                query_engine = self.get_index().as_query_engine(
+                # LLMで回答を生成（検索済みのノードを渡し、プロンプトの埋め込み・再検索は行わない）
+                # callback_managerを渡さないとLLMのトークン計測が外れるため、明示的に渡す
+                response_synthesizer = get_response_synthesizer(
                     llm=self.llm,
-                    similarity_top_k=top_k,
+                    callback_manager=self.callback_manager,
                 )
+                with timer.stage("llm"):
+                    response = response_synthesizer.synthesize(prompt, nodes=search_nodes)
+                    answer_text = str(response) if hasattr(response, '__str__') else str(response)
                 
-                response = query_engine.query(prompt)
-                answer_text = str(response) if hasattr(response, '__str__') else str(response)
+                timer.start("postprocess")
                 
                 # 判断理由を抽出（参照ファイル名を含む）
                 # 回答テキストから「3. 判断理由」セクションを抽出
@@ -460,6 +1169,15 @@ class RAGService:
                 if not reasoning:
                     reasoning = f"参照したKnowledgeファイル: {', '.join(referenced_files)}"
                 
+                timer.stop("postprocess")
+                timer.finish()
+                
+                # トークン数を記録
+                prompt_tokens = tokens.prompt_llm_token_count
+                completion_tokens = tokens.completion_llm_token_count
+                embedding_tokens = tokens.total_embedding_token_count
+                record_tokens(prompt_tokens, completion_tokens, embedding_tokens)
+                
                 return {
                     "success": True,
                     "query": query,
@@ -467,6 +1185,17 @@ class RAGService:
                     "reasoning": reasoning,
                     "referenced_files": referenced_files,
                     "search_results": search_result["results"],  # 全ての検索結果
+                    "metrics": {
+                        "embed_time": timer.timings.get("embed"),
+                        "retrieve_time": timer.timings.get("retrieve"),
+                        "prompt_build_time": timer.timings.get("prompt_build"),
+                        "llm_time": timer.timings.get("llm"),
+                        "postprocess_time": timer.timings.get("postprocess"),
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "embedding_tokens": embedding_tokens,
+                        "index_cache_hit": search_result.get("index_cache_hit"),
+                    },
                 }
                 
             except Exception as e:
@@ -498,6 +1227,8 @@ class RAGService:
                         "referenced_files": [],
                         "message": f"Error generating answer: {error_msg}",
                     }
+            finally:
+                self.token_counter.stop(tokens_scope)
         
         return {
             "success": False,
@@ -509,6 +1240,21 @@ class RAGService:
         }
 
 
-# シングルトンインスタンス
-rag_service = RAGService()
+    def close(self):
+        """Indexの自動更新を停止"""
+        if self.index_updater is not None:
+            self.index_updater.close()
+
+
+# シングルトンインスタンス（初回使用時に生成）
+registry.register("rag_service", RAGService)
+
+
+def get_rag_service() -> RAGService:
+    """
+    RAGServiceのインスタンスを取得
 
+    Returns:
+        RAGService: シングルトンインスタンス
+    """
+    return registry.get("rag_service")
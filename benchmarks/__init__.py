@@ -0,0 +1,3 @@
+"""
+ベンチマークスイート（オフライン実行）
+"""
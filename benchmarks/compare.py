@@ -0,0 +1,54 @@
+"""
+ベンチマーク結果の比較
+
+使い方:
+    python -m benchmarks.compare bench_results/before.json bench_results/after.json
+"""
+import argparse
+import json
+from pathlib import Path
+
+
+METRICS = ["p50_ms", "p95_ms", "p99_ms", "throughput_per_sec"]
+
+
+def compare(baseline: dict, candidate: dict) -> list:
+    """
+    2つのベンチマーク結果を比較
+
+    Args:
+        baseline: 比較元の結果
+        candidate: 比較先の結果
+
+    Returns:
+        list: (ベンチマーク名, 指標, 比較元, 比較先, 変化率%) のリスト
+    """
+    rows = []
+    for name, base in baseline["results"].items():
+        cand = candidate["results"].get(name)
+        if cand is None:
+            continue
+        for metric in METRICS:
+            before, after = base.get(metric, 0.0), cand.get(metric, 0.0)
+            change = (after - before) / before * 100 if before else 0.0
+            rows.append((name, metric, before, after, change))
+    return rows
+
+
+def main():
+    """コマンドラインエントリポイント"""
+    parser = argparse.ArgumentParser(description="ベンチマーク結果JSONの比較")
+    parser.add_argument("baseline", help="比較元の結果JSON")
+    parser.add_argument("candidate", help="比較先の結果JSON")
+    args = parser.parse_args()
+
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    candidate = json.loads(Path(args.candidate).read_text(encoding="utf-8"))
+
+    print(f"{'benchmark':<18}{'metric':<20}{'baseline':>12}{'candidate':>12}{'change':>10}")
+    for name, metric, before, after, change in compare(baseline, candidate):
+        print(f"{name:<18}{metric:<20}{before:>12.2f}{after:>12.2f}{change:>9.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+ベンチマーク用の合成Knowledgeコーパス生成
+"""
+import random
+from pathlib import Path
+from typing import List
+
+
+# ファイル種別ごとのファイル名プレフィックス（app.services.file_type_profiles.FILE_TYPE_PROFILESと対応）
+FILE_PREFIXES = [
+    "price_", "contractor_", "repair_", "legal_", "safety_", "risk_",
+    "judgement_", "urgency_", "material_", "construction_", "seasonal_",
+]
+
+REPAIR_TYPES = ["漏水", "ボールタップ交換", "受水槽清掃", "ポンプ故障", "パネル破損", "電極棒交換", "満減水警報"]
+CONTRACTORS = ["山田設備", "佐藤工業", "鈴木水道", "高橋メンテナンス", "田中ポンプ", "伊藤設備工業"]
+URGENCIES = ["高", "中", "低"]
+LOCATIONS = ["東京都新宿区", "横浜市中区", "さいたま市大宮区", "千葉市中央区", "川崎市川崎区"]
+
+# ベンチマークで使用する検索クエリ
+QUERIES = [
+    "受水槽の漏水修理で深夜対応できる業者は？",
+    "ボールタップ交換の相場価格",
+    "ポンプ故障時の緊急対応と注意事項",
+    "高置水槽のパネル破損の修理方法と法令要件",
+    "満減水警報が鳴った場合の判断基準",
+    "電極棒交換の材料費と人件費の目安",
+]
+
+
+def _case_record(rng: random.Random, case_no: int) -> str:
+    """事例1件分のテキストを生成"""
+    repair_type = rng.choice(REPAIR_TYPES)
+    contractor = rng.choice(CONTRACTORS)
+    price = rng.randrange(3, 80) * 10000
+    return (
+        f"事例No.{case_no}\n"
+        f"【修理種別】{repair_type}\n"
+        f"対応業者：{contractor}\n"
+        f"【現場】{rng.choice(LOCATIONS)}のマンション（貯水槽{rng.randrange(5, 60)}㎥）\n"
+        f"【緊急度】{rng.choice(URGENCIES)}\n"
+        f"【内容】{repair_type}のため現地調査を実施。"
+        f"{contractor}が{rng.randrange(1, 8)}時間で対応した。"
+        f"応急処置の後、部品を交換して断水時間を最小限に抑えた。\n"
+        f"【費用】{price:,}円（人件費{price * 6 // 10:,}円、材料費{price * 4 // 10:,}円）\n"
+        f"【教訓】事前に図面と止水栓の位置を確認しておくこと。\n"
+    )
+
+
+def generate_corpus(directory: Path, num_files: int = 30, records_per_file: int = 8, seed: int = 42) -> List[Path]:
+    """
+    合成Knowledgeファイルを作成
+
+    Args:
+        directory: 出力先ディレクトリ
+        num_files: ファイル数
+        records_per_file: 1ファイルあたりの事例数
+        seed: 乱数シード（同じ値なら同じコーパスになる）
+
+    Returns:
+        List[Path]: 作成したファイルのパス
+    """
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    paths = []
+    case_no = 1
+    for i in range(num_files):
+        prefix = FILE_PREFIXES[i % len(FILE_PREFIXES)]
+        path = directory / f"{prefix}synthetic_{i:04d}.txt"
+
+        sections = [f"【{prefix.rstrip('_')}に関するナレッジ {i}】\n"]
+        for _ in range(records_per_file):
+            sections.append(_case_record(rng, case_no))
+            case_no += 1
+        path.write_text("\n".join(sections), encoding="utf-8")
+        paths.append(path)
+
+    return paths
@@ -0,0 +1,122 @@
+"""
+ベンチマーク計測ユーティリティ
+"""
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """
+    パーセンタイルを計算（線形補間）
+
+    Args:
+        samples: 計測値のリスト
+        q: パーセンタイル（0〜100）
+
+    Returns:
+        float: パーセンタイル値
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples: List[float], wall_time: Optional[float] = None, concurrency: int = 1) -> Dict[str, float]:
+    """
+    計測値（秒）を集計
+
+    Args:
+        samples: 1回ごとの処理時間（秒）
+        wall_time: 全体の経過時間（秒、省略時はsamplesの合計）
+        concurrency: 同時実行数
+
+    Returns:
+        Dict[str, float]: 集計結果（ミリ秒・1秒あたりの処理数）
+    """
+    wall_time = wall_time if wall_time is not None else sum(samples)
+    return {
+        "iterations": len(samples),
+        "concurrency": concurrency,
+        "mean_ms": sum(samples) / len(samples) * 1000 if samples else 0.0,
+        "min_ms": min(samples) * 1000 if samples else 0.0,
+        "max_ms": max(samples) * 1000 if samples else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "throughput_per_sec": len(samples) / wall_time if wall_time > 0 else 0.0,
+    }
+
+
+def measure(func: Callable[[int], object], iterations: int, warmup: int = 1) -> Dict[str, float]:
+    """
+    関数を繰り返し実行して処理時間を計測
+
+    Args:
+        func: 計測対象の関数（引数は実行回数のインデックス）
+        iterations: 計測回数
+        warmup: 計測前の空実行回数
+
+    Returns:
+        Dict[str, float]: 集計結果
+    """
+    for i in range(warmup):
+        func(i)
+
+    samples = []
+    started_at = time.perf_counter()
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - start)
+    wall_time = time.perf_counter() - started_at
+
+    return summarize(samples, wall_time)
+
+
+def _git_revision() -> Optional[str]:
+    """現在のgitコミットID（取得できない場合はNone）"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except Exception:
+        return None
+
+
+def write_results(output: Path, results: Dict[str, Dict], params: Dict) -> Dict:
+    """
+    ベンチマーク結果をJSONで保存
+
+    Args:
+        output: 出力先ファイル
+        results: ベンチマーク名ごとの集計結果
+        params: 実行パラメータ
+
+    Returns:
+        Dict: 保存した内容
+    """
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "git_revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "params": params,
+        },
+        "results": results,
+    }
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return report
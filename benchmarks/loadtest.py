@@ -0,0 +1,186 @@
+"""
+HTTP負荷試験（シナリオファイルに従って複数エンドポイントへ同時アクセス）
+
+使い方:
+    # 1. OpenAI互換モックサーバーを起動
+    python -m benchmarks.mock_openai --port 9000
+
+    # 2. アプリをモックに向けて起動（1ワーカー）
+    OPENAI_API_BASE=http://127.0.0.1:9000/v1 OPENAI_API_KEY=sk-mock uvicorn app.main:app --workers 1
+
+    # 3. 負荷をかける
+    python -m benchmarks.loadtest benchmarks/scenarios/mixed.json --output bench_results/load.json
+
+ステージごとに同時実行数を上げていき、エンドポイント別のスループット・
+レイテンシのパーセンタイル・エラー率を出力する。
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+from benchmarks.harness import summarize, write_results
+
+
+def _pick_request(rng: random.Random, requests: List[Dict]) -> Tuple[Dict, Dict]:
+    """
+    重みに従ってリクエスト定義を選択
+
+    Args:
+        rng: 乱数生成器
+        requests: シナリオのリクエスト定義
+
+    Returns:
+        Tuple[Dict, Dict]: (リクエスト定義, 送信するJSONボディ)
+    """
+    spec = rng.choices(requests, weights=[r.get("weight", 1) for r in requests])[0]
+    if "json_choices" in spec:
+        body = rng.choice(spec["json_choices"])
+    else:
+        body = spec.get("json")
+    return spec, body
+
+
+async def _worker(
+    client: httpx.AsyncClient,
+    requests: List[Dict],
+    deadline: float,
+    seed: int,
+    samples: Dict[str, List[float]],
+    errors: Dict[str, int],
+):
+    """
+    締め切りまでリクエストを送り続ける（前の応答を待ってから次を送るクローズドループ）
+
+    Args:
+        client: HTTPクライアント
+        requests: シナリオのリクエスト定義
+        deadline: 終了時刻（time.perf_counter基準）
+        seed: 乱数シード
+        samples: エンドポイント名ごとの成功時レイテンシ（秒）の格納先
+        errors: エンドポイント名ごとのエラー数の格納先
+    """
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        spec, body = _pick_request(rng, requests)
+        name = spec["name"]
+        start = time.perf_counter()
+        try:
+            response = await client.request(spec.get("method", "GET"), spec["path"], json=body)
+            # ダウンロード系もボディを読み切るまでを計測する
+            await response.aread()
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        elapsed = time.perf_counter() - start
+
+        if ok:
+            samples.setdefault(name, []).append(elapsed)
+        else:
+            errors[name] = errors.get(name, 0) + 1
+
+
+async def run_stage(client: httpx.AsyncClient, requests: List[Dict], concurrency: int, duration: float, seed: int) -> Dict:
+    """
+    1ステージ分の負荷をかけて集計
+
+    Args:
+        client: HTTPクライアント
+        requests: シナリオのリクエスト定義
+        concurrency: 同時実行数
+        duration: 実行時間（秒）
+        seed: 乱数シード
+
+    Returns:
+        Dict: エンドポイント名ごとの集計結果（"_all"は全体）
+    """
+    samples: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    started_at = time.perf_counter()
+    deadline = started_at + duration
+
+    await asyncio.gather(*[
+        _worker(client, requests, deadline, seed * 1000 + i, samples, errors)
+        for i in range(concurrency)
+    ])
+    wall_time = time.perf_counter() - started_at
+
+    result = {}
+    names = sorted(set(samples) | set(errors))
+    for name in names + ["_all"]:
+        if name == "_all":
+            latencies = [v for values in samples.values() for v in values]
+            error_count = sum(errors.values())
+        else:
+            latencies = samples.get(name, [])
+            error_count = errors.get(name, 0)
+        stats = summarize(latencies, wall_time, concurrency)
+        total = len(latencies) + error_count
+        stats["errors"] = error_count
+        stats["error_rate"] = error_count / total if total else 0.0
+        result[name] = stats
+    return result
+
+
+async def run_scenario(scenario: Dict, base_url: str) -> Dict[str, Dict]:
+    """
+    シナリオの全ステージを実行
+
+    Args:
+        scenario: シナリオ定義
+        base_url: 対象アプリのURL
+
+    Returns:
+        Dict[str, Dict]: "c{同時実行数}"ごとの集計結果
+    """
+    requests = scenario["requests"]
+    stages = scenario["stages"]
+    max_concurrency = max(stage["concurrency"] for stage in stages)
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=scenario.get("timeout", 120), limits=limits) as client:
+        # 管理者APIを含む場合はログインしてCookieを保持する
+        if any(r.get("admin") for r in requests):
+            response = await client.post("/api/admin/login", json={"password": scenario.get("admin_password", "admin123")})
+            response.raise_for_status()
+
+        results = {}
+        for stage in stages:
+            concurrency = stage["concurrency"]
+            print(f"Stage: concurrency={concurrency} duration={stage['duration']}s")
+            stage_result = await run_stage(client, requests, concurrency, stage["duration"], scenario.get("seed", 0))
+            for name, stats in stage_result.items():
+                print(f"  {name:<18} n={stats['iterations']:<6} err={stats['error_rate'] * 100:5.1f}% "
+                      f"p50={stats['p50_ms']:8.1f}ms p95={stats['p95_ms']:8.1f}ms p99={stats['p99_ms']:8.1f}ms "
+                      f"rps={stats['throughput_per_sec']:7.2f}")
+            results[f"c{concurrency}"] = stage_result
+
+    return results
+
+
+def main():
+    """コマンドラインエントリポイント"""
+    parser = argparse.ArgumentParser(description="FastAPIアプリのHTTP負荷試験")
+    parser.add_argument("scenario", help="シナリオファイル（JSON）")
+    parser.add_argument("--base-url", default=None, help="対象アプリのURL（シナリオの設定を上書き）")
+    parser.add_argument("--output", default="bench_results/load.json", help="結果JSONの出力先")
+    args = parser.parse_args()
+
+    scenario = json.loads(Path(args.scenario).read_text(encoding="utf-8"))
+    base_url = args.base_url or scenario.get("base_url", "http://127.0.0.1:8000")
+
+    results = asyncio.run(run_scenario(scenario, base_url))
+    write_results(Path(args.output), results, {"scenario": args.scenario, "base_url": base_url, "stages": scenario["stages"]})
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
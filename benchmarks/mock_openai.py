@@ -0,0 +1,142 @@
+"""
+負荷試験用のOpenAI互換モックサーバー
+
+使い方:
+    python -m benchmarks.mock_openai --port 9000 --chat-latency-mean 0.8 --chat-latency-stddev 0.3
+
+アプリ側は OPENAI_API_BASE=http://127.0.0.1:9000/v1 を設定して起動する。
+/v1/embeddings と /v1/chat/completions（非ストリーミング）に対応し、
+実際のAPIに近い遅延を非同期に待機してから応答する。
+"""
+import argparse
+import asyncio
+import base64
+import random
+import struct
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from app.services.local_models import build_echo_answer, hashing_embedding, sample_latency
+
+
+class EmbeddingRequest(BaseModel):
+    """埋め込みリクエスト"""
+    input: Union[str, List[str]]
+    model: str = "text-embedding-ada-002"
+    encoding_format: str = "float"
+
+
+class ChatCompletionRequest(BaseModel):
+    """チャット補完リクエスト"""
+    model: str = "gpt-4o-mini"
+    messages: List[Dict[str, Any]]
+    stream: bool = False
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    """メッセージのcontent（文字列またはパーツのリスト）をテキストに変換"""
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content)
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    """
+    モックサーバーのアプリケーションを作成
+
+    Args:
+        args: コマンドライン引数（遅延の設定）
+
+    Returns:
+        FastAPI: アプリケーション
+    """
+    app = FastAPI(title="OpenAI mock")
+    rng = random.Random(args.seed)
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: EmbeddingRequest):
+        texts = [request.input] if isinstance(request.input, str) else request.input
+        await asyncio.sleep(sample_latency(rng, args.distribution, args.embed_latency_mean, args.embed_latency_stddev))
+
+        data = []
+        for idx, text in enumerate(texts):
+            vector = hashing_embedding(text, args.embed_dim)
+            if request.encoding_format == "base64":
+                embedding = base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+            else:
+                embedding = vector
+            data.append({"object": "embedding", "index": idx, "embedding": embedding})
+
+        tokens = sum(len(text) for text in texts)
+        return {
+            "object": "list",
+            "data": data,
+            "model": request.model,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: ChatCompletionRequest):
+        if request.stream:
+            raise HTTPException(status_code=400, detail="Streaming is not supported by the mock server")
+
+        prompt = "\n".join(_message_text(message) for message in request.messages)
+        answer = build_echo_answer(prompt)
+
+        # 最初のトークンまでの遅延 + 生成時間（日本語はおおよそ1文字1トークン）
+        delay = sample_latency(rng, args.distribution, args.chat_latency_mean, args.chat_latency_stddev)
+        if args.tokens_per_second > 0:
+            delay += len(answer) / args.tokens_per_second
+        await asyncio.sleep(delay)
+
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": len(prompt),
+                "completion_tokens": len(answer),
+                "total_tokens": len(prompt) + len(answer),
+            },
+        }
+
+    return app
+
+
+def main():
+    """コマンドラインエントリポイント"""
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="負荷試験用のOpenAI互換モックサーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--distribution", choices=["fixed", "normal", "lognormal"], default="lognormal", help="遅延分布")
+    parser.add_argument("--embed-latency-mean", type=float, default=0.15, help="埋め込みの遅延の平均（秒）")
+    parser.add_argument("--embed-latency-stddev", type=float, default=0.05, help="埋め込みの遅延の標準偏差（秒）")
+    parser.add_argument("--chat-latency-mean", type=float, default=0.8, help="最初のトークンまでの遅延の平均（秒）")
+    parser.add_argument("--chat-latency-stddev", type=float, default=0.3, help="最初のトークンまでの遅延の標準偏差（秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0, help="生成速度（0の場合は待機しない）")
+    parser.add_argument("--embed-dim", type=int, default=1536, help="埋め込みの次元数")
+    parser.add_argument("--seed", type=int, default=0, help="遅延の乱数シード")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
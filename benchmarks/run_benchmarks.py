@@ -0,0 +1,248 @@
+"""
+オフラインベンチマークの実行
+
+使い方:
+    python -m benchmarks.run_benchmarks --files 30 --iterations 50 --output bench_results/latest.json
+
+OpenAIには接続せず、ローカルプロバイダ（app/services/local_models.py）の
+決定的な埋め込み・LLMと合成Knowledgeコーパスを使って各サービスの処理時間を計測する。
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.corpus import generate_corpus, QUERIES
+from benchmarks.harness import measure, write_results
+
+
+BENCHMARKS = [
+    "create_index",
+    "load_index",
+    "search",
+    "generate_answer",
+    "save_rag_log",
+    "save_rag_log_enqueue",
+    "save_rag_log_batch",
+    "estimate_docx",
+    "order_docx",
+    "estimate_pdf",
+    "order_pdf",
+]
+
+# 計測している処理（結果JSONの measures、実行時の出力に記録する）
+DESCRIPTIONS = {
+    "save_rag_log": "1件のログの保存完了まで（キューへの追加からDBへの書き込みまで、書き込み待ちを解消してから計測終了）",
+    "save_rag_log_enqueue": "1件のログのキューへの追加のみ（リクエスト処理中の待ち時間、DBへの書き込みは含まない）",
+    "save_rag_log_batch": "--log-batch件のログをまとめて追加して保存完了まで（バッチ書き込みのスループット）",
+}
+
+CASE_INFO = {
+    "case_id": "BENCH-001",
+    "case_name": "ベンチマーク案件",
+    "repair_type": "漏水",
+    "urgency": "高",
+    "location": "東京都新宿区",
+    "tank_size": "20㎥",
+}
+
+
+def _configure_environment(workdir: Path, knowledge_dir: Path, args: argparse.Namespace):
+    """
+    app.*をimportする前に環境変数を設定（設定はimport時に読み込まれるため）
+
+    Args:
+        workdir: 作業ディレクトリ
+        knowledge_dir: 合成コーパスのディレクトリ
+        args: コマンドライン引数
+    """
+    os.environ["KNOWLEDGE_DIR"] = str(knowledge_dir)
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'bench.db'}"
+    os.environ["KNOWLEDGE_STORE_DIR"] = str(workdir / "knowledge_store")
+    os.environ["INDEX_SNAPSHOT_DIR"] = str(workdir / "index_snapshots")
+    os.environ["EMBEDDING_PROVIDER"] = "local"
+    os.environ["LLM_PROVIDER"] = "local"
+    os.environ["LOCAL_LLM_LATENCY_DISTRIBUTION"] = args.llm_latency_distribution
+    os.environ["LOCAL_LLM_LATENCY_MEAN"] = str(args.llm_latency)
+    os.environ["LOCAL_LLM_LATENCY_STDDEV"] = str(args.llm_latency_stddev)
+    os.environ["LOCAL_LLM_TOKENS_PER_SECOND"] = str(args.llm_tokens_per_second)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Dict]:
+    """
+    ベンチマークを実行
+
+    Args:
+        args: コマンドライン引数
+
+    Returns:
+        Dict[str, Dict]: ベンチマーク名ごとの集計結果
+    """
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="rag_bench_"))
+    knowledge_dir = workdir / "knowledge"
+    if knowledge_dir.exists():
+        shutil.rmtree(knowledge_dir)
+    generate_corpus(knowledge_dir, num_files=args.files, records_per_file=args.records, seed=args.seed)
+    _configure_environment(workdir, knowledge_dir, args)
+
+    from app.core.database import init_db
+    from app.services.rag_service import get_rag_service
+    from app.services.log_service import get_log_service
+    from app.services.document_service import get_document_service
+
+    init_db()
+    rag_service = get_rag_service()
+    log_service = get_log_service()
+    document_service = get_document_service()
+
+    rag_service.index_dir = workdir / "index"
+    rag_service.index_dir.mkdir(parents=True, exist_ok=True)
+
+    selected = args.only.split(",") if args.only else BENCHMARKS
+    results: Dict[str, Dict] = {}
+    answer_text = ""
+
+    def bench_create_index(i: int):
+        result = rag_service.create_index()
+        if not result["success"]:
+            raise RuntimeError(result["message"])
+
+    def bench_load_index(i: int):
+        rag_service._index = None
+        if not rag_service.load_index():
+            raise RuntimeError("load_index failed")
+
+    def bench_search(i: int):
+        result = rag_service.search(QUERIES[i % len(QUERIES)], top_k=args.top_k)
+        if not result["success"]:
+            raise RuntimeError(result["message"])
+
+    def bench_generate_answer(i: int):
+        nonlocal answer_text
+        result = rag_service.generate_answer(QUERIES[i % len(QUERIES)], case_info=CASE_INFO, top_k=args.top_k)
+        if not result["success"]:
+            raise RuntimeError(result["message"])
+        answer_text = result["answer"]
+
+    def enqueue_rag_log(i: int):
+        log_service.save_rag_log(
+            case_id=CASE_INFO["case_id"],
+            input_data=CASE_INFO,
+            rag_queries=[QUERIES[i % len(QUERIES)]],
+            referenced_files=["past_case_study.txt", "price_repair_leak.txt"],
+            search_results=[{"chunk_id": str(n), "score": 0.5, "text_preview": "あ" * 200} for n in range(5)],
+            generated_answer=answer_text or "回答" * 1000,
+            reasoning="判断理由" * 100,
+            processing_time=1.0,
+            model_name=rag_service.model_name,
+            top_k=args.top_k,
+        )
+
+    def bench_save_rag_log(i: int):
+        # save_rag_logはバックグラウンド書き込みのキューに追加するだけのため、書き込みの完了まで待つ
+        enqueue_rag_log(i)
+        log_service.flush()
+
+    def bench_save_rag_log_batch(i: int):
+        for n in range(args.log_batch):
+            enqueue_rag_log(i * args.log_batch + n)
+        log_service.flush()
+
+    def bench_estimate_docx(i: int):
+        document_service.generate_estimate_draft_docx(CASE_INFO, answer_text or "回答")
+
+    def bench_order_docx(i: int):
+        document_service.generate_order_draft_docx(CASE_INFO, answer_text or "回答", "山田設備", 150000)
+
+    def bench_estimate_pdf(i: int):
+        document_service.generate_estimate_draft(CASE_INFO, answer_text or "回答")
+
+    def bench_order_pdf(i: int):
+        document_service.generate_order_draft(CASE_INFO, answer_text or "回答", "山田設備", 150000)
+
+    functions = {
+        "create_index": (bench_create_index, args.index_iterations),
+        "load_index": (bench_load_index, args.index_iterations),
+        "search": (bench_search, args.iterations),
+        "generate_answer": (bench_generate_answer, args.iterations),
+        "save_rag_log": (bench_save_rag_log, args.iterations),
+        "save_rag_log_enqueue": (enqueue_rag_log, args.iterations),
+        "save_rag_log_batch": (bench_save_rag_log_batch, args.index_iterations),
+        "estimate_docx": (bench_estimate_docx, args.iterations),
+        "order_docx": (bench_order_docx, args.iterations),
+        "estimate_pdf": (bench_estimate_pdf, args.iterations),
+        "order_pdf": (bench_order_pdf, args.iterations),
+    }
+
+    # search以降はIndexが必要なため、create_indexを選択していなくても一度作成する
+    if "create_index" not in selected:
+        rag_service.create_index()
+
+    for name in BENCHMARKS:
+        if name not in selected:
+            continue
+        func, iterations = functions[name]
+        print(f"Running {name} ({iterations} iterations)...")
+        if name in DESCRIPTIONS:
+            print(f"  measures: {DESCRIPTIONS[name]}")
+        results[name] = measure(func, iterations=iterations, warmup=args.warmup)
+        print(f"  p50={results[name]['p50_ms']:.2f}ms p95={results[name]['p95_ms']:.2f}ms "
+              f"p99={results[name]['p99_ms']:.2f}ms throughput={results[name]['throughput_per_sec']:.1f}/s")
+        if name in DESCRIPTIONS:
+            results[name]["measures"] = DESCRIPTIONS[name]
+        if name == "save_rag_log_batch":
+            # 1回の計測で保存したログ数と、1秒あたりの保存件数
+            results[name]["logs_per_iteration"] = args.log_batch
+            results[name]["logs_per_sec"] = results[name]["throughput_per_sec"] * args.log_batch
+            print(f"  logs_per_sec={results[name]['logs_per_sec']:.1f}")
+
+    # バックグラウンド書き込みのログを保存してから作業ディレクトリを削除する
+    log_service.close()
+
+    if not args.workdir and not args.keep_workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return results
+
+
+def main():
+    """コマンドラインエントリポイント"""
+    parser = argparse.ArgumentParser(description="RAGサービスのオフラインベンチマーク")
+    parser.add_argument("--files", type=int, default=30, help="合成Knowledgeファイル数")
+    parser.add_argument("--records", type=int, default=8, help="1ファイルあたりの事例数")
+    parser.add_argument("--seed", type=int, default=42, help="コーパス生成の乱数シード")
+    parser.add_argument("--iterations", type=int, default=50, help="各ベンチマークの計測回数")
+    parser.add_argument("--index-iterations", type=int, default=3, help="create_index/load_indexの計測回数")
+    parser.add_argument("--warmup", type=int, default=1, help="計測前の空実行回数")
+    parser.add_argument("--top-k", type=int, default=5, help="検索結果の数")
+    parser.add_argument("--log-batch", type=int, default=200, help="save_rag_log_batchの1回で保存するログ数")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="ローカルLLMの最初のトークンまでの遅延の平均（秒）")
+    parser.add_argument("--llm-latency-stddev", type=float, default=0.0, help="ローカルLLMの遅延の標準偏差（秒）")
+    parser.add_argument("--llm-latency-distribution", choices=["fixed", "normal", "lognormal"], default="fixed", help="ローカルLLMの遅延分布")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=0.0, help="ローカルLLMの生成速度（0の場合は待機しない）")
+    parser.add_argument("--only", type=str, default=None, help=f"実行するベンチマーク（カンマ区切り: {','.join(BENCHMARKS)}）")
+    parser.add_argument("--workdir", type=str, default=None, help="作業ディレクトリ（省略時は一時ディレクトリ）")
+    parser.add_argument("--keep-workdir", action="store_true", help="一時ディレクトリを削除しない")
+    parser.add_argument("--output", type=str, default="bench_results/latest.json", help="結果JSONの出力先")
+    args = parser.parse_args()
+
+    results = run(args)
+    params = {
+        key: value for key, value in vars(args).items()
+        if key not in ("output", "workdir", "keep_workdir")
+    }
+    # 計測に使ったKnowledgeのバージョン（同じコーパスなら同じ値）
+    from app.services.knowledge_service import get_knowledge_service
+    params["knowledge_version"] = get_knowledge_service().current_version
+    write_results(Path(args.output), results, params)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
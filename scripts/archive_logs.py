@@ -0,0 +1,51 @@
+"""
+保存期間を過ぎたRAGログをアーカイブファイルへ移動するスクリプト
+
+使い方:
+    python scripts/archive_logs.py              # LOG_RETENTION_DAYS（デフォルト90日）より古いログを移動
+    python scripts/archive_logs.py --days 30 --vacuum
+
+cronなどで1日1回実行する想定。
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.config import settings
+from app.core.database import init_db
+from app.services.log_archive_service import get_log_archive_service
+
+
+def main():
+    """コマンドラインエントリポイント"""
+    parser = argparse.ArgumentParser(description="古いRAGログを日付別の圧縮ファイルへ移動")
+    parser.add_argument("--days", type=int, default=settings.log_retention_days, help="DBに残す日数")
+    parser.add_argument("--vacuum", action="store_true", help="移動後にDBファイルを縮小する（SQLiteのみ）")
+    args = parser.parse_args()
+
+    init_db()
+    archive_service = get_log_archive_service()
+
+    result = archive_service.archive_logs(retention_days=args.days)
+    if not result["success"]:
+        print(f"❌ エラーが発生しました: {result['message']}（{result['archived']}件は移動済み）")
+        sys.exit(1)
+
+    print(f"✅ {result['cutoff']} より前のログ {result['archived']}件をアーカイブしました。")
+    for file_path in result["files"]:
+        print(f"  {archive_service.archive_dir / file_path}")
+
+    if args.vacuum and result["archived"] > 0:
+        if archive_service.compact_database():
+            print("DBファイルを縮小しました。")
+
+    stats = archive_service.get_stats()
+    print(f"\n📊 アーカイブ: {stats['files']}ファイル / {stats['rows']}件 / "
+          f"{stats['size_bytes'] / 1024 / 1024:.1f}MB（{stats['oldest_date']} 〜 {stats['newest_date']}）")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,7 @@ from sqlalchemy.orm import declarative_base, sessionmaker
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.core.config import settings
-from app.services.knowledge_service import knowledge_service
+from app.services.knowledge_service import get_knowledge_service
 
 Base = declarative_base()
 
@@ -105,7 +105,7 @@ def import_chunks_to_db():
                     try:
                         # ファイル内容をキャッシュから取得、または読み込む
                         if file_name not in file_content_cache:
-                            file_content = knowledge_service.get_file_content(file_name)
+                            file_content = get_knowledge_service().get_file_content(file_name)
                             file_content_cache[file_name] = file_content['content']
                         
                         file_text = file_content_cache[file_name]
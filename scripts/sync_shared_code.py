@@ -0,0 +1,50 @@
+"""
+FastAPIアプリとAzure Functionsで共通のコードを api-azure/shared_code にコピーするスクリプト
+
+Azure Functions（api-azure）はそのディレクトリだけをデプロイするため、app/ のモジュールを
+実ファイルとしてコピーしてコミットする。コピー元を変更したら実行する。
+
+使い方:
+    python scripts/sync_shared_code.py          # コピー元の内容で api-azure/shared_code を更新
+    python scripts/sync_shared_code.py --check  # 内容が異なるファイルがあれば終了コード1（CI用）
+"""
+import argparse
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).parent.parent
+
+# コピー元 → コピー先（プロジェクトルートからの相対パス）
+SHARED_FILES = {
+    "app/services/knowledge_storage.py": "api-azure/shared_code/knowledge_storage.py",
+}
+
+
+def main():
+    """コマンドラインエントリポイント"""
+    parser = argparse.ArgumentParser(description="共通コードを api-azure/shared_code にコピー")
+    parser.add_argument("--check", action="store_true", help="コピーせず、内容が一致しているか確認する")
+    args = parser.parse_args()
+
+    outdated = []
+    for source, destination in SHARED_FILES.items():
+        data = (ROOT / source).read_bytes()
+        target = ROOT / destination
+        # シンボリックリンクは実ファイルに置き換える
+        if not target.is_symlink() and target.exists() and target.read_bytes() == data:
+            continue
+        outdated.append(destination)
+        if not args.check:
+            target.unlink(missing_ok=True)
+            target.write_bytes(data)
+
+    if args.check and outdated:
+        print(f"❌ 共通コードが古くなっています: {', '.join(outdated)}")
+        print("   python scripts/sync_shared_code.py を実行してコミットしてください。")
+        sys.exit(1)
+    print(f"✅ 共通コードを更新しました: {', '.join(outdated)}" if outdated else "✅ 共通コードは最新です。")
+
+
+if __name__ == "__main__":
+    main()